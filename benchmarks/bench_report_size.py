@@ -0,0 +1,67 @@
+#!/usr/bin/env python
+"""
+Measures the HTML size and build time of a samples x metrics table (TSO500
+sized) as MultiQC table, as summary + compact table and as summary only
+(seglh_table_embed: False), for growing sample counts.
+
+Usage:
+    python benchmarks/bench_report_size.py [--samples 100 500 2000] [--metrics 60] [--repeat 3]
+"""
+
+from __future__ import print_function
+import argparse
+import random
+import time
+from collections import OrderedDict
+
+from multiqc.utils import config, report
+
+from seglh_plugin import tables
+
+
+def make_table(n_samples, n_metrics, seed=42):
+    '''({sample: {metric: value}}, headers) of random values'''
+    rng = random.Random(seed)
+    metrics = ['METRIC_{} (%)'.format(m) for m in range(n_metrics)]
+    data = dict(('S{}'.format(s), dict((m, rng.uniform(0, 100)) for m in metrics)) for s in range(n_samples))
+    headers = OrderedDict((m, {'title': m, 'description': m, 'format': '{:,.2f}', 'scale': 'RdYlGn'})
+                          for m in metrics)
+    return data, headers
+
+
+def best(fn, repeat):
+    '''(fastest time, HTML) of repeat calls'''
+    timings = []
+    for _ in range(repeat):
+        report.init()
+        start = time.perf_counter()
+        html = fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings), html
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--samples', type=int, nargs='+', default=[100, 500, 2000])
+    parser.add_argument('--metrics', type=int, default=60)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    modes = (
+        ('multiqc', 0, True),
+        ('compact', 1, True),
+        ('summary only', 1, False),
+    )
+    pconfig = {'id': 'bench-table', 'table_title': 'Benchmark', 'no_beeswarm': True}
+    print('{:>8} {:>14} {:>10} {:>10}'.format('samples', 'table', 'time (ms)', 'size (kB)'))
+    for n_samples in args.samples:
+        data, headers = make_table(n_samples, args.metrics)
+        for name, max_cells, embed in modes:
+            config.seglh_table_max_cells, config.seglh_table_embed = max_cells, embed
+            elapsed, html = best(lambda: tables.plot(data, OrderedDict(
+                (k, dict(h)) for k, h in headers.items()), dict(pconfig)), args.repeat)
+            print('{:>8} {:>14} {:>10.1f} {:>10.1f}'.format(n_samples, name, elapsed * 1e3, len(html) / 1e3))
+
+
+if __name__ == '__main__':
+    main()
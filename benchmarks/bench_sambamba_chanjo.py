@@ -0,0 +1,165 @@
+#!/usr/bin/env python
+"""
+Compares the streaming sambamba_chanjo gene_level.txt parser with the
+previous parser (whole file slurped, split into lines and regex matched).
+
+Also compares the memory and table header cost of the per sample dict of
+dicts store with the columnar CoverageMatrix for a samples x genes run, and
+the parse time of a genome wide file restricted to gene panels of several
+sizes.
+
+Usage:
+    python benchmarks/bench_sambamba_chanjo.py [--genes 20000 50000] [--repeat 3]
+        [--store 500 20000] [--panel 100 1000]
+"""
+
+from __future__ import print_function
+import argparse
+import io
+import os
+import random
+import re
+import tempfile
+import time
+import tracemalloc
+
+from seglh_plugin.modules.sambamba_chanjo.sambamba_chanjo import MultiqcModule
+from seglh_plugin.modules.sambamba_chanjo.matrix import CoverageMatrix
+from seglh_plugin.parsers.sambamba_chanjo import PanelFilter, parse_gene_level
+from synthetic import write_gene_level
+
+
+def legacy_parse(path):
+    '''previous parser: slurps the file (as MultiQC does for file contents)'''
+    data = {}
+    with io.open(path, 'r', encoding='utf-8') as fh:
+        contents = fh.read()
+    for line in contents.splitlines():
+        if line.startswith('gene symbol'):
+            continue
+        elif line.startswith('#') or len(line) == 0 or re.match(r'^\s+$', line):
+            continue
+        else:
+            gene, coverage = line.rstrip().split('\t')
+            data[gene] = float(coverage)
+    return data
+
+
+def streaming_parse(path):
+    '''current parser, reading from an open file handle'''
+    module = MultiqcModule.__new__(MultiqcModule)
+    module.sambamba_chanjo_matrix = CoverageMatrix()
+    with io.open(path, 'r', encoding='utf-8') as fh:
+        module.merge_parsed('sample', parse_gene_level(fh))
+    return module.sambamba_chanjo_matrix.to_dict()['sample']
+
+
+def measure(parser, path, repeat):
+    '''returns best wall time (s) and tracemalloc peak (bytes) of a parser'''
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        parser(path)
+        timings.append(time.perf_counter() - start)
+    tracemalloc.start()
+    result = parser(path)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return min(timings), peak, result
+
+
+def bench_store(n_samples, n_genes, seed=42):
+    '''memory and header build time of dict of dicts vs CoverageMatrix'''
+    from array import array
+    from collections import OrderedDict
+    rng = random.Random(seed)
+    genes = ['GENE{}'.format(i) for i in range(n_genes)]
+    column = [round(rng.uniform(80, 100), 2) for _ in range(n_genes)]
+
+    tracemalloc.start()
+    legacy = {'S{}'.format(s): {g: float(repr(v)) for g, v in zip(genes, column)} for s in range(n_samples)}
+    legacy_peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    start = time.perf_counter()
+    headers = OrderedDict()
+    for sample in legacy:
+        for gene in sorted(legacy[sample]):
+            headers[gene] = {'title': gene}
+    legacy_headers = time.perf_counter() - start
+    del legacy
+
+    tracemalloc.start()
+    matrix = CoverageMatrix()
+    rows = array('q', [matrix.gene_row(g) for g in genes])
+    values = array('f', column)
+    for s in range(n_samples):
+        matrix.add_column('S{}'.format(s), rows, values)
+    matrix_peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    start = time.perf_counter()
+    headers = OrderedDict((gene, {'title': gene}) for gene in matrix.sorted_genes())
+    matrix_headers = time.perf_counter() - start
+
+    print('{} samples x {} genes'.format(n_samples, n_genes))
+    print('{:>10} {:>12} {:>14}'.format('store', 'peak (MB)', 'headers (ms)'))
+    print('{:>10} {:>12.1f} {:>14.1f}'.format('dict', legacy_peak / 1e6, legacy_headers * 1e3))
+    print('{:>10} {:>12.1f} {:>14.1f}'.format('matrix', matrix_peak / 1e6, matrix_headers * 1e3))
+
+
+def bench_panel(n_genes, panel_sizes, repeat, seed=42):
+    '''parse time and memory of a genome wide file, all genes and restricted to panels'''
+    rng = random.Random(seed)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'sample.gene_level.txt')
+        write_gene_level(path, n_genes)
+
+        def parser(genes):
+            def parse(path):
+                with io.open(path, 'r', encoding='utf-8') as fh:
+                    return genes(fh)
+            return parse
+
+        print('{} genes'.format(n_genes))
+        print('{:>8} {:>12} {:>12}'.format('panel', 'time (ms)', 'peak (MB)'))
+        elapsed, peak, _ = measure(parser(parse_gene_level), path, repeat)
+        print('{:>8} {:>12.1f} {:>12.2f}'.format('all', elapsed * 1e3, peak / 1e6))
+        for size in panel_sizes:
+            panel = PanelFilter('GENE{}'.format(i) for i in rng.sample(range(n_genes), min(size, n_genes)))
+            elapsed, peak, result = measure(parser(panel), path, repeat)
+            assert len(result[0]) == len(panel.genes), 'panel genes missing'
+            print('{:>8} {:>12.1f} {:>12.2f}'.format(size, elapsed * 1e3, peak / 1e6))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--genes', type=int, nargs='+', default=[1000, 20000, 100000])
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--store', type=int, nargs=2, metavar=('SAMPLES', 'GENES'))
+    parser.add_argument('--panel', type=int, nargs='+', metavar='GENES')
+    args = parser.parse_args()
+
+    if args.store:
+        bench_store(*args.store)
+        return
+    if args.panel:
+        bench_panel(max(args.genes), args.panel, args.repeat)
+        return
+
+    print('{:>8} {:>10} {:>10} {:>12} {:>12} {:>12}'.format(
+        'genes', 'file (MB)', 'parser', 'time (ms)', 'genes/s', 'peak (MB)'))
+    with tempfile.TemporaryDirectory() as tmp:
+        for n_genes in args.genes:
+            path = os.path.join(tmp, 'sample.gene_level.txt')
+            write_gene_level(path, n_genes)
+            size = os.path.getsize(path) / 1e6
+            results = []
+            for name, fn in (('legacy', legacy_parse), ('stream', streaming_parse)):
+                elapsed, peak, result = measure(fn, path, args.repeat)
+                results.append(result)
+                print('{:>8} {:>10.2f} {:>10} {:>12.1f} {:>12,.0f} {:>12.2f}'.format(
+                    n_genes, size, name, elapsed * 1e3, n_genes / elapsed, peak / 1e6))
+            assert results[0] == results[1], 'parsers disagree'
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+#!/usr/bin/env python
+"""
+Compares the MultiQC file search with the combined SEGLH classifier for the
+SEGLH search patterns over a synthetic run folder (mostly files of other
+tools, a few SEGLH inputs), counting the files opened.
+
+Usage:
+    python benchmarks/bench_search.py [--files 1000 10000] [--repeat 3]
+"""
+
+from __future__ import print_function
+import argparse
+import io
+import os
+import tempfile
+import time
+
+from multiqc.utils import config, report
+
+from seglh_plugin import search
+from seglh_plugin.custom_code import seglh_plugin_execution_start
+from seglh_plugin.manifest import MODULES
+import synthetic
+
+
+def write_tree(tmp, n_files):
+    '''writes n_files other files and one of each SEGLH input'''
+    for i in range(n_files):
+        with open(os.path.join(tmp, 'other_{}.{}'.format(i, ('csv', 'txt', 'log')[i % 3])), 'w') as fh:
+            fh.write('col1,col2\n1,2\n')
+    synthetic.write_metrics_output(os.path.join(tmp, 'MetricsOutput.tsv'), 4, 20)
+    synthetic.write_sompy_stats(os.path.join(tmp, 'S1.stats.csv'), synthetic.sample_name(1))
+    synthetic.write_read_count(os.path.join(tmp, 'NGS1_readCount.csv'), 4)
+    synthetic.write_gene_level(os.path.join(tmp, 'S1.gene_level.txt'), 100)
+    return [{'fn': fn, 'root': tmp, 'filesize': os.path.getsize(os.path.join(tmp, fn))}
+            for fn in sorted(os.listdir(tmp))]
+
+
+def run_search(search_file, files):
+    '''matches every file against the SEGLH search patterns, returns {key: files}'''
+    found = dict((key, 0) for key in MODULES)
+    for f in files:
+        for key in MODULES:
+            if any(search_file(sp, f, key) for sp in search.seglh_patterns(key)):
+                found[key] += 1
+    return found
+
+
+def measure(search_file, files, repeat):
+    '''returns the best wall time (s), files opened and matches of a search function'''
+    opened, io_open = [0], io.open
+
+    def counting_open(*args, **kwargs):
+        opened[0] += 1
+        return io_open(*args, **kwargs)
+
+    timings = []
+    for _ in range(repeat):
+        search.install()
+        opened[0] = 0
+        io.open = counting_open
+        try:
+            start = time.perf_counter()
+            found = run_search(search_file, files)
+            timings.append(time.perf_counter() - start)
+        finally:
+            io.open = io_open
+    return min(timings), opened[0], found
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--files', type=int, nargs='+', default=[1000, 10000])
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    # register the SEGLH search patterns and install the search wrapper
+    config.kwargs = {'disable_plugin': False}
+    seglh_plugin_execution_start()
+    multiqc_search = report.search_file.wrapped
+
+    print('{:>8} {:>10} {:>12} {:>8}'.format('files', 'search', 'time (ms)', 'opened'))
+    for n_files in args.files:
+        with tempfile.TemporaryDirectory() as tmp:
+            files = write_tree(tmp, n_files)
+            results = []
+            for name, fn in (('multiqc', multiqc_search), ('seglh', report.search_file)):
+                elapsed, opened, found = measure(fn, files, args.repeat)
+                results.append(found)
+                print('{:>8} {:>10} {:>12.1f} {:>8}'.format(len(files), name, elapsed * 1e3, opened))
+            assert results[0] == results[1], 'searches disagree'
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+#!/usr/bin/env python
+"""
+Measures the import time the plugin adds to MultiQC start up.
+
+Each target is imported in a fresh interpreter with -X importtime and the
+cumulative time of the outermost seglh_plugin imports is summed, so the
+time reported is what the plugin (and what it pulls in) adds on top of
+MultiQC. The hooks are loaded by MultiQC on every run (also with
+--disable-seglh-plugin), the modules only when files for them were found.
+The start up of the seglh-qc gate (without MultiQC) is compared with the
+start up of MultiQC as a whole process.
+
+Usage:
+    python benchmarks/bench_startup.py [--repeat 10]
+"""
+
+from __future__ import print_function
+import argparse
+import statistics
+import subprocess
+import sys
+import time
+
+# MultiQC modules loaded before the plugin modules in a normal run
+CORE = 'import multiqc.utils.config, multiqc.utils.report, multiqc.modules.base_module, seglh_plugin.cli'
+
+TARGETS = [
+    ('hooks + cli options', ''),
+    ('tso500 module', 'import seglh_plugin.modules.tso500'),
+    ('sompy module', 'import seglh_plugin.modules.sompy'),
+    ('exomedepth module', 'import seglh_plugin.modules.exomedepth'),
+    ('sambamba_chanjo module', 'import seglh_plugin.modules.sambamba_chanjo'),
+]
+
+# whole process start up (wall time of --help)
+PROCESSES = [
+    ('multiqc --help', [sys.executable, '-m', 'multiqc', '--help']),
+    ('seglh-qc --help', [sys.executable, '-m', 'seglh_plugin.qc_gate', '--help']),
+]
+
+
+def plugin_import_time(importtime):
+    '''sums the cumulative time (s) of seglh_plugin imports not nested in another one'''
+    entries = []
+    for line in importtime.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        entries.append((len(name) - len(name.lstrip()), name.strip(), int(cumulative)))
+    # importtime lists children before their parent, walk it parent first
+    total, stack = 0, []
+    for depth, name, cumulative in reversed(entries):
+        while stack and stack[-1][0] >= depth:
+            stack.pop()
+        is_plugin = name.split('.')[0] == 'seglh_plugin'
+        if is_plugin and not any(plugin for _, plugin in stack):
+            total += cumulative
+        stack.append((depth, is_plugin))
+    return total / 1e6
+
+
+def time_import(target):
+    '''seconds the plugin adds to the target import in a fresh interpreter'''
+    code = '; '.join(filter(None, [CORE, target]))
+    proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', code],
+                          stderr=subprocess.PIPE, check=True, universal_newlines=True)
+    return plugin_import_time(proc.stderr)
+
+
+def time_process(command):
+    '''wall time (s) of a command'''
+    start = time.perf_counter()
+    subprocess.run(command, stdout=subprocess.DEVNULL, check=True)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=10)
+    args = parser.parse_args()
+
+    print('{:>24} {:>12} {:>12}'.format('import', 'median (ms)', 'min (ms)'))
+    for name, target in TARGETS:
+        timings = [time_import(target) for _ in range(args.repeat)]
+        print('{:>24} {:>12.1f} {:>12.1f}'.format(name, statistics.median(timings) * 1e3, min(timings) * 1e3))
+
+    print('\n{:>24} {:>12} {:>12}'.format('process', 'median (ms)', 'min (ms)'))
+    for name, command in PROCESSES:
+        timings = [time_process(command) for _ in range(args.repeat)]
+        print('{:>24} {:>12.1f} {:>12.1f}'.format(name, statistics.median(timings) * 1e3, min(timings) * 1e3))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,170 @@
+#!/usr/bin/env python
+"""
+Compares the TSO500 MetricsOutput.tsv parser (one pass over all sections,
+other sections kept as text blocks) with the previous regex-per-line
+parser, and checks both produce the same DNA sample values.
+Also compares the memory held by the parsed samples as dictionaries and
+in the module's MetricStore, and times the two steps every parser of this
+output pays for: converting all value cells with float() (in one batch,
+map over the cells) and building the {sample: {metric: value}} entries.
+
+Usage:
+    python benchmarks/bench_tso500.py [--samples 8 96 480] [--metrics 60] [--repeat 3]
+"""
+
+from __future__ import print_function
+import argparse
+import io
+import os
+import re
+import tempfile
+import time
+import tracemalloc
+
+from seglh_plugin.modules.tso500.metrics import MetricStore
+from seglh_plugin.parsers.tso500 import parse_metrics_output
+from synthetic import write_metrics_output
+
+
+def legacy_parse(fh):
+    '''previous parser: regex match on every line, one float call per cell'''
+    samples, metrics = dict(), []
+    group, sample_names = '', []
+    for line in fh.read().splitlines():
+        m = re.match(r'^\[(.*)\]\s*$', line)
+        if line.startswith('#'):
+            continue
+        elif len(line) == 0 or re.match(r'^\s+$', line):
+            group, sample_names = '', []
+            continue
+        elif m:
+            group = m.group(1)
+        elif group:
+            if group in ['Header']:
+                pass
+            elif group.startswith('DNA'):
+                if line.startswith("Metric "):
+                    sample_names = line.rstrip().split('\t')[3:]
+                    for s in sample_names:
+                        samples.setdefault(s, dict())
+                else:
+                    f = line.rstrip().split('\t')
+                    metric = f[0]
+                    lsl = float(f[1]) if f[1] != 'NA' else None
+                    usl = float(f[2]) if f[2] != 'NA' else None
+                    metrics.append((group, metric, lsl, usl))
+                    data = f[3:]
+                    for i, sample in enumerate(sample_names):
+                        try:
+                            samples[sample][metric] = float(data[i])
+                        except ValueError:
+                            samples[sample][metric] = None
+    return {'samples': samples, 'metrics': metrics}
+
+
+def measure(parser, path, repeat):
+    '''returns the best wall time (s) and the result of a parser'''
+    timings = []
+    for _ in range(repeat):
+        with io.open(path, 'r', encoding='utf-8') as fh:
+            start = time.perf_counter()
+            result = parser(fh)
+            timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+def retained(build):
+    '''returns the memory (bytes) still allocated by the result of build()'''
+    tracemalloc.start()
+    result = build()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del result
+    return size
+
+
+def store_samples(path):
+    '''parsed samples moved into a MetricStore (the parser output is released)'''
+    with io.open(path, 'r', encoding='utf-8') as fh:
+        parsed = parse_metrics_output(fh)
+    store = MetricStore()
+    for sample, data in parsed['samples'].items():
+        store.update(sample, data)
+    return store
+
+
+def dict_samples(path):
+    '''parsed samples as {sample: {metric: value}}'''
+    with io.open(path, 'r', encoding='utf-8') as fh:
+        return parse_metrics_output(fh)['samples']
+
+
+def floor_costs(path, repeat):
+    '''best times (s) of converting all DNA value cells in one batch and of building the sample dictionaries'''
+    with io.open(path, 'r', encoding='utf-8') as fh:
+        lines = [line.split('\t') for line in fh.read().splitlines() if line.startswith('METRIC_')]
+    metrics = [f[0] for f in lines]
+    cells = [c.replace('NA', 'nan') for f in lines for c in f[3:]]
+    n_samples = len(lines[0]) - 3
+
+    def convert():
+        return list(map(float, cells))
+
+    values = convert()
+    columns = [values[i::n_samples] for i in range(n_samples)]
+
+    def build():
+        return [dict(zip(metrics, column)) for column in columns]
+
+    return [min(timed(fn) for _ in range(repeat)) for fn in (convert, build)]
+
+
+def timed(fn):
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--samples', type=int, nargs='+', default=[8, 96, 480])
+    parser.add_argument('--metrics', type=int, default=60)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    print('{:>8} {:>8} {:>10} {:>12} {:>14} {:>8}'.format(
+        'samples', 'metrics', 'parser', 'time (ms)', 'cells/s', 'speedup'))
+    with tempfile.TemporaryDirectory() as tmp:
+        for n_samples in args.samples:
+            path = os.path.join(tmp, 'MetricsOutput.tsv')
+            write_metrics_output(path, n_samples, args.metrics)
+            cells = n_samples * args.metrics
+            legacy_time, legacy_result = measure(legacy_parse, path, args.repeat)
+            new_time, new_result = measure(parse_metrics_output, path, args.repeat)
+            # (the new parser also keeps the other sections as text blocks)
+            assert legacy_result == dict((k, new_result[k]) for k in legacy_result), 'parsers disagree'
+            for name, elapsed in (('legacy', legacy_time), ('current', new_time)):
+                print('{:>8} {:>8} {:>10} {:>12.2f} {:>14,.0f} {:>8.1f}'.format(
+                    n_samples, args.metrics, name, elapsed * 1e3, cells / elapsed, legacy_time / elapsed))
+
+        # float() of every cell and the dictionary entries bound any parser of this output
+        print('\n{:>8} {:>8} {:>14} {:>14}'.format('samples', 'metrics', 'float (ms)', 'dicts (ms)'))
+        for n_samples in args.samples:
+            path = os.path.join(tmp, 'MetricsOutput.tsv')
+            write_metrics_output(path, n_samples, args.metrics)
+            convert_time, build_time = floor_costs(path, args.repeat)
+            print('{:>8} {:>8} {:>14.2f} {:>14.2f}'.format(
+                n_samples, args.metrics, convert_time * 1e3, build_time * 1e3))
+
+        print('\n{:>8} {:>8} {:>12} {:>12} {:>8}'.format('samples', 'metrics', 'dict (KB)', 'store (KB)', 'ratio'))
+        for n_samples in args.samples:
+            path = os.path.join(tmp, 'MetricsOutput.tsv')
+            write_metrics_output(path, n_samples, args.metrics)
+            dict_size = retained(lambda: dict_samples(path))
+            store_size = retained(lambda: store_samples(path))
+            print('{:>8} {:>8} {:>12,.0f} {:>12,.0f} {:>8.1f}'.format(
+                n_samples, args.metrics, dict_size / 1024, store_size / 1024, dict_size / store_size))
+
+
+if __name__ == '__main__':
+    main()
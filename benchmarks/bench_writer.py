@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+"""
+Measures the time a module spends writing a sambamba_chanjo data file
+(samples x genes) with the synchronous MultiQC writer and with the SEGLH
+background writer, and compares the write time and size of the tsv, json
+and npz formats.
+
+Usage:
+    python benchmarks/bench_writer.py [--samples 50] [--genes 20000] [--repeat 3]
+"""
+
+from __future__ import print_function
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from multiqc.utils import config, report, util_functions
+
+from seglh_plugin import writer
+from seglh_plugin.modules.sambamba_chanjo.matrix import CoverageMatrix
+
+
+def make_matrix(n_samples, n_genes, seed=42):
+    '''CoverageMatrix of random coverage values'''
+    from array import array
+    rng = random.Random(seed)
+    matrix = CoverageMatrix()
+    rows = array('q', [matrix.gene_row('GENE{}'.format(g)) for g in range(n_genes)])
+    for s in range(n_samples):
+        matrix.add_column('S{}'.format(s), rows, array('f', [rng.uniform(80, 100) for _ in range(n_genes)]))
+    return matrix
+
+
+def best(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        report.init()
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--samples', type=int, default=50)
+    parser.add_argument('--genes', type=int, default=20000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    matrix = make_matrix(args.samples, args.genes)
+    data = matrix.to_dict()
+    module = object()
+    with tempfile.TemporaryDirectory() as tmp:
+        config.data_dir, config.data_format, config.kwargs = tmp, 'tsv', {}
+
+        print('{} samples x {} genes'.format(args.samples, args.genes))
+        print('{:>12} {:>16} {:>12}'.format('format', 'writer', 'module (ms)'))
+        for fmt in ('tsv', 'json', 'npz'):
+            config.kwargs['seglh_data_format'] = fmt
+            if fmt != 'npz':
+                elapsed = best(lambda: util_functions.write_data_file(data, 'multiqc_sambamba_chanjo', False, fmt),
+                               args.repeat)
+                print('{:>12} {:>16} {:>12.1f}'.format(fmt, 'synchronous', elapsed * 1e3))
+            elapsed = best(lambda: writer.write_data_file(
+                module, data, 'multiqc_sambamba_chanjo', table=matrix), args.repeat)
+            flushed = best(lambda: (writer.write_data_file(
+                module, data, 'multiqc_sambamba_chanjo', table=matrix), writer.flush_data_files()), args.repeat)
+            print('{:>12} {:>16} {:>12.1f}'.format(fmt, 'background', elapsed * 1e3))
+            print('{:>12} {:>16} {:>12.1f}'.format(fmt, 'background+flush', flushed * 1e3))
+
+        print('\n{:>12} {:>12}'.format('format', 'size (MB)'))
+        for fn in sorted(os.listdir(tmp)):
+            print('{:>12} {:>12.2f}'.format(fn.rsplit('.', 1)[1], os.path.getsize(os.path.join(tmp, fn)) / 1e6))
+
+
+if __name__ == '__main__':
+    main()
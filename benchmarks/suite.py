@@ -0,0 +1,225 @@
+#!/usr/bin/env python
+"""
+Benchmark suite for the SEGLH module parsers and tables.
+
+Generates synthetic inputs (see synthetic.py) at several scale points and
+times each module parser (with the merge into the module) and
+sample_stats_table, recording wall
+time, throughput and tracemalloc peak memory. Results are printed and
+written as JSON so runs can be compared before building a new image.
+
+Usage:
+    python benchmarks/suite.py [--scales 10 100 500] [--repeat 3] [--output results.json]
+        [--modules tso500 sompy exomedepth sambamba_chanjo]
+"""
+
+from __future__ import print_function
+import argparse
+from collections import defaultdict
+import datetime
+import io
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from multiqc.utils import config, report
+
+import synthetic
+
+# number of DNA metrics per TSO500 MetricsOutput
+TSO500_METRICS = 60
+# genes per chanjo file scale unit, and samples in the chanjo table benchmark
+CHANJO_GENES_PER_SCALE = 20
+CHANJO_SAMPLES = 20
+
+
+def new_module(cls, **attrs):
+    '''creates a module instance without running file discovery (__init__)'''
+    module = cls.__new__(cls)
+    for k, v in attrs.items():
+        setattr(module, k, v)
+    return module
+
+
+def measure(fn, repeat):
+    '''returns best wall time (s) of fn over repeat runs and its tracemalloc peak (bytes)'''
+    timings = []
+    for _ in range(repeat):
+        # reset report state (plot data, html ids) between runs
+        report.init()
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    report.init()
+    tracemalloc.start()
+    fn()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return min(timings), peak
+
+
+def parse_files(module, parser, merge, paths, s_names=None):
+    '''parses a list of paths and merges each result into the module (as its file loop)'''
+    for i, path in enumerate(paths):
+        f = {'fn': os.path.basename(path), 'root': os.path.dirname(path),
+             's_name': s_names[i] if s_names else os.path.basename(path)}
+        with io.open(path, 'r', encoding='utf-8') as fh:
+            merge(module, f, parser(fh))
+    return module
+
+
+def bench_tso500(tmp, scale):
+    '''scale: samples in one MetricsOutput.tsv'''
+    from seglh_plugin.modules.tso500 import MultiqcModule
+    from seglh_plugin.modules.tso500.metrics import HeaderCatalog, MetricCatalog, MetricStore
+    from seglh_plugin.parsers.tso500 import parse_metrics_output
+    path = os.path.join(tmp, 'MetricsOutput.tsv')
+    synthetic.write_metrics_output(path, scale, TSO500_METRICS)
+
+    def parse():
+        catalog = MetricCatalog()
+        return parse_files(new_module(
+            MultiqcModule, tso500_data_catalog=catalog, tso500_data_samples=MetricStore(catalog),
+            tso500_data_limits=catalog.limits, tso500_data_groups=catalog.groups,
+            tso500_header_catalog=HeaderCatalog(), tso500_blocks=defaultdict(list)),
+            parse_metrics_output, lambda m, f, parsed: m.merge_parsed(parsed, m.run_label(f)), [path])
+
+    module = parse()
+
+    def tables():
+        for group in sorted(module.tso500_data_groups.keys()):
+            module.sample_stats_table(module.tso500_data_groups[group])
+
+    return [path], scale * TSO500_METRICS, 'cells', parse, tables
+
+
+def bench_sompy(tmp, scale):
+    '''scale: number of stats.csv files (one sample each)'''
+    from seglh_plugin.modules.sompy import MultiqcModule
+    from seglh_plugin.parsers.sompy import parse_stats_csv
+    paths = []
+    for i in range(scale):
+        paths.append(os.path.join(tmp, 'S{}.stats.csv'.format(i)))
+        synthetic.write_sompy_stats(paths[-1], synthetic.sample_name(i), seed=i)
+
+    def parse():
+        return parse_files(new_module(MultiqcModule, sompy_data=defaultdict(dict)), parse_stats_csv,
+                           lambda m, f, parsed: m.merge_parsed(parsed), paths)
+
+    module = parse()
+
+    def tables():
+        for group in sorted(module.sompy_groups.keys()):
+            module.sample_stats_table(group)
+
+    return paths, scale, 'files', parse, tables
+
+
+def bench_exomedepth(tmp, scale):
+    '''scale: samples (rows) in one readCount.csv'''
+    from seglh_plugin.modules.exomedepth import MultiqcModule
+    from seglh_plugin.parsers.exomedepth import parse_read_count
+    path = os.path.join(tmp, 'synthetic_readCount.csv')
+    synthetic.write_read_count(path, scale)
+
+    def parse():
+        return parse_files(new_module(MultiqcModule, ed_data_samples=dict()), parse_read_count,
+                           lambda m, f, parsed: m.ed_data_samples.update(parsed), [path])
+
+    module = parse()
+    return [path], scale, 'samples', parse, module.sample_stats_table
+
+
+def bench_sambamba_chanjo(tmp, scale):
+    '''scale x CHANJO_GENES_PER_SCALE genes per gene_level.txt, CHANJO_SAMPLES samples'''
+    from seglh_plugin.modules.sambamba_chanjo import MultiqcModule
+    from seglh_plugin.modules.sambamba_chanjo.matrix import CoverageMatrix
+    from seglh_plugin.parsers.sambamba_chanjo import parse_gene_level
+    n_genes = scale * CHANJO_GENES_PER_SCALE
+    paths = []
+    for i in range(CHANJO_SAMPLES):
+        paths.append(os.path.join(tmp, 'S{}.gene_level.txt'.format(i)))
+        synthetic.write_gene_level(paths[-1], n_genes, seed=i)
+    s_names = [synthetic.sample_name(i) for i in range(CHANJO_SAMPLES)]
+
+    def parse():
+        return parse_files(new_module(
+            MultiqcModule, sambamba_chanjo_matrix=CoverageMatrix(),
+            chanjo_config=dict(MultiqcModule.sambamba_chanjo_defaults)), parse_gene_level,
+            lambda m, f, parsed: m.merge_parsed(f['s_name'], parsed), paths, s_names)
+
+    module = parse()
+    return paths, n_genes * CHANJO_SAMPLES, 'rows', parse, module.sample_stats_table
+
+
+BENCHMARKS = {
+    'tso500': bench_tso500,
+    'sompy': bench_sompy,
+    'exomedepth': bench_exomedepth,
+    'sambamba_chanjo': bench_sambamba_chanjo,
+}
+
+
+def run(modules, scales, repeat):
+    '''runs the benchmarks and returns a list of result records'''
+    results = []
+    for name in modules:
+        for scale in scales:
+            with tempfile.TemporaryDirectory() as tmp:
+                paths, items, unit, parse, tables = BENCHMARKS[name](tmp, scale)
+                input_bytes = sum(os.path.getsize(p) for p in paths)
+                for function, fn in (('parse_file', parse), ('sample_stats_table', tables)):
+                    seconds, peak = measure(fn, repeat)
+                    results.append({
+                        'module': name,
+                        'function': function,
+                        'scale': scale,
+                        'items': items,
+                        'unit': unit,
+                        'input_bytes': input_bytes,
+                        'seconds': seconds,
+                        'throughput': items / seconds if seconds else None,
+                        'peak_bytes': peak,
+                    })
+                    print('{:>16} {:>20} {:>7} {:>12.1f} {:>14,.0f} {:>8} {:>10.2f}'.format(
+                        name, function, scale, seconds * 1e3, results[-1]['throughput'] or 0, unit, peak / 1e6))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--modules', nargs='+', choices=sorted(BENCHMARKS), default=list(BENCHMARKS))
+    parser.add_argument('--scales', type=int, nargs='+', default=[10, 100, 500])
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--output', default='benchmark_results.json')
+    args = parser.parse_args()
+
+    # tables are built with the plugin enabled and no report output
+    config.kwargs = {'disable_plugin': False}
+    config.data_dir = None
+
+    print('{:>16} {:>20} {:>7} {:>12} {:>14} {:>8} {:>10}'.format(
+        'module', 'function', 'scale', 'time (ms)', 'throughput', 'unit', 'peak (MB)'))
+    results = run(args.modules, args.scales, args.repeat)
+
+    import numpy
+    from importlib.metadata import version
+    with open(args.output, 'w') as fh:
+        json.dump({
+            'created': datetime.datetime.now().isoformat(),
+            'plugin_version': version('seglh_plugin'),
+            'python': sys.version.split()[0],
+            'numpy': numpy.__version__,
+            'platform': platform.platform(),
+            'repeat': args.repeat,
+            'results': results,
+        }, fh, indent=2)
+    print('Results written to {}'.format(args.output))
+
+
+if __name__ == '__main__':
+    main()
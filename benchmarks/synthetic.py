@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+"""
+Synthetic input generators for the SEGLH module parsers.
+
+Each generator writes a file in the format of the real pipeline output,
+sized by the given scale parameters and seeded so runs are reproducible.
+"""
+
+from __future__ import print_function
+import random
+
+# metric name template and unit of the generated TSO500 DNA metrics
+TSO500_UNITS = ['%', 'Count', 'NA', 'bp']
+
+
+def sample_name(i):
+    '''SEGLH style sample name (matches the ExomeDepth sample regex)'''
+    return 'NGS999_{:02d}_{:06d}_XX_{}_SYNTH_Pan9999'.format(i % 100, i, 'MFU'[i % 3])
+
+
+def write_metrics_output(path, n_samples, n_metrics, seed=42):
+    '''writes a TSO500 MetricsOutput.tsv with n_samples and n_metrics DNA metrics'''
+    rng = random.Random(seed)
+    samples = [sample_name(i) for i in range(n_samples)]
+    with open(path, 'w') as fh:
+        fh.write('[Header]\nOutput Date\t2023-01-01\nOutput Time\t12:00:00\nWorkflow Version\t2.2.0\n\n')
+        fh.write('[Run QC Metrics]\nMetric (UOM)\tLSL Guideline\tUSL Guideline\tValue\n')
+        fh.write('PCT_PF_READS (%)\t80.0\tNA\t93.2\n\n')
+        fh.write('[Analysis Status]\t\n\t{}\n'.format('\t'.join(samples)))
+        fh.write('COMPLETED_ALL_STEPS\t{}\n\n'.format('\t'.join(['TRUE'] * n_samples)))
+        fh.write('[DNA Library QC Metrics]\n')
+        fh.write('Metric (UOM)\tLSL Guideline\tUSL Guideline\t{}\n'.format('\t'.join(samples)))
+        for m in range(n_metrics):
+            unit = TSO500_UNITS[m % len(TSO500_UNITS)]
+            lsl = '{:.1f}'.format(rng.uniform(0, 10)) if m % 3 == 0 else 'NA'
+            usl = '{:.1f}'.format(rng.uniform(90, 100)) if m % 4 == 0 else 'NA'
+            values = ['NA' if rng.random() < 0.01 else '{:.2f}'.format(rng.uniform(0, 100)) for _ in samples]
+            fh.write('METRIC_{} ({})\t{}\t{}\t{}\n'.format(m, unit, lsl, usl, '\t'.join(values)))
+        fh.write('\n[Notes]\nSynthetic data\n')
+    return samples
+
+
+def write_sompy_stats(path, sample, seed=42):
+    '''writes a som.py stats.csv for one sample (records, SNVs and indels rows)'''
+    rng = random.Random(seed)
+    header = (',type,total.truth,total.query,tp,fp,fn,unk,ambi,recall,recall_lower,recall_upper,'
+              'recall2,precision,precision_lower,precision_upper,na,ambiguous,fp.region.size,'
+              'fp.rate,sompyversion,sompycmd')
+    with open(path, 'w') as fh:
+        fh.write(header + '\n')
+        for i, group in enumerate(['indels', 'records', 'SNVs']):
+            truth = rng.randint(100, 5000)
+            tp = truth - rng.randint(0, truth // 10)
+            fp = rng.randint(0, 50)
+            fh.write('{},{},{},{},{},{},{},0,0,{:.6f},0.9,1.0,{:.6f},{:.6f},0.9,1.0,0.0,0.0,{},{:.3f},'
+                     'v0.3.0,/opt/som.py truth.vcf query.vcf -o /out/{}.vcf -r ref.fa\n'.format(
+                         i, group, truth, tp + fp, tp, fp, truth - tp, tp / truth, tp / truth,
+                         tp / (tp + fp), 3000000, fp / 3.0, sample))
+
+
+def write_read_count(path, n_samples, seed=42):
+    '''writes an ExomeDepth readCount.csv with one row per sample'''
+    rng = random.Random(seed)
+    with open(path, 'w') as fh:
+        fh.write('sample\tmin.refs\trefsamples\tcorrelations\texpected.BF\tphi\tRatioSd\tmean.p\t'
+                 'median.depth\tbatch.maxcor\tbatch.mediancor\tcoeff.var\n')
+        for i in range(n_samples):
+            fh.write('{}_markdup.bam\t3\t{}\t{:.4f}\t{:.2f}\t{:.3e}\t{:.3f}\t{:.2f}\t{}\t{:.4f}\t{:.4f}\t{:.3f}\n'.format(
+                sample_name(i), rng.randint(3, 10), rng.uniform(0.9, 1), rng.uniform(1, 20),
+                rng.uniform(0, 1e-3), rng.uniform(0, 0.5), rng.uniform(20, 80), rng.randint(50, 400),
+                rng.uniform(0.95, 1), rng.uniform(0.9, 1), rng.uniform(0.1, 0.6)))
+
+
+def write_gene_level(path, n_genes, seed=42):
+    '''writes a chanjo gene_level.txt file with n_genes rows'''
+    rng = random.Random(seed)
+    with open(path, 'w') as fh:
+        fh.write('gene symbol\tpercentage covered\n')
+        for i in range(n_genes):
+            fh.write('GENE{}\t{:.2f}\n'.format(i, rng.uniform(80, 100)))
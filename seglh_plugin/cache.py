@@ -0,0 +1,185 @@
+#!/usr/bin/env python
+""" Persistent on-disk cache of parsed SEGLH input files
+
+Parsed results are stored in a local SQLite database, keyed by parser,
+file path, size, mtime, plugin version and the SCHEMA_VERSION of the
+parser module (bumped whenever the parser output changes). Unchanged files
+are loaded from the cache on the next run; only new or modified files are
+parsed. Entries that can not be read back are dropped and parsed again.
+The least recently used entries are evicted once the cache grows past
+its size limit (config.seglh_cache_max_size, in bytes).
+
+The cache is off unless enabled with --seglh-cache, --seglh-cache-dir or
+seglh_cache: true in the MultiQC config (--seglh-no-cache always disables
+it), so shared pipeline nodes do not write to a home directory unasked.
+"""
+
+from __future__ import print_function
+import logging
+import os
+import pickle
+import sqlite3
+import sys
+import time
+import zlib
+
+from multiqc.utils import config
+
+# Initialise the main MultiQC logger
+log = logging.getLogger('multiqc')
+
+CACHE_FILENAME = 'parse_cache.sqlite'
+DEFAULT_MAX_SIZE = 512 * 1024 * 1024
+
+_cache = None
+
+
+def default_cache_dir():
+    '''per user cache directory (XDG_CACHE_HOME or ~/.cache)'''
+    base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'seglh_plugin')
+
+
+def cache_dir():
+    '''cache directory selected with --seglh-cache-dir (or the default)'''
+    return config.kwargs.get('seglh_cache_dir') or default_cache_dir()
+
+
+def cache_enabled():
+    '''whether the cache directory is used (--seglh-cache or --seglh-cache-dir, not --seglh-no-cache)'''
+    if config.kwargs.get('seglh_no_cache'):
+        return False
+    return bool(config.kwargs.get('seglh_cache') or config.kwargs.get('seglh_cache_dir')
+                or getattr(config, 'seglh_cache', False))
+
+
+def get_cache():
+    '''returns the shared ParseCache, or None if not enabled'''
+    global _cache
+    if not cache_enabled():
+        return None
+    if _cache is None:
+        try:
+            _cache = ParseCache(
+                os.path.join(cache_dir(), CACHE_FILENAME),
+                max_size=getattr(config, 'seglh_cache_max_size', DEFAULT_MAX_SIZE),
+            )
+        except (OSError, sqlite3.Error) as e:
+            log.warning("Could not open SEGLH parse cache in {} ({}), parsing all files".format(cache_dir(), e))
+            config.kwargs['seglh_no_cache'] = True
+            return None
+    return _cache
+
+
+def parser_name(parser):
+    '''stable identifier of a parser function (or its cache_name, for configured parsers)'''
+    return getattr(parser, 'cache_name', None) or '{}.{}'.format(parser.__module__, parser.__qualname__)
+
+
+def parser_schema(parser):
+    '''SCHEMA_VERSION of the module of a parser function or configured parser (0 if not set)'''
+    return getattr(sys.modules.get(parser.__module__), 'SCHEMA_VERSION', 0)
+
+
+class ParseCache(object):
+    '''SQLite backed store of parsed file results'''
+
+    def __init__(self, path, max_size=DEFAULT_MAX_SIZE, version=None):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self.max_size = max_size
+        self.version = version or getattr(config, 'seglh_plugin_version', '')
+        self.db = sqlite3.connect(path)
+        self.db.execute('''
+            CREATE TABLE IF NOT EXISTS parsed (
+                parser TEXT NOT NULL,
+                path TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                mtime INTEGER NOT NULL,
+                version TEXT NOT NULL,
+                accessed REAL NOT NULL,
+                nbytes INTEGER NOT NULL,
+                data BLOB NOT NULL,
+                PRIMARY KEY (parser, path)
+            )''')
+        self.db.execute('CREATE INDEX IF NOT EXISTS parsed_accessed ON parsed (accessed)')
+        self.db.commit()
+
+    @staticmethod
+    def file_key(path):
+        '''(size, mtime in ns) of a file'''
+        st = os.stat(path)
+        return st.st_size, st.st_mtime_ns
+
+    def entry_version(self, parser):
+        '''version of the entries of a parser (plugin version and parser schema)'''
+        return '{}:schema{}'.format(self.version, parser_schema(parser))
+
+    def get_many(self, parser, paths):
+        '''
+        looks up cached results
+        output:
+            {path: result} for the paths with a valid cache entry
+        '''
+        name, version, found, corrupt = parser_name(parser), self.entry_version(parser), dict(), []
+        for path in paths:
+            try:
+                size, mtime = self.file_key(path)
+            except OSError:
+                continue
+            row = self.db.execute(
+                'SELECT data FROM parsed WHERE parser=? AND path=? AND size=? AND mtime=? AND version=?',
+                (name, path, size, mtime, version)).fetchone()
+            if row is None:
+                continue
+            try:
+                found[path] = pickle.loads(zlib.decompress(row[0]))
+            except (zlib.error, pickle.UnpicklingError, EOFError, AttributeError, ImportError,
+                    IndexError, TypeError, ValueError) as e:
+                log.debug("Dropping unreadable SEGLH parse cache entry of {}: {}".format(path, e))
+                corrupt.append((name, path))
+        if corrupt:
+            self.db.executemany('DELETE FROM parsed WHERE parser=? AND path=?', corrupt)
+        if found:
+            now = time.time()
+            self.db.executemany('UPDATE parsed SET accessed=? WHERE parser=? AND path=?',
+                                [(now, name, path) for path in found])
+        if found or corrupt:
+            self.db.commit()
+        return found
+
+    def put_many(self, parser, results):
+        '''
+        stores parsed results and evicts old entries if the cache is too large
+        input:
+            results: {path: result}
+        '''
+        name, version, now, rows = parser_name(parser), self.entry_version(parser), time.time(), []
+        for path, result in results.items():
+            try:
+                size, mtime = self.file_key(path)
+            except OSError:
+                continue
+            data = zlib.compress(pickle.dumps(result, protocol=pickle.HIGHEST_PROTOCOL), 1)
+            rows.append((name, path, size, mtime, version, now, len(data), data))
+        self.db.executemany('INSERT OR REPLACE INTO parsed VALUES (?, ?, ?, ?, ?, ?, ?, ?)', rows)
+        self.db.commit()
+        self.evict()
+
+    def total_size(self):
+        return self.db.execute('SELECT COALESCE(SUM(nbytes), 0) FROM parsed').fetchone()[0]
+
+    def evict(self):
+        '''deletes least recently used entries until the cache fits max_size'''
+        excess = self.total_size() - self.max_size
+        if excess <= 0:
+            return
+        evicted, freed = [], 0
+        for parser, path, nbytes in self.db.execute('SELECT parser, path, nbytes FROM parsed ORDER BY accessed'):
+            if freed >= excess:
+                break
+            evicted.append((parser, path))
+            freed += nbytes
+        self.db.executemany('DELETE FROM parsed WHERE parser=? AND path=?', evicted)
+        self.db.commit()
+        log.debug("Evicted {} entries ({} bytes) from the SEGLH parse cache".format(len(evicted), freed))
@@ -14,3 +14,91 @@ disable_plugin = click.option('--disable-seglh-plugin', 'disable_plugin',
     is_flag = True,
     help = "Disable the SEGLH MultiQC plugin on this run"
 )
+
+# Sets config.kwargs['seglh_workers'] to the number of parser processes (1 if not specified)
+seglh_workers = click.option('--seglh-workers', 'seglh_workers',
+    type = int,
+    default = 1,
+    help = "Number of processes used to parse SEGLH input files (0 for all cores)"
+)
+
+# Sets config.kwargs['seglh_cache'] to True if specified (will be False otherwise)
+seglh_cache = click.option('--seglh-cache', 'seglh_cache',
+    is_flag = True,
+    help = "Cache parsed SEGLH input files (and TSO500 table headers) in the SEGLH cache directory"
+)
+
+# Sets config.kwargs['seglh_cache_dir'] to the parse cache location (default cache directory if not specified)
+seglh_cache_dir = click.option('--seglh-cache-dir', 'seglh_cache_dir',
+    type = click.Path(file_okay = False),
+    help = "Directory of the SEGLH parse cache, enables the cache (default ~/.cache/seglh_plugin)"
+)
+
+# Sets config.kwargs['seglh_no_cache'] to True if specified (will be False otherwise)
+seglh_no_cache = click.option('--seglh-no-cache', 'seglh_no_cache',
+    is_flag = True,
+    help = "Parse all SEGLH input files without using the parse cache"
+)
+
+# Sets config.kwargs['seglh_profile'] to True if specified (will be False otherwise)
+seglh_profile = click.option('--seglh-profile', 'seglh_profile',
+    is_flag = True,
+    help = "Record time and memory of each SEGLH module phase in seglh_profile.json"
+)
+
+# Sets config.kwargs['seglh_manifest'] to the manifest path (None if not specified)
+seglh_manifest = click.option('--seglh-manifest', 'seglh_manifest',
+    type = click.Path(exists = True, dir_okay = False),
+    help = "TSV or JSON list of (module, path, sample) SEGLH input files, matched without searching"
+)
+
+# Sets config.kwargs['seglh_incremental'] to the data directory of a previous report (None if not specified)
+seglh_incremental = click.option('--seglh-incremental', 'seglh_incremental',
+    type = click.Path(exists = True, file_okay = False),
+    help = "multiqc_data directory of a previous report to merge the SEGLH samples of this run into"
+)
+
+# Sets config.kwargs['seglh_conflict'] to the policy for samples in both runs ('new' if not specified)
+seglh_conflict = click.option('--seglh-conflict', 'seglh_conflict',
+    type = click.Choice(['new', 'old', 'error']),
+    default = 'new',
+    help = "Incremental mode: keep the 'new' or 'old' data of samples in both runs, or stop with an 'error'"
+)
+
+# Sets config.kwargs['seglh_history'] to the history store path (None if not specified)
+seglh_history = click.option('--seglh-history', 'seglh_history',
+    type = click.Path(dir_okay = False),
+    help = "SQLite file the SEGLH metrics of each run are recorded in, adds metric trend sections"
+)
+
+# Sets config.kwargs['seglh_run_id'] to the run identifier (absolute first analysis path if not specified)
+seglh_run_id = click.option('--seglh-run-id', 'seglh_run_id',
+    type = str,
+    help = "Run identifier used in the SEGLH history store (default: absolute path of the first analysis path)"
+)
+
+# Sets config.kwargs['seglh_data_format'] to the format of the SEGLH data files (config.data_format if not specified)
+seglh_data_format = click.option('--seglh-data-format', 'seglh_data_format',
+    type = click.Choice(['tsv', 'json', 'yaml', 'npz']),
+    help = "Format of the SEGLH module data files, npz is a compact binary numpy archive (default: --data-format)"
+)
+
+# Sets config.kwargs['seglh_shard'] to the shard of the inputs parsed on this node (all inputs if not specified)
+seglh_shard = click.option('--seglh-shard', 'seglh_shard',
+    type = str,
+    metavar = 'I/N',
+    help = "Only parse shard I of N of the SEGLH input files"
+)
+
+# Sets config.kwargs['seglh_shard_out'] to the shard file written by this run (None if not specified)
+seglh_shard_out = click.option('--seglh-shard-out', 'seglh_shard_out',
+    type = click.Path(dir_okay = False),
+    help = "Write the parsed SEGLH results to this shard file (gzip compressed JSON)"
+)
+
+# Sets config.kwargs['seglh_merge'] to the shard files merged in this run (empty if not specified)
+seglh_merge = click.option('--seglh-merge', 'seglh_merge',
+    type = click.Path(exists = True, dir_okay = False),
+    multiple = True,
+    help = "Shard file written with --seglh-shard-out to include in the report (can be repeated)"
+)
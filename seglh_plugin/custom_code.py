@@ -6,16 +6,23 @@ using the setuptools plugin hooks.
 """
 
 from __future__ import print_function
-from pkg_resources import get_distribution
 import logging
+import os
+import sys
 
 from multiqc.utils import report, util_functions, config
 
+from importlib.metadata import version, PackageNotFoundError
+
 # Initialise the main MultiQC logger
 log = logging.getLogger('multiqc')
 
 # Save this plugin's version number (defined in setup.py) to the MultiQC config
-config.seglh_plugin_version = get_distribution("seglh_plugin").version
+# (read from the package metadata, pkg_resources scans every installed distribution)
+try:
+    config.seglh_plugin_version = version("seglh_plugin")
+except PackageNotFoundError:
+    config.seglh_plugin_version = 'unknown'
 
 
 # Add default config options for the things that are used in MultiQC_NGI
@@ -33,6 +40,11 @@ def seglh_plugin_execution_start():
 
     log.info("Running SEGLH MultiQC Plugin v{}".format(config.seglh_plugin_version))
 
+    # Set up per phase timing and memory instrumentation
+    if config.kwargs.get('seglh_profile'):
+        from seglh_plugin.profiling import Profiler
+        config.seglh_profiler = Profiler()
+
     # Add to the main MultiQC config object.
     # User config files have already been loaded at this point
     #   so we check whether the value is already set. This is to avoid
@@ -56,8 +68,58 @@ def seglh_plugin_execution_start():
     if 'sambamba_chanjo' not in config.sp:
         config.update_dict( config.sp, { 'sambamba_chanjo': { 'fn': '*.gene_level.txt' } } )
 
+    # Hand the files listed in a manifest to MultiQC directly (matched without a search)
+    manifest_path = config.kwargs.get('seglh_manifest')
+    if manifest_path:
+        from seglh_plugin.manifest import load_manifest
+        try:
+            config.seglh_manifest = load_manifest(manifest_path)
+        except ValueError as e:
+            log.error("Invalid SEGLH manifest {}: {}".format(manifest_path, e))
+            sys.exit(1)
+        # the manifest itself may be given as the analysis path, so that no directory is walked
+        config.analysis_dir = [d for d in config.analysis_dir
+                               if os.path.abspath(d) != os.path.abspath(manifest_path)]
+        config.analysis_dir.extend(config.seglh_manifest)
+        log.info("Loaded {} files from SEGLH manifest {}".format(len(config.seglh_manifest), manifest_path))
+
+    # Parse a shard of the inputs, or merge the results of shard files
+    if config.kwargs.get('seglh_shard'):
+        from seglh_plugin.shard import parse_shard
+        try:
+            parse_shard(config.kwargs['seglh_shard'])
+        except ValueError as e:
+            log.error("Invalid --seglh-shard: {}".format(e))
+            sys.exit(1)
+    if config.kwargs.get('seglh_merge'):
+        from seglh_plugin.shard import load_shard
+        config.seglh_shards = dict()
+        for path in config.kwargs['seglh_merge']:
+            try:
+                config.seglh_shards[os.path.abspath(path)] = load_shard(path)
+            except (IOError, OSError, ValueError) as e:
+                log.error("Could not read SEGLH shard {}: {}".format(path, e))
+                sys.exit(1)
+        config.analysis_dir = list(config.analysis_dir) + list(config.seglh_shards)
+        config.log_filesize_limit = max([config.log_filesize_limit] + [os.path.getsize(p) for p in config.seglh_shards])
+        # a shard file holds the results of several modules
+        for key in ('tso500', 'sompy', 'exomedepth', 'sambamba_chanjo'):
+            if isinstance(config.sp.get(key), dict):
+                config.sp[key]['shared'] = True
+        log.info("Merging {} SEGLH shard files".format(len(config.seglh_shards)))
+
+    # Sample index joining the General Statistics columns of the modules (built as they run)
+    config.seglh_sample_index = None
+    # Samples in both the previous report and this run (--seglh-conflict error)
+    config.seglh_conflicts = []
+
+    # Match manifest files and compressed (.gz, .zst) inputs in the MultiQC file search
+    from seglh_plugin import search
+    search.install()
+
     # Some additional filename cleaning
     config.fn_clean_exts.extend([
+        '.zst',
         '.my_tool_extension',
         '.removeMetoo'
     ])
@@ -69,3 +131,51 @@ def seglh_plugin_execution_start():
         '*/my_awesome_pipeline/noisy_data/*',
         '*/my_awesome_pipeline/rubbish/*'
     ])
+
+
+def seglh_plugin_after_modules():
+    """ Code to execute after all modules have run, before the
+    General Statistics table is built.
+    """
+
+    # Halt execution if we've disabled the plugin
+    if config.kwargs.get('disable_plugin', True):
+        return None
+
+    # Stop on samples in both the previous report and this run (--seglh-conflict error),
+    # the modules only record them
+    if getattr(config, 'seglh_conflicts', None):
+        log.error("Stopping: samples of {} are in both the previous report and this run (--seglh-conflict error)".format(
+            ', '.join(module for module, _ in config.seglh_conflicts)))
+        sys.exit(1)
+
+    # One General Statistics row per sample with the key metrics of all SEGLH modules
+    from seglh_plugin.samples import add_general_stats_table
+    add_general_stats_table()
+
+
+def seglh_plugin_before_report_generation():
+    """ Code to execute after all modules have run, before the
+    report is generated (data files can still be added).
+    """
+
+    # Halt execution if we've disabled the plugin
+    if config.kwargs.get('disable_plugin', True):
+        return None
+
+    # Wait for the data files written in the background (errors are logged)
+    from seglh_plugin.writer import flush_data_files
+    flush_data_files()
+
+    # Keep the previous data of the modules without inputs in this run (--seglh-incremental)
+    from seglh_plugin.incremental import carry_forward
+    carry_forward()
+
+    # Write the parsed results of this run to a shard file
+    if config.kwargs.get('seglh_shard_out'):
+        from seglh_plugin.shard import write_shard
+        write_shard(config.kwargs['seglh_shard_out'])
+
+    # Write and summarise the instrumentation results
+    from seglh_plugin.profiling import write_profile
+    write_profile()
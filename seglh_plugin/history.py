@@ -0,0 +1,255 @@
+#!/usr/bin/env python
+""" Historical metrics store of the SEGLH modules
+
+With --seglh-history FILE the modules write the numeric per sample
+metrics of each run to a local SQLite database, identified by a run id
+(--seglh-run-id, the absolute path of the first analysis path by default)
+and the run date. In incremental mode only the samples parsed in this run
+are recorded. Values are indexed by metric, sample and date so the trend of a
+metric over the previous runs is queried without parsing old inputs.
+
+For the tracked metrics of a module (config.seglh_history_metrics) a
+Trends section shows the mean per run over the last runs
+(config.seglh_history_window) with control limits (mean +/- 3 SD of the
+sample values of these runs), and the samples of this run against them.
+"""
+
+from __future__ import print_function
+from collections import OrderedDict
+import datetime
+import logging
+import math
+import os
+import sqlite3
+import statistics
+
+from multiqc.utils import config
+
+# Initialise the main MultiQC logger
+log = logging.getLogger('multiqc')
+
+# metrics shown in the Trends section of each module (config.seglh_history_metrics overrides)
+DEFAULT_METRICS = {
+    'tso500': [
+        'CONTAMINATION_SCORE (NA)',
+        'COVERAGE_MAD (Count)',
+        'PCT_EXON_50X (%)',
+        'PCT_EXON_100X (%)',
+    ],
+    'exomedepth': [
+        'correlations',
+    ],
+}
+# number of previous runs the trends and control limits are based on
+DEFAULT_WINDOW = 20
+# width of the control limits in standard deviations
+CONTROL_SD = 3
+
+_history = None
+
+
+def get_history():
+    '''returns the shared HistoryStore, or None if not enabled with --seglh-history'''
+    global _history
+    path = config.kwargs.get('seglh_history')
+    if not path:
+        return None
+    if _history is None:
+        try:
+            _history = HistoryStore(path)
+        except (OSError, sqlite3.Error) as e:
+            log.warning("Could not open SEGLH history store {} ({})".format(path, e))
+            config.kwargs['seglh_history'] = None
+            return None
+    return _history
+
+
+def run_id():
+    '''
+    identifier of this run (--seglh-run-id or the absolute path of the first analysis path; its
+    name alone is not unique, e.g. every TSO500 run has a Results directory)
+    '''
+    if config.kwargs.get('seglh_run_id'):
+        return config.kwargs['seglh_run_id']
+    analysis_dir = list(config.analysis_dir or ['.'])
+    return os.path.abspath(analysis_dir[0])
+
+
+def run_date():
+    '''date of this run (fixed for the whole MultiQC run)'''
+    if not getattr(config, 'seglh_run_date', None):
+        config.seglh_run_date = datetime.datetime.now().replace(microsecond=0).isoformat()
+    return config.seglh_run_date
+
+
+def is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool) and not math.isnan(value)
+
+
+class HistoryStore(object):
+    '''SQLite store of per sample metric values of each run'''
+
+    def __init__(self, path):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self.db = sqlite3.connect(path)
+        self.db.execute('''
+            CREATE TABLE IF NOT EXISTS metrics (
+                run TEXT NOT NULL,
+                date TEXT NOT NULL,
+                module TEXT NOT NULL,
+                sample TEXT NOT NULL,
+                metric TEXT NOT NULL,
+                value REAL NOT NULL,
+                PRIMARY KEY (module, metric, sample, run)
+            )''')
+        # covers the trend queries (which are pinned to it)
+        self.db.execute('CREATE INDEX IF NOT EXISTS metrics_date ON metrics (module, metric, date, run, value)')
+        self.db.execute('CREATE INDEX IF NOT EXISTS metrics_sample ON metrics (sample, date)')
+        self.db.execute('CREATE INDEX IF NOT EXISTS metrics_run ON metrics (module, run)')
+        self.db.commit()
+
+    def record(self, module, run, date, samples):
+        '''
+        stores the numeric metrics of a run (replacing those of an earlier report of the same run)
+        input:
+            samples: {sample: {metric: value}}
+        '''
+        rows = [(run, date, module, sample, metric, value)
+                for sample, data in samples.items()
+                for metric, value in data.items() if is_number(value)]
+        self.db.execute('DELETE FROM metrics WHERE module=? AND run=?', (module, run))
+        self.db.executemany('INSERT OR REPLACE INTO metrics VALUES (?, ?, ?, ?, ?, ?)', rows)
+        self.db.commit()
+        return len(rows)
+
+    def runs(self, module, metric, exclude=None, limit=DEFAULT_WINDOW):
+        '''
+        previous runs of a metric, oldest first
+        output:
+            [(run, date, mean, samples)]
+        '''
+        rows = self.db.execute('''
+            SELECT run, MAX(date) AS run_date, AVG(value), COUNT(*) FROM metrics INDEXED BY metrics_date
+            WHERE module=? AND metric=? AND run!=?
+            GROUP BY run ORDER BY run_date DESC LIMIT ?''',
+            (module, metric, exclude or '', limit)).fetchall()
+        return rows[::-1]
+
+    def values(self, module, metric, runs):
+        '''all sample values of a metric in the given runs'''
+        if not runs:
+            return []
+        query = 'SELECT value FROM metrics INDEXED BY metrics_date WHERE module=? AND metric=? AND run IN ({})'.format(
+            ', '.join('?' * len(runs)))
+        return [row[0] for row in self.db.execute(query, [module, metric] + list(runs))]
+
+    def control_limits(self, module, metric, runs):
+        '''(mean, lower, upper) control limits from the sample values of the runs (None if too few)'''
+        values = self.values(module, metric, runs)
+        if len(values) < 2:
+            return None
+        mean, sd = statistics.fmean(values), statistics.stdev(values)
+        return mean, mean - CONTROL_SD * sd, mean + CONTROL_SD * sd
+
+
+def tracked_metrics(module):
+    '''metrics of a module shown in the Trends section'''
+    metrics = getattr(config, 'seglh_history_metrics', None) or dict()
+    return metrics.get(module, DEFAULT_METRICS.get(module, []))
+
+
+def add_history_sections(module, name, samples, run_samples=None):
+    '''
+    records the samples of this run in the history store and adds the Trends
+    section of the tracked metrics to a MultiqcModule
+    input:
+        module: MultiqcModule instance
+        name: module name (search pattern key)
+        samples: {sample: {metric: value}} of the module (with the samples of a previous report)
+        run_samples: names of the samples parsed in this run (all samples if None)
+    '''
+    history = get_history()
+    if history is None:
+        return
+    if run_samples is not None:
+        samples = dict((s, samples[s]) for s in run_samples if s in samples)
+    if not samples:
+        return
+    run, date = run_id(), run_date()
+    window = getattr(config, 'seglh_history_window', DEFAULT_WINDOW)
+
+    # query the previous runs before this run is recorded
+    metrics, trends, limits = [], dict(), dict()
+    for metric in tracked_metrics(name):
+        current = [data[metric] for data in samples.values() if is_number(data.get(metric))]
+        if not current:
+            continue
+        previous = history.runs(name, metric, exclude=run, limit=window)
+        metrics.append(metric)
+        trends[metric] = [(r, mean) for r, _, mean, _ in previous] + [(run, statistics.fmean(current))]
+        limits[metric] = history.control_limits(name, metric, [r for r, _, _, _ in previous])
+
+    n = history.record(name, run, date, samples)
+    log.debug("{}: recorded {} values of run {} in the history store".format(name, n, run))
+    if not metrics:
+        return
+
+    module.add_section(
+        name="Trends",
+        anchor="{}-trends".format(name),
+        description=("Mean per run of the last {} runs and this run ({}), with control limits "
+                     "(mean &plusmn; {} SD of the previous sample values)").format(window, run, CONTROL_SD),
+        plot=trend_plot(name, metrics, trends, limits),
+    )
+    module.add_section(
+        name="Control Limits",
+        anchor="{}-control-limits".format(name),
+        description="Samples of this run against the control limits of the previous runs (outside limits in red)",
+        plot=control_table(name, metrics, samples, limits),
+    )
+
+
+def trend_plot(name, metrics, trends, limits):
+    '''line graph of the mean per run of each metric, with its control limits'''
+    from multiqc.plots import linegraph
+    data, labels = [], []
+    for metric in metrics:
+        series = {'Run mean': OrderedDict(trends[metric])}
+        if limits[metric] is not None:
+            _, lower, upper = limits[metric]
+            series['Lower control limit'] = OrderedDict((r, lower) for r, _ in trends[metric])
+            series['Upper control limit'] = OrderedDict((r, upper) for r, _ in trends[metric])
+        data.append(series)
+        labels.append({'name': metric, 'ylab': metric})
+    pconfig = {
+        'id': '{}-trends-plot'.format(name),
+        'title': '{}: Trends'.format(name),
+        'xlab': 'Run',
+        'categories': True,
+        'data_labels': labels,
+        'colors': {'Lower control limit': '#d9534f', 'Upper control limit': '#d9534f'},
+    }
+    return linegraph.plot(data, pconfig)
+
+
+def control_table(name, metrics, samples, limits):
+    '''table of the tracked metrics of this run, values outside the control limits highlighted'''
+    from seglh_plugin import tables
+    headers = OrderedDict()
+    for metric in metrics:
+        headers[metric] = {'title': metric, 'description': metric, 'scale': False}
+        if limits[metric] is not None:
+            mean, lower, upper = limits[metric]
+            headers[metric]['description'] = '{} (mean {:.4g}, control limits {:.4g} - {:.4g})'.format(
+                metric, mean, lower, upper)
+            headers[metric]['cond_formatting_rules'] = {'out': [{'lt': lower}, {'gt': upper}]}
+            headers[metric]['cond_formatting_colours'] = [{'out': '#d9534f'}]
+    data = dict((sample, dict((m, values[m]) for m in metrics if m in values)) for sample, values in samples.items())
+    table_config = {
+        'namespace': name,
+        'id': '{}-control-limits-table'.format(name),
+        'table_title': '{} Control Limits'.format(name),
+        'no_beeswarm': True,
+    }
+    return tables.plot(data, headers, table_config)
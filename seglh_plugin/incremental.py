@@ -0,0 +1,159 @@
+#!/usr/bin/env python
+""" Incremental mode: merges new runs into the data of a previous report
+
+With --seglh-incremental DIR the SEGLH modules load the data files they
+wrote to a previous multiqc_data directory (tsv, json or yaml) and merge
+the samples parsed in this run into them, so only the new inputs are
+parsed. Samples present in both are resolved with --seglh-conflict:
+    new     the sample of this run replaces the previous one (default)
+    old     the previous sample is kept
+    error   the run is stopped once all modules have run (after_modules hook)
+The merged data is written to the new data directory, so it can be the
+previous report of the next increment. The previous data files of modules
+without inputs in this run are copied to the new data directory unchanged.
+"""
+
+from __future__ import print_function
+import io
+import json
+import logging
+import os
+import shutil
+
+from multiqc.utils import config
+from seglh_plugin.parsers.columns import NA_VALUES, convert_value
+
+# Initialise the main MultiQC logger
+log = logging.getLogger('multiqc')
+
+CONFLICT_POLICIES = ('new', 'old', 'error')
+# extensions of the write_data_file formats, in order of preference
+DATA_FILE_EXTS = ('txt', 'json', 'yaml', 'npz')
+# missing values in tsv data files (None is written as text)
+MISSING = NA_VALUES | frozenset(['None'])
+# data files merged by each module (the first one is written whenever the module runs)
+MODULE_DATA_FILES = (
+    ('tso500', ('multiqc_tso500', 'multiqc_tso500_metrics')),
+    ('sompy', ('multiqc_sompy',)),
+    ('exomedepth', ('multiqc_exomedepth',)),
+    ('sambamba_chanjo', ('multiqc_sambamba_chanjo',)),
+)
+
+
+def read_tsv(fh):
+    '''reads a tsv data file to {sample: {column: value}}, values typed, missing values dropped'''
+    data = dict()
+    header = fh.readline().rstrip('\r\n').split('\t')
+    for line in fh:
+        fields = line.rstrip('\r\n').split('\t')
+        if not fields[0]:
+            continue
+        data[fields[0]] = {name: convert_value(x, int) for name, x in zip(header[1:], fields[1:])
+                           if x not in MISSING}
+    return data
+
+
+def read_data_file(path):
+    '''reads a data file written by write_data_file'''
+    if path.endswith('.npz'):
+        from seglh_plugin.writer import read_npz
+        return read_npz(path)
+    with io.open(path, 'r', encoding='utf-8') as fh:
+        if path.endswith('.json'):
+            return json.load(fh)
+        if path.endswith('.yaml'):
+            import yaml
+            return yaml.safe_load(fh) or dict()
+        return read_tsv(fh)
+
+
+def data_file_path(directory, name):
+    '''path of a data file in any of the write_data_file formats (None if not found)'''
+    for ext in DATA_FILE_EXTS:
+        path = os.path.join(directory, '{}.{}'.format(name, ext))
+        if os.path.isfile(path):
+            return path
+    return None
+
+
+def previous_data(name):
+    '''
+    loads a data file of the previous report
+    input:
+        name: data file name without extension (e.g. multiqc_sompy)
+    output:
+        {sample: {column: value}}, None if not in incremental mode or not found
+    '''
+    directory = config.kwargs.get('seglh_incremental')
+    if not directory:
+        return None
+    path = data_file_path(directory, name)
+    if path is not None:
+        data = read_data_file(path)
+        log.debug("Loaded {} previous records from {}".format(len(data), path))
+        return data
+    log.debug("No previous {} data file in {}".format(name, directory))
+    return None
+
+
+def resolve(module, previous, current):
+    '''
+    applies the conflict policy to the samples of the previous report and this run
+    input:
+        module: module name (for logging)
+        previous, current: sample names
+    output:
+        set of the previous samples to keep
+    '''
+    policy = config.kwargs.get('seglh_conflict') or 'new'
+    conflicts = [s for s in previous if s in current]
+    if conflicts:
+        if policy == 'error':
+            # recorded for the after_modules hook (MultiQC catches any exit raised in a module)
+            log.error("{}: {} samples are in both the previous report and this run: {}".format(
+                module, len(conflicts), ', '.join(conflicts)))
+            config.seglh_conflicts = getattr(config, 'seglh_conflicts', []) + [(module, conflicts)]
+            return set(s for s in previous if s not in current)
+        log.info("{}: {} samples are in both the previous report and this run, keeping the {} data".format(
+            module, len(conflicts), policy))
+    if policy == 'old':
+        return set(previous)
+    return set(s for s in previous if s not in current)
+
+
+def run_samples(previous, current):
+    '''
+    samples of this run whose data is kept when merged with the previous report
+    (all of them, except those also in the previous report with --seglh-conflict old)
+    '''
+    if previous and (config.kwargs.get('seglh_conflict') or 'new') == 'old':
+        return [s for s in current if s not in previous]
+    return list(current)
+
+
+def merge_samples(module, previous, current):
+    '''
+    merges {sample: data} of the previous report and this run
+    (previous samples first, in their original order)
+    '''
+    keep = resolve(module, previous, current)
+    merged = dict((s, previous[s] if s in keep else current[s]) for s in previous)
+    merged.update((s, data) for s, data in current.items() if s not in merged)
+    log.info("{}: merged {} previous and {} new samples".format(
+        module, len(previous), len(merged) - len(previous)))
+    return merged
+
+
+def carry_forward():
+    '''copies the previous data files of the modules that did not run to the new data directory'''
+    directory = config.kwargs.get('seglh_incremental')
+    if not directory or config.data_dir is None:
+        return
+    for module, names in MODULE_DATA_FILES:
+        if data_file_path(config.data_dir, names[0]) is not None:
+            continue
+        for name in names:
+            path = data_file_path(directory, name)
+            if path is not None:
+                shutil.copy(path, config.data_dir)
+                log.info("{}: no inputs in this run, kept the previous {}".format(module, os.path.basename(path)))
@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+""" Manifest of SEGLH input files
+
+A manifest (--seglh-manifest) lists the files produced by the pipeline as
+(module, path, sample) entries, either as a TSV file (optional header
+line, '#' comments, sample column optional) or as a JSON list of objects
+with the same keys. Relative paths are resolved against the directory of
+the manifest. Listed files are handed to MultiQC as search paths and are
+matched to their module without any filename or contents search.
+"""
+
+from __future__ import print_function
+import io
+import json
+import logging
+import os
+
+# Initialise the main MultiQC logger
+log = logging.getLogger('multiqc')
+
+# search pattern keys of the SEGLH modules
+MODULES = ('tso500', 'sompy', 'exomedepth', 'sambamba_chanjo')
+FIELDS = ('module', 'path', 'sample')
+
+
+def read_entries(fh):
+    '''reads the raw (module, path, sample) entries of a JSON or TSV manifest'''
+    text = fh.read()
+    if text.lstrip().startswith('['):
+        try:
+            records = json.loads(text)
+        except ValueError as e:
+            raise ValueError("invalid JSON manifest ({})".format(e))
+        for i, record in enumerate(records, 1):
+            if not isinstance(record, dict):
+                raise ValueError("entry {} is not an object".format(i))
+            yield i, record.get('module'), record.get('path'), record.get('sample')
+        return
+    for i, line in enumerate(text.splitlines(), 1):
+        if not line.strip() or line.startswith('#'):
+            continue
+        fields = line.rstrip('\r\n').split('\t')
+        if fields[0] == 'module':
+            continue
+        if len(fields) < 2:
+            raise ValueError("line {} has fewer than 2 columns".format(i))
+        yield i, fields[0], fields[1], fields[2] if len(fields) > 2 else None
+
+
+def load_manifest(path):
+    '''
+    reads a manifest file
+    input:
+        path: TSV or JSON manifest
+    output:
+        {absolute path: (module, sample)} in manifest order, sample None if not given
+    '''
+    root = os.path.dirname(os.path.abspath(path))
+    entries = dict()
+    with io.open(path, 'r', encoding='utf-8') as fh:
+        for i, module, file_path, sample in read_entries(fh):
+            if module not in MODULES:
+                raise ValueError("entry {}: unknown module '{}' (expected one of {})".format(
+                    i, module, ', '.join(MODULES)))
+            if not file_path:
+                raise ValueError("entry {}: no path".format(i))
+            file_path = os.path.abspath(os.path.join(root, file_path))
+            if not os.path.isfile(file_path):
+                log.warning("SEGLH manifest: skipping missing file {}".format(file_path))
+                continue
+            entries[file_path] = (module, sample or None)
+    return entries
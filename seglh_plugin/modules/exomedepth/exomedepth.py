@@ -7,10 +7,16 @@ from __future__ import print_function
 from collections import OrderedDict, defaultdict
 import logging
 import os
-import re
 from multiqc import config
-from multiqc.plots import table
 from multiqc.modules.base_module import BaseMultiqcModule
+from seglh_plugin.history import add_history_sections
+from seglh_plugin.incremental import merge_samples, previous_data, run_samples
+from seglh_plugin.parallel import parse_log_files
+from seglh_plugin.profiling import count, phase
+from seglh_plugin.samples import add_general_stats
+from seglh_plugin import tables
+from seglh_plugin.parsers.exomedepth import parse_read_count
+from seglh_plugin.writer import write_data_file
 
 # Initialise the main MultiQC logger
 log = logging.getLogger('multiqc')
@@ -90,6 +96,9 @@ class MultiqcModule(BaseMultiqcModule):
         },
     }
 
+    # metrics of each sample shown in General Statistics
+    general_stats_metrics = ['refsamples', 'correlations']
+
     def __init__(self):
         # Halt execution if we've disabled the plugin
         if config.kwargs.get('disable_plugin', True):
@@ -107,8 +116,11 @@ class MultiqcModule(BaseMultiqcModule):
         # Find and load any input files for this module
         self.ed_data_samples = dict()
         self.source_files = dict()
-        for f in self.find_log_files('exomedepth'):
-            self.parse_file(f)
+        for f, parsed in parse_log_files(self, 'exomedepth', parse_read_count):
+            if parsed and not any(parsed.values()):
+                log.warning("No header line in {}, samples are listed without metrics".format(
+                    os.path.join(f['root'], f['fn'])))
+            self.ed_data_samples.update(parsed)
             self.add_data_source(
                 s_name=f['s_name'],
                 source=os.path.join(f['root'],f['fn']),
@@ -116,8 +128,18 @@ class MultiqcModule(BaseMultiqcModule):
                 section="exomedepth-bysample",
             )
 
+        # Merge the samples of a previous report (--seglh-incremental)
+        with phase('exomedepth', 'load_previous'):
+            previous = previous_data('multiqc_exomedepth')
+        # only the samples of this run are recorded in the history store
+        self.ed_run_samples = run_samples(previous, self.ed_data_samples)
+        if previous:
+            self.ed_data_samples = merge_samples('exomedepth', previous, self.ed_data_samples)
+
         # Filter out samples matching ignored sample names
-        self.ed_data_samples = self.ignore_samples(self.ed_data_samples)
+        with phase('exomedepth', 'ignore_samples'):
+            self.ed_data_samples = self.ignore_samples(self.ed_data_samples)
+        count('exomedepth', samples=len(self.ed_data_samples))
 
         # Nothing found - raise a UserWarning to tell MultiQC
         if len(self.ed_data_samples) == 0:
@@ -126,17 +148,29 @@ class MultiqcModule(BaseMultiqcModule):
 
         log.info("Found {} reports".format(len(self.ed_data_samples)))
 
-        # Write parsed report data to a file
-        self.write_data_file(self.ed_data_samples, 'multiqc_exomedepth')
-        
+        # Write parsed report data to a file (in the background)
+        with phase('exomedepth', 'write_data_file'):
+            write_data_file(self, self.ed_data_samples, 'multiqc_exomedepth')
+
+        # Add the reference set size and correlation to the General Statistics table
+        # (joined with the other SEGLH modules by sample)
+        headers = OrderedDict((metric, dict(self.ed_metric_configs[metric])) for metric in self.general_stats_metrics)
+        add_general_stats(self, 'exomedepth', self.ed_data_samples, headers)
+
         # write data table
+        with phase('exomedepth', 'sample_stats_table'):
+            plot = self.sample_stats_table()
         self.add_section(
             name="Sample Statistics",
             anchor="exomedepth-bysample",
             description="ExomeDepth metrics for each sample",
-            plot=self.sample_stats_table(),
+            plot=plot,
         )
 
+        # Record the run in the history store and show the metric trends (--seglh-history)
+        with phase('exomedepth', 'history'):
+            add_history_sections(self, 'exomedepth', self.ed_data_samples, self.ed_run_samples)
+
     def sample_stats_table(self):
         '''
         create a table with the sample statistics
@@ -167,36 +201,4 @@ class MultiqcModule(BaseMultiqcModule):
             "no_beeswarm": False,
         }
 
-        return table.plot(self.ed_data_samples, headers, table_config)
-
-
-    def parse_file(self, f):
-        '''Parses the Metrics output file
-	CSV file from ReadCount step that contains a header and 1 row per sample
-
-        input:
-            f: file handle
-        output:
-            None
-        
-        '''
-        metrics_header, skipped = [], 0
-        for i, line in enumerate(f['f'].splitlines()):
-            # match data block header
-            m = re.match(r'^\[(.*)\]\s*$', line)
-            if line.startswith('#') or len(line) == 0 or re.match(r'^\s+$',line):
-                # skipped line (comment or empty) 
-                skipped += 1
-                continue
-            elif i-skipped == 0 and line.startswith('sample'):
-                # is the header line
-                metrics_header = line.rstrip().split('\t')
-            else:
-                # parse data
-                f = line.rstrip().split('\t')
-                m = re.match(r'^([^_]+_\d{2}_[^_]+_\w{2}_[MFU]_[^_]+_Pan\d+)',f[0])
-                if m:
-                    sample = m.group(1)
-                    if sample not in self.ed_data_samples:
-                        self.ed_data_samples[sample] = dict()
-                    self.ed_data_samples[sample] = dict(zip(metrics_header[1:], f[1:]))
+        return tables.plot(self.ed_data_samples, headers, table_config)
@@ -0,0 +1,140 @@
+#!/usr/bin/env python
+
+""" Columnar gene x sample coverage store for the sambamba_chanjo module """
+
+from __future__ import print_function
+import warnings
+import numpy as np
+
+# float32 holds ~7 significant digits, enough for 4 decimals of a percentage
+DECIMALS = 4
+
+
+class CoverageMatrix(object):
+    '''
+    Gene x sample coverage values in a single float32 array.
+    Genes are interned in one index shared by all samples (row per gene),
+    each sample owns a column. Missing values are NaN.
+    '''
+
+    def __init__(self, n_genes=1024, n_samples=16):
+        self.gene_index = dict()
+        self.genes = []
+        self.sample_index = dict()
+        self.samples = []
+        self.values = np.full((n_genes, n_samples), np.nan, dtype=np.float32)
+
+    def __len__(self):
+        return len(self.samples)
+
+    @property
+    def shape(self):
+        return len(self.genes), len(self.samples)
+
+    def gene_row(self, gene):
+        '''returns the row of a gene, adding it to the index if new'''
+        try:
+            return self.gene_index[gene]
+        except KeyError:
+            row = self.gene_index[gene] = len(self.genes)
+            self.genes.append(gene)
+            return row
+
+    def sample_column(self, sample):
+        '''returns the (cleared) column of a sample, adding it if new'''
+        try:
+            col = self.sample_index[sample]
+        except KeyError:
+            col = self.sample_index[sample] = len(self.samples)
+            self.samples.append(sample)
+        self._reserve(len(self.genes), len(self.samples))
+        self.values[:, col] = np.nan
+        return col
+
+    def add_column(self, sample, rows, values):
+        '''
+        sets the coverage values of a sample in one vectorised assignment
+        rows: gene rows as returned by gene_row (array('q'))
+        values: coverage values (array('f'))
+        '''
+        col = self.sample_column(sample)
+        if len(rows):
+            self.values[np.frombuffer(rows, dtype=np.int64), col] = np.frombuffer(values, dtype=np.float32)
+
+    def subset(self, samples):
+        '''keeps only the given samples (in the given order)'''
+        cols = [self.sample_index[s] for s in samples]
+        self.values = self.values[:len(self.genes), cols]
+        self.samples = list(samples)
+        self.sample_index = {s: i for i, s in enumerate(self.samples)}
+
+    def matrix(self):
+        '''returns the populated genes x samples view of the array'''
+        return self.values[:len(self.genes), :len(self.samples)]
+
+    def to_table(self):
+        '''(samples, genes, samples x genes values, None) for the npz data format (NaN = missing)'''
+        values = np.round(self.matrix().astype(np.float64), DECIMALS).T
+        return list(self.samples), list(self.genes), values, None
+
+    def sorted_genes(self):
+        return sorted(self.genes)
+
+    def to_dict(self):
+        '''
+        returns {sample: {gene: coverage}} for small tables and multiqc_data.json,
+        built column by column in a single pass (missing values are left out)
+        '''
+        data = dict()
+        values = np.round(self.matrix().astype(np.float64), DECIMALS)
+        present = ~np.isnan(values)
+        genes = self.genes
+        for col, sample in enumerate(self.samples):
+            rows = np.flatnonzero(present[:, col])
+            data[sample] = dict(zip([genes[r] for r in rows], values[rows, col].tolist()))
+        return data
+
+    def sample_percentiles(self, percentiles):
+        '''returns a (percentiles x samples) float64 array of coverage percentiles (rounded to DECIMALS)'''
+        with warnings.catch_warnings():
+            # samples without any gene rows yield NaN
+            warnings.simplefilter('ignore', RuntimeWarning)
+            quantiles = np.nanpercentile(self.matrix(), percentiles, axis=0)
+        # float32 results would be exported as e.g. 90.80999755859375
+        return np.round(quantiles.astype(np.float64), DECIMALS)
+
+    def genes_below(self, threshold):
+        '''returns the number of genes below threshold for each sample'''
+        return np.count_nonzero(self.matrix() < threshold, axis=0)
+
+    def worst_genes(self, n, threshold):
+        '''
+        returns the n genes with the lowest mean coverage across samples as
+        [(gene, mean, minimum, samples below threshold), ...]
+        '''
+        values = self.matrix()
+        present = ~np.isnan(values)
+        counts = present.sum(axis=1)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            means = np.where(present, values, 0).sum(axis=1) / counts
+        minima = np.where(present, values, np.inf).min(axis=1, initial=np.inf)
+        below = np.count_nonzero(values < threshold, axis=1)
+        # genes without any values sort last
+        means = np.where(counts > 0, means, np.inf)
+        n = min(n, len(self.genes))
+        if n <= 0:
+            return []
+        rows = np.argpartition(means, n - 1)[:n] if n < len(means) else np.arange(len(means))
+        rows = rows[np.argsort(means[rows], kind='stable')]
+        return [(self.genes[r], round(float(means[r]), DECIMALS), round(float(minima[r]), DECIMALS), int(below[r]))
+                for r in rows if counts[r] > 0]
+
+    def _reserve(self, n_genes, n_samples):
+        '''grows the array (doubling) to hold at least n_genes x n_samples'''
+        rows, cols = self.values.shape
+        if n_genes <= rows and n_samples <= cols:
+            return
+        grown = np.full((rows if n_genes <= rows else max(n_genes, rows * 2),
+                         cols if n_samples <= cols else max(n_samples, cols * 2)), np.nan, dtype=np.float32)
+        grown[:rows, :cols] = self.values
+        self.values = grown
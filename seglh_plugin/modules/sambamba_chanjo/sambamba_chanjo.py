@@ -3,27 +3,48 @@
 """ MultiQC example plugin module """
 
 from __future__ import print_function
-from collections import OrderedDict, defaultdict
+from array import array
+from collections import OrderedDict
+import fnmatch
 import logging
 import os
-import re
 from multiqc import config
-from multiqc.plots import table
 from multiqc.modules.base_module import BaseMultiqcModule
+from seglh_plugin.incremental import previous_data, resolve
+from seglh_plugin.parallel import parse_log_files
+from seglh_plugin.profiling import count, phase
+from seglh_plugin.samples import add_general_stats
+from seglh_plugin import tables
+from seglh_plugin.parsers import open_text, read_errors
+from seglh_plugin.parsers.sambamba_chanjo import PanelFilter, parse_gene_level, read_panel
+from seglh_plugin.writer import write_data_file
 
 # Initialise the main MultiQC logger
 log = logging.getLogger('multiqc')
 
-def autocast(x):
-    '''automatically typecasts numerical values to int or float'''
-    if re.match('^(\d+)\.(\d+)$', x):
-        return float(x)
-    elif re.match('^(\d+)$', x):
-        return int(x)
-    else:
-        return x
-    
+
+def ordinal(n):
+    '''English ordinal of a number (1st, 2nd, 3rd, 11th, 22nd, 97.5th)'''
+    if n != int(n):
+        return '{}th'.format(n)
+    n = int(n)
+    suffix = 'th' if n % 100 in (11, 12, 13) else {1: 'st', 2: 'nd', 3: 'rd'}.get(n % 10, 'th')
+    return '{}{}'.format(n, suffix)
+
+
 class MultiqcModule(BaseMultiqcModule):
+    # defaults for the sambamba_chanjo_config section of the MultiQC config
+    sambamba_chanjo_defaults = {
+        'coverage_threshold': 100,
+        'percentiles': [5, 25, 50, 75],
+        'worst_genes': 20,
+        'full_table': False,
+        # gene list or BED file restricting the genes of all samples
+        'panel': None,
+        # {sample name pattern: gene list or BED file}, first match overrides panel
+        'sample_panels': {},
+    }
+
     def __init__(self):
         # Halt execution if we've disabled the plugin
         if config.kwargs.get('disable_plugin', True):
@@ -38,55 +59,230 @@ class MultiqcModule(BaseMultiqcModule):
             info = "sambamba_chanjo gene level coverage."
         )
 
-        # Find and load any input files for this module
-        self.sambamba_chanjo_data_samples = dict()
+        self.chanjo_config = dict(self.sambamba_chanjo_defaults)
+        self.chanjo_config.update(getattr(config, 'sambamba_chanjo_config', None) or {})
+        self.sambamba_chanjo_panels = dict()
+        use_panels = self.chanjo_config['panel'] or self.chanjo_config['sample_panels']
+
+        # Read the panel files before any input (the module stops if one can not be read)
+        if use_panels and not self.load_panels():
+            raise UserWarning
+
+        # Find and load any input files for this module (numpy is only imported once the module runs)
+        # (genes outside the panel of a sample are dropped while parsing)
+        from .matrix import CoverageMatrix
+        self.sambamba_chanjo_matrix = CoverageMatrix()
         self.source_files = dict()
-        self.sambamba_chanjo_data_groups = defaultdict(list)
-        for f in self.find_log_files('sambamba_chanjo'):
-            self.sambamba_chanjo_data_samples[f['s_name']]= {}
-            self.parse_file(f)
+        for f, parsed in parse_log_files(self, 'sambamba_chanjo', parse_gene_level,
+                                         parser_for=self.parser_for if use_panels else None):
+            self.merge_parsed(f['s_name'], parsed)
             self.add_data_source(
                 s_name=f['s_name'],
                 source=os.path.join(f['root'],f['fn']),
                 module="sambamba_chanjo",
-                section="sambamba_chanjo-bysample",
+                section="sambamba_chanjo-summary",
             )
 
+        # Merge the samples of a previous report (--seglh-incremental)
+        with phase('sambamba_chanjo', 'load_previous'):
+            previous = previous_data('multiqc_sambamba_chanjo')
+            if previous:
+                current = set(self.sambamba_chanjo_matrix.samples)
+                for s_name in resolve('sambamba_chanjo', previous, current):
+                    genes = previous[s_name]
+                    panel = self.panel_for(s_name) if use_panels else None
+                    if panel is not None:
+                        genes = dict((g, v) for g, v in genes.items() if g in panel.genes)
+                    self.merge_parsed(s_name, (list(genes), array('f', genes.values())))
+                log.info("sambamba_chanjo: merged {} previous and {} new samples".format(
+                    len(previous), len(current.difference(previous))))
+
         # Filter out samples matching ignored sample names
-        self.sambamba_chanjo_data_samples = self.ignore_samples(self.sambamba_chanjo_data_samples)
-        
+        with phase('sambamba_chanjo', 'ignore_samples'):
+            kept_samples = self.ignore_samples(dict.fromkeys(self.sambamba_chanjo_matrix.samples))
+            self.sambamba_chanjo_matrix.subset(list(kept_samples))
+        count('sambamba_chanjo', samples=len(self.sambamba_chanjo_matrix),
+              genes=len(self.sambamba_chanjo_matrix.genes))
+
         # Nothing found - raise a UserWarning to tell MultiQC
-        if len(self.sambamba_chanjo_data_samples) == 0:
+        if len(self.sambamba_chanjo_matrix) == 0:
             log.debug("Could not find any Sambamba_chanjo reports in {}".format(config.analysis_dir))
             raise UserWarning
 
-        log.info("Found {} reports".format(len(self.sambamba_chanjo_data_samples)))
+        log.info("Found {} reports".format(len(self.sambamba_chanjo_matrix)))
+
+        # Write parsed report data to a file in the background (written from the matrix, without a
+        # {sample: {gene: coverage}} copy)
+        with phase('sambamba_chanjo', 'write_data_file'):
+            write_data_file(self, None, 'multiqc_sambamba_chanjo', table=self.sambamba_chanjo_matrix)
 
-        # Write parsed report data to a file
-        self.write_data_file(self.sambamba_chanjo_data_samples, 'multiqc_sambamba_chanjo')
+        # create the coverage summary tables
+        threshold = self.chanjo_config['coverage_threshold']
+        with phase('sambamba_chanjo', 'sample_summary_table'):
+            plot = self.sample_summary_table()
+        self.add_section(
+            name="Coverage Summary",
+            anchor="sambamba_chanjo-summary",
+            description="Distribution of gene coverage for each sample and number of genes below {}%".format(threshold),
+            plot=plot,
+        )
+        # Add the median coverage and genes below threshold to the General Statistics table
+        # (joined with the other SEGLH modules by sample)
+        self.general_stats()
 
-        # create the result table
+        with phase('sambamba_chanjo', 'worst_genes_table'):
+            plot = self.worst_genes_table()
         self.add_section(
-            name="Gene Level Coverage",
-            anchor="sambamba_chanjo-bysample",
-            description="Coverage metrics for each sample based on target assay",
-            plot=self.sample_stats_table(),
+            name="Worst Covered Genes",
+            anchor="sambamba_chanjo-worst-genes",
+            description="The {} genes with the lowest mean coverage across all samples".format(
+                self.chanjo_config['worst_genes']),
+            plot=plot,
+        )
+
+        # create the full gene level table (one column per gene)
+        if self.chanjo_config['full_table']:
+            with phase('sambamba_chanjo', 'sample_stats_table'):
+                plot = self.sample_stats_table()
+            self.add_section(
+                name="Gene Level Coverage",
+                anchor="sambamba_chanjo-bysample",
+                description="Coverage metrics for each sample based on target assay",
+                plot=plot,
             )
-        
+
+    def sample_summary_table(self):
+        '''
+        create a table with coverage percentiles and genes below threshold per sample
+        '''
+        matrix = self.sambamba_chanjo_matrix
+        percentiles = self.chanjo_config['percentiles']
+        threshold = self.chanjo_config['coverage_threshold']
+        # the median is also computed for General Statistics
+        quantiles = matrix.sample_percentiles(percentiles if 50 in percentiles else list(percentiles) + [50])
+        below = matrix.genes_below(threshold)
+
+        headers = OrderedDict()
+        for p in percentiles:
+            headers['p{}'.format(p)] = {
+                "title": "Median" if p == 50 else "{} pct".format(ordinal(p)),
+                "description": "{} percentile of gene coverage".format(ordinal(p)),
+                "suffix": "%",
+                "min": 0,
+                "max": 100,
+                "format": "{:.1f}",
+                "scale": "RdYlGn",
+            }
+        headers['below'] = {
+            "title": "Genes < {}%".format(threshold),
+            "description": "Number of genes with coverage below {}%".format(threshold),
+            "format": "{:,.0f}",
+            "scale": "Reds",
+        }
+
+        data = dict()
+        for col, sample in enumerate(matrix.samples):
+            data[sample] = {'p{}'.format(p): float(quantiles[i, col]) for i, p in enumerate(percentiles)}
+            data[sample]['p50'] = float(quantiles[list(percentiles).index(50) if 50 in percentiles else -1, col])
+            data[sample]['below'] = int(below[col])
+        self.sambamba_chanjo_summary = data
+
+        # Table config
+        table_config = {
+            "namespace": "sambamba_chanjo",
+            "id": "sambamba_chanjo-summary-table",
+            "table_title": "Sambamba_chanjo coverage summary",
+            "no_beeswarm": True,
+        }
+
+        return tables.plot(data, headers, table_config)
+
+    def general_stats(self):
+        '''
+        add the median gene coverage and number of genes below threshold of each sample to General Statistics
+        '''
+        threshold = self.chanjo_config['coverage_threshold']
+        headers = OrderedDict()
+        headers['p50'] = {
+            "title": "Median coverage",
+            "description": "Median gene coverage",
+            "suffix": "%",
+            "min": 0,
+            "max": 100,
+            "format": "{:.1f}",
+            "scale": "RdYlGn",
+        }
+        headers['below'] = {
+            "title": "Genes < {}%".format(threshold),
+            "description": "Number of genes with coverage below {}%".format(threshold),
+            "format": "{:,.0f}",
+            "scale": "Reds",
+        }
+        add_general_stats(self, 'sambamba_chanjo', self.sambamba_chanjo_summary, headers)
+
+    def worst_genes_table(self):
+        '''
+        create a table of the genes with the lowest mean coverage across the run
+        '''
+        from multiqc.plots import table
+        matrix = self.sambamba_chanjo_matrix
+        threshold = self.chanjo_config['coverage_threshold']
+
+        headers = OrderedDict()
+        headers['mean'] = {
+            "title": "Mean",
+            "description": "Mean coverage across samples",
+            "suffix": "%",
+            "min": 0,
+            "max": 100,
+            "format": "{:.1f}",
+            "scale": "RdYlGn",
+        }
+        headers['min'] = {
+            "title": "Minimum",
+            "description": "Lowest coverage of any sample",
+            "suffix": "%",
+            "min": 0,
+            "max": 100,
+            "format": "{:.1f}",
+            "scale": "RdYlGn",
+        }
+        headers['below'] = {
+            "title": "Samples < {}%".format(threshold),
+            "description": "Number of samples with coverage below {}%".format(threshold),
+            "format": "{:,.0f}",
+            "scale": "Reds",
+        }
+
+        data = OrderedDict()
+        for gene, mean, minimum, below in matrix.worst_genes(self.chanjo_config['worst_genes'], threshold):
+            data[gene] = {'mean': mean, 'min': minimum, 'below': below}
+
+        # Table config
+        table_config = {
+            "namespace": "sambamba_chanjo",
+            "id": "sambamba_chanjo-worst-genes-table",
+            "table_title": "Sambamba_chanjo worst covered genes",
+            "col1_header": "Gene",
+            "sortRows": False,
+            "no_beeswarm": True,
+        }
+
+        return table.plot(data, headers, table_config)
+
     def sample_stats_table(self):
         '''
-        create a table with the sample statistics
+        create a table with the sample statistics (one column per gene)
         '''
         headers = OrderedDict()
-        for samples in self.sambamba_chanjo_data_samples:
-            for gene in sorted(self.sambamba_chanjo_data_samples[samples]):
-                headers[gene] = {
+        for gene in self.sambamba_chanjo_matrix.sorted_genes():
+            headers[gene] = {
                 "title": gene,
                 "description": "percentage genes covered at target coverage",
                 "hidden": False,
                 'scale': 'BuGn',
             }
-        
+
         # Table config
         table_config = {
             "namespace": "sambamba_chanjo",
@@ -95,28 +291,55 @@ class MultiqcModule(BaseMultiqcModule):
             "no_beeswarm": True,
         }
 
-        return table.plot(self.sambamba_chanjo_data_samples, headers, table_config)       
+        return tables.plot(None, headers, table_config, table=self.sambamba_chanjo_matrix)
 
-    def parse_file(self, f):
-        '''Parses the Metrics output file
-        CSV file with header, one row per variant type
-
-        input:
-            f: file handle
+    def load_panels(self):
+        '''Reads the genes of the panel files of the config (once per file)
         output:
-            None
+            True if all panels could be read (errors are logged)
         '''
-        for line in f['f'].splitlines():
-            #check if its the correct file
-            if line.startswith('gene symbol'):
-                continue
-            #
-            elif line.startswith('#') or len(line) == 0 or re.match(r'^\s+$',line):
-                # comment or empty line (reset)
+        paths = list(self.chanjo_config['sample_panels'].values())
+        if self.chanjo_config['panel']:
+            paths.append(self.chanjo_config['panel'])
+        readable = True
+        for path in dict.fromkeys(paths):
+            try:
+                with open_text(path) as fh:
+                    genes = read_panel(fh)
+            except read_errors() as e:
+                log.error("sambamba_chanjo: could not read panel {} ({})".format(path, e))
+                readable = False
                 continue
-            else:
-                #parse data
-                gene, coverage = line.rstrip().split('\t')
-                self.sambamba_chanjo_data_samples[f['s_name']][gene] = float(coverage)
+            log.info("sambamba_chanjo: panel {} with {} genes".format(path, len(genes)))
+            self.sambamba_chanjo_panels[path] = PanelFilter(genes)
+        return readable
+
+    def load_panel(self, path):
+        '''PanelFilter of a panel file (read by load_panels)'''
+        return self.sambamba_chanjo_panels[path]
+
+    def panel_for(self, s_name):
+        '''Panel of a sample (first matching sample_panels pattern, else panel, else None)'''
+        for pattern, path in self.chanjo_config['sample_panels'].items():
+            if fnmatch.fnmatch(s_name, pattern):
+                return self.load_panel(path)
+        if self.chanjo_config['panel']:
+            return self.load_panel(self.chanjo_config['panel'])
+        return None
 
+    def parser_for(self, f):
+        '''Parser of a gene level file, restricted to the panel of its sample'''
+        return self.panel_for(f['s_name']) or parse_gene_level
 
+    def merge_parsed(self, s_name, parsed):
+        '''Adds the coverage of one sample to the gene x sample matrix
+        input:
+            s_name: sample name
+            parsed: output of parse_gene_level
+        output:
+            None
+        '''
+        genes, values = parsed
+        matrix = self.sambamba_chanjo_matrix
+        rows = array('q', map(matrix.gene_row, genes))
+        matrix.add_column(s_name, rows, values)
@@ -5,27 +5,24 @@
 
 from __future__ import print_function
 from collections import OrderedDict, defaultdict
+import copy
 import logging
 import os
-import re
 from multiqc import config
-from multiqc.plots import table
 from multiqc.modules.base_module import BaseMultiqcModule
+from seglh_plugin.incremental import merge_samples, previous_data
+from seglh_plugin.parallel import parse_log_files
+from seglh_plugin.profiling import count, phase
+from seglh_plugin.qc import RECALL_BANDS
+from seglh_plugin.samples import add_general_stats
+from seglh_plugin import tables
+from seglh_plugin.parsers.sompy import parse_stats_csv
+from seglh_plugin.writer import write_data_file
 
 # Initialise the main MultiQC logger
 log = logging.getLogger('multiqc')
 
 
-def autocast(x):
-    '''automatically typecasts numerical values to int or float'''
-    if re.match('^(\d+)\.(\d+)$', x):
-        return float(x)
-    elif re.match('^(\d+)$', x):
-        return int(x)
-    else:
-        return x
-
-
 class MultiqcModule(BaseMultiqcModule):
     # configures manual metric->group mappings
     sompy_groups = {
@@ -34,6 +31,28 @@ class MultiqcModule(BaseMultiqcModule):
         'indels':'Indel Benchmark'
     } 
 
+    # header of the recall columns (string must match headers in the input file)
+    recall_header = {
+        "title": "Recall",  # whatever string to be displayed in the html report table
+        "description": "Recall for truth variant representation = TRUTH.TP / (TRUTH.TP + TRUTH.FN)",
+        "min": 0,
+        "max": 1,
+        # recall bands shared with the QC gate: MultiQC shows the colour of the last matching band
+        # (colours below are ordered worst first) and has no gte rule, an inclusive bound is gt or eq
+        "cond_formatting_rules": dict((band, [{"gt": bound}] + ([{"eq": bound}] if inclusive else []))
+                                      for band, bound, inclusive in RECALL_BANDS),
+        "cond_formatting_colours": [
+            {"red": "#D2222D"},
+            {"amber": "#FFBF00"},
+            {"green": "#238823"},
+            {"verygreen": "#007000"},
+        ],
+        "format": "{:.4f}",
+    }
+
+    # groups whose recall is shown in General Statistics
+    general_stats_groups = ['SNVs', 'indels']
+
     def __init__(self):
         # Halt execution if we've disabled the plugin
         if config.kwargs.get('disable_plugin', True):
@@ -51,8 +70,8 @@ class MultiqcModule(BaseMultiqcModule):
         # Find and load any input files for this module
         self.sompy_data = defaultdict(dict)
         self.source_files = dict()
-        for f in self.find_log_files('sompy'):
-            self.parse_file(f)
+        for f, parsed in parse_log_files(self, 'sompy', parse_stats_csv):
+            self.merge_parsed(parsed)
             self.add_data_source(
                 s_name=f['s_name'],
                 source=os.path.join(f['root'],f['fn']),
@@ -60,8 +79,16 @@ class MultiqcModule(BaseMultiqcModule):
                 section="sompy-bysample",
             )
 
+        # Merge the samples of a previous report (--seglh-incremental)
+        with phase('sompy', 'load_previous'):
+            previous = previous_data('multiqc_sompy')
+        if previous:
+            self.sompy_data = merge_samples('sompy', self.split_groups(previous), self.sompy_data)
+
         # Filter out samples matching ignored sample names
-        self.sompy_data = self.ignore_samples(self.sompy_data)
+        with phase('sompy', 'ignore_samples'):
+            self.sompy_data = self.ignore_samples(self.sompy_data)
+        count('sompy', samples=len(self.sompy_data))
 
         # Nothing found - raise a UserWarning to tell MultiQC
         if len(self.sompy_data) == 0:
@@ -70,18 +97,23 @@ class MultiqcModule(BaseMultiqcModule):
 
         log.info("Found {} reports".format(len(self.sompy_data)))
 
-        # Write parsed report data to a file
+        # Write parsed report data to a file (in the background)
         combined_data = dict()
         for sample in self.sompy_data:
             combined_data[sample] = dict()
             for group in self.sompy_data[sample]:
                 for metric in self.sompy_data[sample][group]:
                     combined_data[sample][f'{group}_{metric}'] = self.sompy_data[sample][group][metric]
-        self.write_data_file(combined_data, 'multiqc_sompy')
+        with phase('sompy', 'write_data_file'):
+            write_data_file(self, combined_data, 'multiqc_sompy')
+
+        # Add the SNV and indel recall to the General Statistics table
+        self.general_stats()
 
         # create the result table
         for group in sorted(self.sompy_groups.keys()):
-            plot = self.sample_stats_table(group)
+            with phase('sompy', 'sample_stats_table'):
+                plot = self.sample_stats_table(group)
             if plot:
                 self.add_section(
                     name=self.sompy_groups[group],
@@ -91,6 +123,23 @@ class MultiqcModule(BaseMultiqcModule):
                 )
 
 
+    def general_stats(self):
+        '''
+        add the recall of each group to General Statistics (joined with the other SEGLH modules by sample)
+        '''
+        headers = OrderedDict()
+        for group in self.general_stats_groups:
+            headers['{}_recall'.format(group)] = dict(copy.deepcopy(self.recall_header), **{
+                "title": "{} recall".format(group[:-1] if group.endswith('s') else group),
+                "description": "{}: {}".format(self.sompy_groups[group], self.recall_header["description"]),
+            })
+        data = dict()
+        for sample, groups in self.sompy_data.items():
+            data[sample] = dict(('{}_recall'.format(group), groups[group]['recall'])
+                                for group in self.general_stats_groups
+                                if 'recall' in groups.get(group, dict()))
+        add_general_stats(self, 'sompy', data, headers)
+
     def sample_stats_table(self, group):
         '''
         create a table with the sample statistics
@@ -147,35 +196,8 @@ class MultiqcModule(BaseMultiqcModule):
             "format": None,
             "hidden": True,
         }
-        h["recall"] = {  # string must match headers in the input file
-            "title": "Recall",  # whatever string to be displayed in the html report table
-            "description": "Recall for truth variant representation = TRUTH.TP / (TRUTH.TP + TRUTH.FN)",
-            "min": 0,
-            "max": 1,
-            "cond_formatting_rules": {
-                "verygreen": [
-                    {"gte": 0.99},
-                ],
-                "green": [
-                    {"lt": 0.99},
-                    {"gt": 0.98}
-                ],
-                "amber": [
-                    {"lt": 0.98},
-                    {"gt": 0.90}
-                ],
-                "red": [
-                    {"lt": 0.90}
-                ],
-            },
-            "cond_formatting_colours": [
-                {"red": "#D2222D"},
-                {"amber": "#FFBF00"},
-                {"green": "#238823"},
-                {"verygreen": "#007000"},
-            ],
-            "format": "{:.4f}",
-        }
+        # (copied, table.plot extends the formatting colours of a header)
+        h["recall"] = copy.deepcopy(self.recall_header)
         h["precision"] = {
             "title": "Precision",
             "description": "Precision of query variants = QUERY.TP / (QUERY.TP + QUERY.FP)",
@@ -199,41 +221,31 @@ class MultiqcModule(BaseMultiqcModule):
             except KeyError:
                 pass
         
-        return table.plot(group_data, h, table_config) if group_data else None
+        return tables.plot(group_data, h, table_config) if group_data else None
 
 
-    def parse_file(self, f):
-        '''Parses the Metrics output file
-        CSV file with header, one row per variant type
-
+    @staticmethod
+    def split_groups(combined_data):
+        '''Splits the {group}_{metric} columns of the data file back into groups
+        input:
+            combined_data: {sample: {group_metric: value}} as written to multiqc_sompy
+        output:
+            {sample: {group: {metric: value}}}
+        '''
+        data = dict()
+        for sample, columns in combined_data.items():
+            groups = data[sample] = dict()
+            for column, value in columns.items():
+                group, _, metric = column.partition('_')
+                groups.setdefault(group, dict())[metric] = value
+        return data
+
+    def merge_parsed(self, parsed):
+        '''Adds the parsed data of one stats.csv file to the module data
         input:
-            f: file handle
+            parsed: output of parse_stats_csv
         output:
             None
         '''
-        header = []
-        group, sample_names = '', []
-        for line in f['f'].splitlines():
-            if line.endswith('sompyversion,sompycmd'):
-                # header
-                header = line.rstrip().split(',') 
-            elif line.startswith('#') or len(line) == 0 or re.match(r'^\s+$',line):
-                # comment or empty line (reset)
-                continue
-            else:
-                # data line, extract and typecast numbers
-                fields = list(map(autocast, line.rstrip().split(',')))
-                # add sample data dictionaries
-                group = fields[1]
-                data = dict(zip(header[2:], fields[2:]))
-                # get sample identifier from output name
-                sample_name = None
-                # from the sompy stats.csv file select the sompycmd column
-                # which contains the input vcf filename after "-o"
-                vcf_name = re.search(r'.*-o\s*(\S+)', data['sompycmd'])
-                if vcf_name:
-                    sample_name = os.path.basename(vcf_name.group(1))
-                    # add to data dictionary
-                    self.sompy_data[sample_name][group] = data
-                else:
-                    log.debug("Could not find '-o filename' in sompy stats.csv file")
+        for sample_name, groups in parsed.items():
+            self.sompy_data[sample_name].update(groups)
@@ -0,0 +1,279 @@
+#!/usr/bin/env python
+
+""" Compact metric store for the tso500 module
+
+All samples of a run share one catalog of the metrics (names interned once,
+with their group, LSL/USL limits and table header). Each sample holds its
+values in a float array indexed like the catalog, and a presence flag per
+metric, instead of a dictionary of float objects.
+
+MetricStore and its sample views behave like {sample: {metric: value}}
+dictionaries, so they are handed to table.plot and write_data_file without
+building intermediate copies.
+
+Table headers only depend on the metric name and its limits, and the
+MetricsOutput metric set rarely changes between runs, so the HeaderCatalog
+keeps them in a JSON file in the plugin cache directory. The file is tied
+to the plugin version and the custom metric configuration.
+"""
+
+from __future__ import print_function
+from array import array
+from collections import defaultdict
+from collections.abc import Mapping, MutableMapping
+import json
+import logging
+import math
+import os
+import sys
+
+import numpy as np
+
+from seglh_plugin.writer import KIND_ABSENT, KIND_FLOAT, KIND_NONE
+
+# Initialise the main MultiQC logger
+log = logging.getLogger('multiqc')
+
+# presence flags of a sample value (a present value can be None, e.g. NA)
+ABSENT, PRESENT, PRESENT_NONE = 0, 1, 2
+# header catalog file in the plugin cache directory
+HEADER_CACHE_FILENAME = 'tso500_headers.json'
+# version of the cached header format (bump when the headers built by the module change,
+# the header catalog of other versions is discarded)
+HEADER_SCHEMA_VERSION = 1
+
+
+class MetricCatalog(object):
+    '''
+    Metrics of all samples in the order first seen, with their group,
+    limits ((lsl, usl), None if not given) and table header configuration
+    '''
+
+    def __init__(self):
+        self.metrics = []
+        self.index = dict()
+        self.groups = defaultdict(list)
+        self.limits = dict()
+        self.headers = dict()
+
+    def __len__(self):
+        return len(self.metrics)
+
+    def __contains__(self, metric):
+        return metric in self.index
+
+    def add(self, metric):
+        '''returns the index of a metric, adding it if new'''
+        try:
+            return self.index[metric]
+        except KeyError:
+            metric = sys.intern(metric)
+            i = self.index[metric] = len(self.metrics)
+            self.metrics.append(metric)
+            return i
+
+    def define(self, group, metric, lsl, usl):
+        '''sets the limits of a metric and adds it to a group'''
+        metric = self.metrics[self.add(metric)]
+        self.limits[metric] = (lsl, usl)
+        self.groups[group].append(metric)
+        # the header depends on the limits
+        self.headers.pop(metric, None)
+
+
+class HeaderCatalog(object):
+    '''
+    Table headers of metrics by name and limits, persisted as JSON (if a
+    path is given) and only reused with the same version
+    '''
+
+    def __init__(self, path=None, version=''):
+        self.path = path
+        self.version = version
+        self.headers = dict()
+        self.changed = False
+        if path is not None:
+            self.load()
+
+    @staticmethod
+    def key(metric, limits):
+        return '\t'.join([metric] + ['' if limit is None else repr(limit) for limit in limits])
+
+    def get(self, metric, limits):
+        '''(found, header) of a metric with the given (lsl, usl), header None if not shown'''
+        key = self.key(metric, limits)
+        if key in self.headers:
+            return True, self.headers[key]
+        return False, None
+
+    def put(self, metric, limits, header):
+        self.headers[self.key(metric, limits)] = header
+        self.changed = True
+
+    def load(self):
+        try:
+            with open(self.path) as fh:
+                data = json.load(fh)
+        except (IOError, OSError, ValueError):
+            return
+        if isinstance(data, dict) and data.get('version') == self.version:
+            self.headers.update(data.get('headers') or dict())
+
+    def save(self):
+        '''writes the catalog if headers were added (replacing the file at once)'''
+        if self.path is None or not self.changed:
+            return
+        tmp = '{}.{}.tmp'.format(self.path, os.getpid())
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            with open(tmp, 'w') as fh:
+                json.dump({'version': self.version, 'headers': self.headers}, fh)
+            os.replace(tmp, self.path)
+            self.changed = False
+        except (IOError, OSError) as e:
+            log.warning("Could not write the TSO500 header catalog {}: {}".format(self.path, e))
+            if os.path.exists(tmp):
+                os.remove(tmp)
+
+
+class SampleView(MutableMapping):
+    '''{metric: value} view of a sample of a MetricStore'''
+
+    __slots__ = ('store', 'sample')
+
+    def __init__(self, store, sample):
+        self.store = store
+        self.sample = sample
+
+    def __getitem__(self, metric):
+        i = self.store.catalog.index[metric]
+        values, present = self.store.rows[self.sample]
+        if i >= len(present) or not present[i]:
+            raise KeyError(metric)
+        return values[i] if present[i] == PRESENT else None
+
+    def __contains__(self, metric):
+        i = self.store.catalog.index.get(metric)
+        present = self.store.rows[self.sample][1]
+        return i is not None and i < len(present) and present[i] != ABSENT
+
+    def __setitem__(self, metric, value):
+        self.store.set(self.sample, metric, value)
+
+    def __delitem__(self, metric):
+        i = self.store.catalog.index[metric]
+        present = self.store.rows[self.sample][1]
+        if i >= len(present) or not present[i]:
+            raise KeyError(metric)
+        present[i] = ABSENT
+
+    def __iter__(self):
+        metrics = self.store.catalog.metrics
+        present = self.store.rows[self.sample][1]
+        return (metrics[i] for i, flag in enumerate(present) if flag)
+
+    def __len__(self):
+        present = self.store.rows[self.sample][1]
+        return len(present) - present.count(ABSENT)
+
+    def __repr__(self):
+        return repr(dict(self))
+
+
+class MetricStore(Mapping):
+    '''
+    {sample: {metric: value}} of the tso500 module
+    Values are floats or None (missing/NA), to_dict() returns the data as
+    plain dictionaries.
+    '''
+
+    def __init__(self, catalog=None, samples=None):
+        self.catalog = catalog if catalog is not None else MetricCatalog()
+        # sample: (values array('d'), presence flags bytearray), indexed like the catalog
+        self.rows = dict()
+        for sample, data in (samples or dict()).items():
+            self.update(sample, data)
+
+    def __getitem__(self, sample):
+        if sample not in self.rows:
+            raise KeyError(sample)
+        return SampleView(self, sample)
+
+    def __iter__(self):
+        return iter(self.rows)
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __contains__(self, sample):
+        return sample in self.rows
+
+    def row(self, sample):
+        '''values and presence flags of a sample, sized to the catalog'''
+        try:
+            values, present = self.rows[sample]
+        except KeyError:
+            values, present = self.rows[sample] = (array('d'), bytearray())
+        missing = len(self.catalog) - len(present)
+        if missing > 0:
+            values.extend([math.nan] * missing)
+            present.extend(bytes(missing))
+        return values, present
+
+    def set(self, sample, metric, value):
+        i = self.catalog.add(metric)
+        values, present = self.row(sample)
+        if value is None:
+            values[i], present[i] = math.nan, PRESENT_NONE
+        else:
+            values[i], present[i] = value, PRESENT
+
+    def update(self, sample, data):
+        '''adds (or overwrites) the values of a sample from {metric: value}'''
+        add = self.catalog.add
+        indices = [add(metric) for metric in data]
+        values, present = self.row(sample)
+        for i, value in zip(indices, data.values()):
+            if value is None:
+                values[i], present[i] = math.nan, PRESENT_NONE
+            else:
+                try:
+                    values[i], present[i] = value, PRESENT
+                except TypeError:
+                    # not numeric (e.g. text in an edited data file)
+                    values[i], present[i] = math.nan, PRESENT_NONE
+
+    def copy(self):
+        '''copy of the sample values (sharing the catalog)'''
+        store = MetricStore(self.catalog)
+        store.rows = dict((s, (array('d', values), bytearray(present))) for s, (values, present) in self.rows.items())
+        return store
+
+    def subset(self, samples):
+        '''keeps only the given samples (in the given order)'''
+        self.rows = dict((s, self.rows[s]) for s in samples)
+
+    def matrix(self, metrics):
+        '''samples x metrics float array of the given metrics (NaN for missing values)'''
+        cols = np.array([self.catalog.index.get(m, -1) for m in metrics], dtype=np.intp)
+        out = np.full((len(self.rows), len(cols)), np.nan)
+        known = cols >= 0
+        for r, sample in enumerate(self.rows):
+            values = np.frombuffer(self.row(sample)[0], dtype=np.float64)
+            out[r, known] = values[cols[known]]
+        return out
+
+    def to_table(self):
+        '''(samples, metrics, samples x metrics values, kinds) for the npz data format'''
+        samples = list(self.rows)
+        values = self.matrix(self.catalog.metrics)
+        present = np.zeros(values.shape, dtype=np.uint8)
+        for r, sample in enumerate(samples):
+            flags = self.row(sample)[1]
+            present[r] = np.frombuffer(bytes(flags), dtype=np.uint8)
+        kinds = np.choose(present, [KIND_ABSENT, KIND_FLOAT, KIND_NONE]).astype(np.uint8)
+        return samples, list(self.catalog.metrics), values, kinds
+
+    def to_dict(self):
+        '''{sample: {metric: value}} as plain dictionaries'''
+        return dict((sample, dict(SampleView(self, sample).items())) for sample in self.rows)
@@ -4,12 +4,23 @@
 
 from __future__ import print_function
 from collections import OrderedDict, defaultdict
+import hashlib
+import json
 import logging
 import os
 import re
 from multiqc import config
-from multiqc.plots import table
 from multiqc.modules.base_module import BaseMultiqcModule
+from seglh_plugin.history import add_history_sections
+from seglh_plugin.incremental import merge_samples, previous_data, run_samples
+from seglh_plugin.parallel import parse_log_files
+from seglh_plugin.profiling import count, phase
+from seglh_plugin.qc import checked_metrics, evaluate_values
+from seglh_plugin.samples import add_general_stats
+from seglh_plugin import tables
+from seglh_plugin.writer import write_data_file
+from seglh_plugin.parsers.tso500 import parse_key_values, parse_metric_block, parse_metrics_output
+from .metrics import HEADER_CACHE_FILENAME, HEADER_SCHEMA_VERSION, HeaderCatalog, MetricCatalog, MetricStore
 
 # Initialise the main MultiQC logger
 log = logging.getLogger('multiqc')
@@ -69,6 +80,14 @@ class MultiqcModule(BaseMultiqcModule):
         },
     }
 
+    # defaults for the tso500_config section of the MultiQC config
+    tso500_defaults = {
+        # Run Information section ([Header] and [Run QC Metrics] of each MetricsOutput.tsv)
+        'run_info': True,
+        # RNA QC sections (one per RNA section of MetricsOutput.tsv)
+        'rna_qc': True,
+    }
+
     # configures manual metric->group mappings
     special_groups = {
         'PCT_EXON_100X (%)': 'Coverage metrics',
@@ -98,13 +117,21 @@ class MultiqcModule(BaseMultiqcModule):
             info = " Illumina TSO500 analysis blackbox plugin."
         )
 
+        self.tso500_config = dict(self.tso500_defaults)
+        self.tso500_config.update(getattr(config, 'tso500_config', None) or {})
+
         # Find and load any input files for this module
-        self.tso500_data_samples = dict()
-        self.tso500_data_limits = dict()
-        self.tso500_data_groups = defaultdict(list)
+        # (metric names, limits and groups are held once in the catalog, sample values in arrays,
+        # the other sections of each file as text blocks until a report section converts them)
+        self.tso500_data_catalog = MetricCatalog()
+        self.tso500_data_samples = MetricStore(self.tso500_data_catalog)
+        self.tso500_data_limits = self.tso500_data_catalog.limits
+        self.tso500_data_groups = self.tso500_data_catalog.groups
+        self.tso500_header_catalog = self.header_catalog()
+        self.tso500_blocks = defaultdict(list)
         self.source_files = dict()
-        for f in self.find_log_files('tso500'):
-            self.parse_file(f)
+        for f, parsed in parse_log_files(self, 'tso500', parse_metrics_output):
+            self.merge_parsed(parsed, self.run_label(f))
             self.add_data_source(
                 s_name=f['s_name'],
                 source=os.path.join(f['root'],f['fn']),
@@ -112,8 +139,25 @@ class MultiqcModule(BaseMultiqcModule):
                 section="tso500-bysample",
             )
 
+        # Merge the samples of a previous report (--seglh-incremental)
+        with phase('tso500', 'load_previous'):
+            previous = previous_data('multiqc_tso500')
+            # only the samples of this run are recorded in the history store
+            self.tso500_run_samples = run_samples(previous, self.tso500_data_samples)
+            if previous:
+                # groups and limits of metrics only found in the previous report
+                catalog = previous_data('multiqc_tso500_metrics') or dict()
+                self.merge_parsed({'samples': dict(), 'metrics': [
+                    (m['group'], metric, m.get('lsl'), m.get('usl'))
+                    for metric, m in catalog.items() if metric not in self.tso500_data_limits]})
+                self.tso500_data_samples = MetricStore(self.tso500_data_catalog, merge_samples(
+                    'tso500', previous, self.tso500_data_samples))
+
         # Filter out samples matching ignored sample names
-        self.tso500_data_samples = self.ignore_samples(self.tso500_data_samples)
+        with phase('tso500', 'ignore_samples'):
+            self.tso500_data_samples.subset(
+                [s for s in self.tso500_data_samples if not self.is_ignore_sample(s)])
+        count('tso500', samples=len(self.tso500_data_samples))
 
         # Nothing found - raise a UserWarning to tell MultiQC
         if len(self.tso500_data_samples) == 0:
@@ -122,100 +166,231 @@ class MultiqcModule(BaseMultiqcModule):
 
         log.info("Found {} reports".format(len(self.tso500_data_samples)))
 
-        # Write parsed report data to a file
-        self.write_data_file(self.tso500_data_samples, 'multiqc_tso500')
-
-        # # Add a number to General Statistics table
-        # headers = OrderedDict()
-        # for data_key in self.tso500_data_limits.keys():
-        #     m = re.match(r'^([^\(]+)\(([^\)]+)\)_.*', data_key)
-        #     if m:
-        #         name = m.group(1).rstrip()
-        #         headers[data_key] = {
-        #             'title': name,
-        #             'description': '',
-        #             'min': self.tso500_data_limits['CONTAMINATION_SCORE (NA)'][0],
-        #             'max': self.tso500_data_limits['CONTAMINATION_SCORE (NA)'][1],
-        #             'scale': 'RdYlGn-rev',
-        #             'format': '{:,.0f}'
-        #         }
-        # print(self.tso500_data_samples)
-        # self.general_stats_addcols(self.tso500_data_samples, headers)
+        # Write parsed report data to a file (in the background)
+        with phase('tso500', 'write_data_file'):
+            write_data_file(self, None, 'multiqc_tso500', table=self.tso500_data_samples)
+            write_data_file(self, self.metric_catalog(), 'multiqc_tso500_metrics')
+
+        # Evaluate all samples against the metric limits (LSL/USL guidelines)
+        with phase('tso500', 'qc'):
+            metrics = checked_metrics(self.tso500_data_limits)
+            self.tso500_qc = evaluate_values(list(self.tso500_data_samples), metrics,
+                                             self.tso500_data_samples.matrix(metrics), self.tso500_data_limits)
+            qc_summary = dict((s, dict(q, failed_metrics=', '.join(q['failed_metrics'])))
+                              for s, q in self.tso500_qc.summary().items())
+            write_data_file(self, qc_summary, 'multiqc_tso500_qc')
+
+        # Run metadata of each MetricsOutput.tsv (converted here)
+        if self.tso500_config['run_info'] and ('Header' in self.tso500_blocks or 'Run QC Metrics' in self.tso500_blocks):
+            with phase('tso500', 'run_info'):
+                plot = self.run_info_table()
+            self.add_section(
+                name="Run Information",
+                anchor="tso500-run-info",
+                description="Header and run QC metrics of each MetricsOutput.tsv",
+                plot=plot,
+            )
+
+        # Add the QC status, failing metrics and key metrics to the General Statistics table
+        self.general_stats(qc_summary)
+        with phase('tso500', 'qc_summary_table'):
+            plot = self.qc_summary_table(qc_summary)
+        self.add_section(
+            name="QC Summary",
+            anchor="tso500-qc",
+            description="Samples checked against the LSL/USL guideline of {} metrics".format(
+                len(self.tso500_qc.metrics)),
+            plot=plot,
+        )
 
         for group in sorted(self.tso500_data_groups.keys()):
             metrics = self.tso500_data_groups[group]
+            with phase('tso500', 'sample_stats_table'):
+                plot = self.sample_stats_table(metrics)
             self.add_section(
                 name=group,
                 anchor="tso500-bysample",
                 description="",
-                plot=self.sample_stats_table(metrics),
+                plot=plot,
             )
 
+        # RNA QC sections (RNA sections are only converted here)
+        if self.tso500_config['rna_qc']:
+            with phase('tso500', 'rna_qc'):
+                self.add_rna_sections()
+
+        # Keep the table headers of new metrics for the next runs
+        self.tso500_header_catalog.save()
+
+        # Record the run in the history store and show the metric trends (--seglh-history)
+        with phase('tso500', 'history'):
+            add_history_sections(self, 'tso500', self.tso500_data_samples, self.tso500_run_samples)
+
+    # colours of the QC status
+    qc_formatting = {
+        "cond_formatting_rules": {
+            "pass": [{"s_eq": "PASS"}],
+            "fail": [{"s_eq": "FAIL"}],
+        },
+        "cond_formatting_colours": [
+            {"pass": "#238823"},
+            {"fail": "#D2222D"},
+        ],
+    }
+
+    # metrics of each sample shown in General Statistics (if found)
+    general_stats_metrics = [
+        'MEDIAN_EXON_COVERAGE (Count)',
+        'PCT_CONTAMINATION_EST (%)',
+    ]
+
+    def general_stats(self, qc_summary):
+        '''
+        add the QC status, number of failing metrics and key metrics of each sample to
+        General Statistics (joined with the other SEGLH modules by sample)
+        '''
+        headers = OrderedDict()
+        headers["status"] = dict(self.qc_formatting, **{
+            "title": "QC",
+            "description": "TSO500 QC status (FAIL if any metric is outside its LSL/USL guideline)",
+        })
+        headers["failed"] = {
+            "title": "Failed metrics",
+            "description": "Number of TSO500 metrics outside their LSL/USL guideline",
+            "min": 0,
+            "scale": "Reds",
+            "format": "{:,.0f}",
+        }
+        data = dict((s, {'status': q['status'], 'failed': q['failed']}) for s, q in qc_summary.items())
+        for metric in self.general_stats_metrics:
+            header = self.metric_header(metric) if metric in self.tso500_data_catalog else None
+            if header is None:
+                continue
+            headers[metric] = dict(header)
+            for s, values in self.tso500_data_samples.items():
+                if metric in values:
+                    data[s][metric] = values[metric]
+        add_general_stats(self, 'tso500', data, headers)
+
+    def qc_summary_table(self, qc_summary):
+        '''
+        create a table with the QC status and failing metrics of each sample
+        '''
+        headers = OrderedDict()
+        headers["status"] = dict(self.qc_formatting, **{
+            "title": "QC",
+            "description": "FAIL if any metric is outside its LSL/USL guideline",
+        })
+        headers["failed"] = {
+            "title": "Failed",
+            "description": "Number of metrics outside their LSL/USL guideline",
+            "min": 0,
+            "scale": "Reds",
+            "format": "{:,.0f}",
+        }
+        headers["na"] = {
+            "title": "NA",
+            "description": "Number of metrics with a guideline but no value",
+            "min": 0,
+            "scale": "Greys",
+            "format": "{:,.0f}",
+        }
+        headers["failed_metrics"] = {
+            "title": "Failing metrics",
+            "description": "Metrics outside their LSL/USL guideline",
+            "scale": False,
+        }
+        table_config = {
+            "namespace": "tso500",
+            "id": "tso500-qc-table",
+            "table_title": "TSO500 QC Summary",
+            "no_beeswarm": True,
+        }
+        return tables.plot(qc_summary, headers, table_config)
+
+    def run_info_table(self):
+        '''
+        create a table with the [Header] fields and [Run QC Metrics] values of each run
+        '''
+        from multiqc.plots import table
+        data, headers = OrderedDict(), OrderedDict()
+        for run, text in self.tso500_blocks.get('Header', []):
+            fields = parse_key_values(text)
+            data.setdefault(run, dict()).update(fields)
+            for key in fields:
+                headers.setdefault(key, {"title": key, "description": key, "scale": False})
+        for run, text in self.tso500_blocks.get('Run QC Metrics', []):
+            parsed = parse_metric_block('Run QC Metrics', text)
+            for values in parsed['samples'].values():
+                data.setdefault(run, dict()).update(values)
+            for _, metric, lsl, usl in parsed['metrics']:
+                header = self.cached_header(metric, (lsl, usl))
+                if header is not None and metric not in headers:
+                    headers[metric] = dict(header)
+        write_data_file(self, data, 'multiqc_tso500_run')
+
+        # Table config
+        table_config = {
+            "namespace": "tso500",
+            "id": "tso500-run-info-table",
+            "table_title": "TSO500 Run Information",
+            "no_beeswarm": True,
+            "col1_header": "Run",
+        }
+        return table.plot(data, headers, table_config)
+
+    def add_rna_sections(self):
+        '''
+        add a table of the RNA samples for each RNA section of the Metrics output files
+        '''
+        rna_data = dict()
+        for section in sorted(s for s in self.tso500_blocks if s.startswith('RNA')):
+            data, limits = dict(), OrderedDict()
+            for run, text in self.tso500_blocks[section]:
+                parsed = parse_metric_block(section, text)
+                for sample, values in parsed['samples'].items():
+                    if not self.is_ignore_sample(sample):
+                        data.setdefault(sample, dict()).update(values)
+                for _, metric, lsl, usl in parsed['metrics']:
+                    limits[metric] = (lsl, usl)
+            if not data:
+                continue
+            headers = OrderedDict()
+            for metric, metric_limits in limits.items():
+                header = self.cached_header(metric, metric_limits)
+                if header is not None:
+                    headers[metric] = dict(header)
+            for sample, values in data.items():
+                rna_data.setdefault(sample, dict()).update(values)
+
+            # Table config (section anchor and table id derived from the section name)
+            anchor = "tso500-{}".format(re.sub(r'\W+', '-', section.lower()))
+            table_config = {
+                "namespace": "tso500",
+                "id": "{}-table".format(anchor),
+                "table_title": "TSO500 {}".format(section),
+                "no_beeswarm": True,
+            }
+            self.add_section(
+                name=section,
+                anchor=anchor,
+                description="RNA samples",
+                plot=tables.plot(data, headers, table_config),
+            )
+        if rna_data:
+            write_data_file(self, rna_data, 'multiqc_tso500_rna')
+
     def sample_stats_table(self, metrics):
         '''
         create a table with the sample statistics
         '''
         headers = OrderedDict()
-        for metric in self.tso500_data_limits.keys():
-            if metric in metrics:
-                # get metrics definiton template or create from scratch
-                # extract metric name and unit
-                m = re.match(r'^([^\(]+)\(([^\)]+)\)', metric)
-                if m:
-                    name = m.group(1).rstrip().replace('PCT_','').replace('_',' ').capitalize()
-                    fieldtype = m.group(2)
-                    if fieldtype == 'NA':
-                        headers[metric] = {
-                            'title': name,
-                            'description': metric,
-                            'scale': 'RdYlGn-rev',
-                            'format': '{:,.2f}'
-                        }
-                    elif fieldtype == 'Count':
-                        headers[metric] = {
-                            'title': name,
-                            'description': metric,
-                            'suffix': '',
-                            'scale': 'BuPu',
-                            'format': '{:.0f}',
-                        }
-                    elif fieldtype == 'bp':
-                        headers[metric] = {
-                            'title': name,
-                            'description': metric,
-                            'suffix': 'bp',
-                            'scale': 'RdYlGn',
-                            'format': '{:.0f}',
-                        }
-                    elif fieldtype == '%':
-                        headers[metric] = {
-                            'title': name,
-                            'description': metric,
-                            'suffix': '%',
-                            'min': 0,
-                            'max': 100,
-                            'format': '{:.0f}',
-                            'scale': 'RdYlGn',
-                        }
-                    else:
-                        headers[metric] = {
-                            'title': name,
-                            'description': metric,
-                            'scale': 'RdYlGn-rev',
-                            'format': '{:,.0f}'
-                        }
-                else:
-                    continue
-                # Overwrite default dict with custom values
-                try:
-                    headers[metric].update(self.tso500_metric_configs[metric])
-                except KeyError:
-                    pass
-                # add LSL USL boundaries if defined
-                if self.tso500_data_limits[metric][0] is not None:
-                    headers[metric]['min'] = self.tso500_data_limits[metric][0]
-                if self.tso500_data_limits[metric][1] is not None:
-                    headers[metric]['max'] = self.tso500_data_limits[metric][1]
+        # metrics of a group are listed in the order they were defined (once per file)
+        for metric in dict.fromkeys(metrics):
+            header = self.metric_header(metric)
+            if header is not None:
+                # copied, table.plot adds its own keys to the header
+                headers[metric] = dict(header)
         # Table config
         table_config = {
             "namespace": "tso500",
@@ -224,62 +399,150 @@ class MultiqcModule(BaseMultiqcModule):
             "no_beeswarm": True,
         }
 
-        return table.plot(self.tso500_data_samples, headers, table_config)
+        # only the metrics of the group are embedded (the store holds the metrics of all groups)
+        return tables.plot(self.tso500_data_samples, headers, table_config, table=self.tso500_data_samples)
+
+    def header_catalog(self):
+        '''
+        persisted table headers of the plugin cache directory (in memory only unless the cache is
+        enabled), tied to the header schema, the plugin version and tso500_metric_configs
+        '''
+        from seglh_plugin.cache import cache_dir, cache_enabled
+        if not cache_enabled():
+            return HeaderCatalog()
+        digest = hashlib.sha1(json.dumps(self.tso500_metric_configs, sort_keys=True).encode('utf-8')).hexdigest()
+        return HeaderCatalog(os.path.join(cache_dir(), HEADER_CACHE_FILENAME),
+                             'headers{}:{}:{}'.format(HEADER_SCHEMA_VERSION, getattr(config, 'seglh_plugin_version', ''),
+                                                      digest[:16]))
+
+    def metric_header(self, metric):
+        '''
+        table header configuration of a metric (built once and kept in the metric catalog, and
+        in the header catalog for the next runs)
+        output:
+            header dict, None if the metric is not shown
+        '''
+        catalog = self.tso500_data_catalog
+        if metric in catalog.headers:
+            return catalog.headers[metric]
+        header = catalog.headers[metric] = self.cached_header(metric, self.tso500_data_limits[metric])
+        return header
+
+    def cached_header(self, metric, limits):
+        '''
+        table header configuration of a metric with the given (lsl, usl), from the header catalog
+        (built and added if new)
+        '''
+        found, header = self.tso500_header_catalog.get(metric, limits)
+        if not found:
+            header = self.build_header(metric, limits)
+            self.tso500_header_catalog.put(metric, limits, header)
+        return header
+
+    def build_header(self, metric, limits):
+        '''
+        table header configuration of a metric from its unit, tso500_metric_configs and limits
+        output:
+            header dict, None if the metric is not shown
+        '''
+        # get metrics definiton template or create from scratch
+        # extract metric name and unit
+        m = re.match(r'^([^\(]+)\(([^\)]+)\)', metric)
+        if not m:
+            # metrics without unit are not shown
+            return None
+        name = m.group(1).rstrip().replace('PCT_','').replace('_',' ').capitalize()
+        fieldtype = m.group(2)
+        if fieldtype == 'NA':
+            header = {
+                'title': name,
+                'description': metric,
+                'scale': 'RdYlGn-rev',
+                'format': '{:,.2f}'
+            }
+        elif fieldtype == 'Count':
+            header = {
+                'title': name,
+                'description': metric,
+                'suffix': '',
+                'scale': 'BuPu',
+                'format': '{:.0f}',
+            }
+        elif fieldtype == 'bp':
+            header = {
+                'title': name,
+                'description': metric,
+                'suffix': 'bp',
+                'scale': 'RdYlGn',
+                'format': '{:.0f}',
+            }
+        elif fieldtype == '%':
+            header = {
+                'title': name,
+                'description': metric,
+                'suffix': '%',
+                'min': 0,
+                'max': 100,
+                'format': '{:.0f}',
+                'scale': 'RdYlGn',
+            }
+        else:
+            header = {
+                'title': name,
+                'description': metric,
+                'scale': 'RdYlGn-rev',
+                'format': '{:,.0f}'
+            }
+        # Overwrite default dict with custom values
+        try:
+            header.update(self.tso500_metric_configs[metric])
+        except KeyError:
+            pass
+        # add LSL USL boundaries if defined
+        if limits[0] is not None:
+            header['min'] = limits[0]
+        if limits[1] is not None:
+            header['max'] = limits[1]
+        return header
+
+    def metric_catalog(self):
+        '''Group and limits of each metric (written next to the data for incremental runs)
+        output:
+            {metric: {'group': group, 'lsl': lsl, 'usl': usl}}
+        '''
+        catalog = dict()
+        for group, metrics in self.tso500_data_groups.items():
+            for metric in metrics:
+                lsl, usl = self.tso500_data_limits[metric]
+                catalog[metric] = {'group': group, 'lsl': lsl, 'usl': usl}
+        return catalog
 
-    def parse_file(self, f):
-        '''Parses the Metrics output file
+    @staticmethod
+    def run_label(f):
+        '''
+        name of the run of a Metrics output file: its directory relative to the analysis directory it
+        was found in, or the directory as given (TSO500 writes <run>/Results/MetricsOutput.tsv, so the
+        directory name alone is the same for every run)
+        '''
+        root = os.path.abspath(f['root'])
+        for analysis_dir in config.analysis_dir:
+            path = os.path.abspath(analysis_dir)
+            if root.startswith(path + os.sep):
+                return os.path.relpath(root, path)
+        return os.path.normpath(f['root']) if f['root'] else f['fn']
+
+    def merge_parsed(self, parsed, run=None):
+        '''Adds the parsed data of one Metrics output file to the module data
         input:
-            f: file handle
+            parsed: output of parse_metrics_output
+            run: run label of the file (for its section blocks)
         output:
             None
-        
         '''
-        group, sample_names = '', []
-        for line in f['f'].splitlines():
-            # match data block header
-            m = re.match(r'^\[(.*)\]\s*$', line)
-            if line.startswith('#'):
-                # comment 
-                continue
-            elif len(line) == 0 or re.match(r'^\s+$',line):
-                # empty line (reset)
-                group, sample_names = '', []
-                continue
-            elif m:
-                # is a group header name from matched Regexp (section name in square brackets => section in MultiQC report)
-                group = m.group(1)
-            elif group:
-                if group in ['Header']:
-                    # global metrics/data
-                    pass
-                elif group.startswith('DNA'):
-                    # DNA data line (header or data)
-                    if line.startswith("Metric "):
-                        # is the header line, extract sample names from row
-                        sample_names = line.rstrip().split('\t')[3:]
-                        # add sample data dictionaries
-                        for s in [ sample for sample in sample_names if sample not in self.tso500_data_samples.keys()]:
-                            self.tso500_data_samples[s] = dict()
-                    else:
-                        # parse data
-                        f = line.rstrip().split('\t')
-                        metric = f[0]
-                        lsl = float(f[1]) if f[1] != 'NA' else None
-                        usl = float(f[2]) if f[2] != 'NA' else None
-                        self.tso500_data_limits[metric] = (lsl, usl)
-                        # check metric is in special_groups, else add it in
-                        try:
-                            self.special_groups[metric]
-                        except KeyError:
-                            self.tso500_data_groups[group].append(metric)
-                        else:
-                            self.tso500_data_groups[self.special_groups[metric]].append(metric)
-                        data = f[3:]
-                        for i, sample in enumerate(sample_names):
-                            try:
-                                self.tso500_data_samples[sample][metric] = float(data[i])
-                            except ValueError:
-                                self.tso500_data_samples[sample][metric] = None
-                else:
-                    # unknown group (ignore)
-                    pass
+        for section, text in parsed.get('blocks', dict()).items():
+            self.tso500_blocks[section].append((run, text))
+        for sample, data in parsed['samples'].items():
+            self.tso500_data_samples.update(sample, data)
+        for group, metric, lsl, usl in parsed['metrics']:
+            # check metric is in special_groups, else add it in
+            self.tso500_data_catalog.define(self.special_groups.get(metric, group), metric, lsl, usl)
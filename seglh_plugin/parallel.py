@@ -0,0 +1,171 @@
+#!/usr/bin/env python
+""" Parallel parsing driver shared by the SEGLH modules
+
+Modules hand over their search pattern key and a parser from
+seglh_plugin.parsers. Files are handled in batches of BATCH_SIZE: results
+of unchanged files are loaded from the parse cache (seglh_plugin.cache,
+--seglh-cache), the remaining files are parsed in a process pool when
+--seglh-workers is larger than 1 (serially otherwise), and the results of
+the batch are yielded before the next batch is read, so only one batch of
+results is held at a time. Results are yielded in discovery order, so
+merging them is deterministic.
+Shard selection and shard files are handled here too (seglh_plugin.shard).
+"""
+
+from __future__ import print_function
+import logging
+import os
+
+from multiqc.utils import config, report
+from seglh_plugin.parsers import open_text, read_errors
+from seglh_plugin.profiling import count, phase
+from seglh_plugin.shard import record, select_shard
+
+# Initialise the main MultiQC logger
+log = logging.getLogger('multiqc')
+
+# files looked up in the cache and parsed before their results are handed to the module
+BATCH_SIZE = 64
+
+
+def get_workers():
+    '''number of parser processes requested with --seglh-workers (0 = all cores)'''
+    workers = config.kwargs.get('seglh_workers') or 1
+    if workers < 1:
+        workers = os.cpu_count() or 1
+    return workers
+
+
+def parse_path(parser, path):
+    '''opens a (compressed) file and runs the parser over its handle (None if unreadable)'''
+    try:
+        with open_text(path) as fh:
+            return parser(fh)
+    except read_errors() as e:
+        log.debug("Couldn't read file when parsing: {}\n{}".format(path, e))
+        return None
+
+
+def unique_files(files, paths):
+    '''
+    drops files found twice (e.g. listed in the manifest and in a searched directory)
+    and applies the sample names given in the manifest
+    '''
+    manifest = getattr(config, 'seglh_manifest', None) or dict()
+    seen, unique = set(), []
+    for f, path in zip(files, paths):
+        if path in seen:
+            continue
+        seen.add(path)
+        entry = manifest.get(path)
+        if entry is not None and entry[1]:
+            f['s_name'] = entry[1]
+        unique.append((f, path))
+    return [f for f, _ in unique], [path for _, path in unique]
+
+
+def parse_log_files(module, sp_key, parser, parser_for=None):
+    '''
+    Finds the files of a module and parses them
+    input:
+        module: MultiqcModule instance (provides find_log_files)
+        sp_key: search pattern key
+        parser: picklable function taking a file handle
+        parser_for: function returning the parser of a file (given f), if
+            not the same for all files
+    output:
+        yields (f, result) in discovery order, f as returned by find_log_files
+    '''
+    with phase(sp_key, 'find_log_files'):
+        files = list(module.find_log_files(sp_key, filecontents=False))
+        paths = [os.path.abspath(os.path.join(f['root'], f['fn'])) for f in files]
+        files, paths = unique_files(files, paths)
+
+    # results of shard files (--seglh-merge) are handed over as they are
+    shards = getattr(config, 'seglh_shards', None)
+    if shards:
+        for f, path in zip(files, paths):
+            for entry in shards.get(path, dict()).get(sp_key, []):
+                f = {'fn': entry['fn'], 'root': entry['root'], 's_name': entry['s_name'], 'sp_key': sp_key}
+                record(sp_key, f, entry['result'])
+                yield f, entry['result']
+        unsharded = [(f, path) for f, path in zip(files, paths) if path not in shards]
+        files, paths = [f for f, _ in unsharded], [path for _, path in unsharded]
+
+    files, paths = select_shard(files, paths)
+    if not files:
+        return
+
+    # the cache (sqlite3) and process pool are only imported when there is something to parse
+    from seglh_plugin.cache import get_cache
+    cache = get_cache()
+    parsers = dict((path, parser_for(f) if parser_for else parser) for f, path in zip(files, paths))
+    workers = min(get_workers(), len(files))
+    # files are looked up, parsed and handed to the module a batch at a time (memory bounded by the batch)
+    batch_size = max(BATCH_SIZE, workers * 4)
+    pool, n_cached, n_parsed = None, 0, 0
+    try:
+        for start in range(0, len(files), batch_size):
+            batch = list(zip(files[start:start + batch_size], paths[start:start + batch_size]))
+            with phase(sp_key, 'parse_file'):
+                missing = [path for _, path in batch]
+                results = load_cached(cache, parsers, missing)
+                missing = [path for path in missing if path not in results]
+                if workers > 1 and len(missing) > 1 and pool is None:
+                    from concurrent.futures import ProcessPoolExecutor
+                    log.debug("{}: parsing with {} workers".format(sp_key, workers))
+                    pool = ProcessPoolExecutor(max_workers=workers)
+                parsed = parse_paths(pool, workers, parsers, missing)
+                if cache is not None and parsed:
+                    store_cached(cache, parsers, parsed)
+                results.update(parsed)
+                n_cached += len(batch) - len(missing)
+                n_parsed += len(parsed)
+            for f, path in batch:
+                report.last_found_file = path
+                if path in results:
+                    result = results.pop(path)
+                    record(sp_key, f, result)
+                    yield f, result
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    if n_cached:
+        log.debug("{}: loaded {} of {} files from the parse cache".format(sp_key, n_cached, len(files)))
+    count(sp_key, files=len(files), cached=n_cached, parsed=n_parsed)
+
+
+def by_parser(parsers, paths):
+    '''{parser: [path]} of the given paths'''
+    grouped = dict()
+    for path in paths:
+        grouped.setdefault(parsers[path], []).append(path)
+    return grouped
+
+
+def load_cached(cache, parsers, paths):
+    '''{path: result} of the paths with a valid cache entry'''
+    results = dict()
+    if cache is not None:
+        for p, p_paths in by_parser(parsers, paths).items():
+            results.update(cache.get_many(p, p_paths))
+    return results
+
+
+def store_cached(cache, parsers, parsed):
+    '''stores {path: result} in the cache'''
+    for p, p_paths in by_parser(parsers, parsed).items():
+        cache.put_many(p, dict((path, parsed[path]) for path in p_paths))
+
+
+def parse_paths(pool, workers, parsers, paths):
+    '''{path: result} of the readable paths, parsed in the process pool if given'''
+    if pool is not None and len(paths) > 1:
+        chunksize = max(1, len(paths) // (workers * 4))
+        parsed = dict(zip(paths, pool.map(parse_path, [parsers[path] for path in paths], paths, chunksize=chunksize)))
+    else:
+        parsed = dict()
+        for path in paths:
+            report.last_found_file = path
+            parsed[path] = parse_path(parsers[path], path)
+    return dict((path, result) for path, result in parsed.items() if result is not None)
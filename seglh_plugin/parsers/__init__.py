@@ -0,0 +1,89 @@
+#!/usr/bin/env python
+""" Parsers for the SEGLH module input files
+
+The parsers are plain functions that take an open text file handle and
+return the parsed data of that file. They do not depend on MultiQC so
+they can run in worker processes (see seglh_plugin.parallel); each
+MultiqcModule merges the results into its own data structures.
+
+Inputs may be gzip (.gz) or zstandard (.zst) compressed; open_text
+decompresses them as a stream while they are read. zstandard is an
+optional dependency, only needed for .zst files.
+"""
+
+import gzip
+import io
+import sys
+
+# compression extensions of the input files
+COMPRESSION_EXTS = (('.gz', 'gzip'), ('.zst', 'zstd'))
+# characters read from the file handle at a time by iter_lines
+CHUNK_SIZE = 1 << 16
+
+
+def iter_blocks(fh, chunk_size=CHUNK_SIZE):
+    '''yields the text of an open file handle in blocks of whole lines (without the last line break)'''
+    remainder = ''
+    while True:
+        chunk = fh.read(chunk_size)
+        if not chunk:
+            break
+        text = remainder + chunk
+        cut = text.rfind('\n')
+        if cut < 0:
+            # no complete line yet
+            remainder = text
+            continue
+        remainder = text[cut + 1:]
+        yield text[:cut]
+    if remainder:
+        yield remainder
+
+
+def iter_lines(fh, chunk_size=CHUNK_SIZE):
+    '''yields lines from an open file handle, reading it in fixed size chunks'''
+    for block in iter_blocks(fh, chunk_size):
+        yield from block.split('\n')
+
+
+def compression(fn):
+    '''compression of a file by its extension (gzip, zstd or None)'''
+    for ext, kind in COMPRESSION_EXTS:
+        if fn.endswith(ext):
+            return kind
+    return None
+
+
+def strip_compression(fn):
+    '''file name without the compression extension'''
+    for ext, _ in COMPRESSION_EXTS:
+        if fn.endswith(ext):
+            return fn[:-len(ext)]
+    return fn
+
+
+def open_text(path, encoding='utf-8'):
+    '''opens a plain, gzip or zstandard compressed file for streamed text reading'''
+    kind = compression(path)
+    if kind == 'gzip':
+        return gzip.open(path, 'rt', encoding=encoding)
+    if kind == 'zstd':
+        try:
+            import zstandard
+        except ImportError:
+            raise IOError("the zstandard package is required to read {}".format(path))
+        raw = open(path, 'rb')
+        try:
+            reader = zstandard.ZstdDecompressor().stream_reader(raw, closefd=True)
+        except BaseException:
+            raw.close()
+            raise
+        return io.TextIOWrapper(reader, encoding=encoding)
+    return io.open(path, 'r', encoding=encoding)
+
+
+def read_errors():
+    '''exceptions raised when a file can not be read, decompressed or decoded'''
+    errors = (IOError, OSError, EOFError, UnicodeDecodeError)
+    zstandard = sys.modules.get('zstandard')
+    return errors + (zstandard.ZstdError,) if zstandard is not None else errors
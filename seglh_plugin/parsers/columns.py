@@ -0,0 +1,75 @@
+#!/usr/bin/env python
+""" Typed column conversion for tabular SEGLH inputs
+
+Parsers collect the raw rows of a file and convert them column by column
+using a per module schema ({column: int | float | str}). A column is
+converted with a single map() call; only columns with unexpected values
+fall back to per value conversion. Columns missing from the schema are
+typed by inference (int, then float, else str).
+"""
+
+from itertools import zip_longest
+
+# values treated as missing in numeric columns
+NA_VALUES = frozenset(['', 'NA', 'NaN', 'nan', '.'])
+
+
+def convert_value(x, kind):
+    '''converts a single value, None if missing, str if not numeric'''
+    if x is None or x in NA_VALUES:
+        return None
+    try:
+        return kind(x)
+    except ValueError:
+        try:
+            return float(x)
+        except ValueError:
+            return x
+
+
+def convert_column(values, kind):
+    '''converts a column (sequence of str) to kind'''
+    if kind is str:
+        return list(values)
+    try:
+        return list(map(kind, values))
+    except (TypeError, ValueError):
+        return [convert_value(x, kind) for x in values]
+
+
+def infer_column(values):
+    '''converts a column of unknown type to int or float if all values allow it'''
+    for kind in (int, float):
+        try:
+            return list(map(kind, values))
+        except (TypeError, ValueError):
+            continue
+    present = [x for x in values if x is not None and x not in NA_VALUES]
+    for kind in (int, float):
+        try:
+            list(map(kind, present))
+        except ValueError:
+            continue
+        return [convert_value(x, kind) for x in values]
+    return list(values)
+
+
+def convert_rows(header, rows, schema):
+    '''
+    converts rows of fields to typed records
+    input:
+        header: column names
+        rows: lists of str fields (short rows are padded with None)
+        schema: {column: type}
+    output:
+        list of {column: value}, one per row (empty records without header)
+    '''
+    if not rows:
+        return []
+    if not header:
+        return [dict() for _ in rows]
+    columns = zip_longest(*rows) if any(len(r) != len(header) for r in rows) else zip(*rows)
+    typed = []
+    for name, values in zip(header, columns):
+        typed.append(convert_column(values, schema[name]) if name in schema else infer_column(values))
+    return [dict(zip(header, record)) for record in zip(*typed)]
@@ -0,0 +1,57 @@
+#!/usr/bin/env python
+""" Parser for ExomeDepth *_readCount.csv files """
+
+import re
+from . import iter_lines
+from .columns import convert_rows
+
+# version of the parser output (bump when it changes, cached results of other versions are not reused)
+SCHEMA_VERSION = 3
+
+# SEGLH sample identifier at the start of the BAM name in column 0
+SAMPLE_RE = re.compile(r'^([^_]+_\d{2}_[^_]+_\w{2}_[MFU]_[^_]+_Pan\d+)')
+
+# column types of the readCount.csv metrics (other columns are inferred)
+SCHEMA = {
+    'min.refs': int,
+    'refsamples': int,
+    'correlations': float,
+    'expected.BF': float,
+    'phi': float,
+    'RatioSd': float,
+    'mean.p': float,
+    'median.depth': float,
+    'batch.maxcor': float,
+    'batch.mediancor': float,
+    'coeff.var': float,
+}
+
+
+def parse_read_count(fh):
+    '''Parses the Metrics output file
+    CSV file from ReadCount step that contains a header and 1 row per sample
+
+    input:
+        fh: file handle
+    output:
+        {sample: {metric: value}}, samples without metrics if the header is missing
+    '''
+    metrics_header, skipped = [], 0
+    sample_names, rows = [], []
+    for i, line in enumerate(iter_lines(fh)):
+        if line.startswith('#') or len(line) == 0 or line.isspace():
+            # skipped line (comment or empty)
+            skipped += 1
+            continue
+        elif i-skipped == 0 and line.startswith('sample'):
+            # is the header line
+            metrics_header = line.rstrip().split('\t')
+        else:
+            # parse data
+            fields = line.rstrip().split('\t')
+            m = SAMPLE_RE.match(fields[0])
+            if m:
+                sample_names.append(m.group(1))
+                rows.append(fields[1:])
+    # without a header the columns are unknown, the samples are kept without metrics
+    return dict(zip(sample_names, convert_rows(metrics_header[1:], rows, SCHEMA)))
@@ -0,0 +1,104 @@
+#!/usr/bin/env python
+""" Parser for sambamba/chanjo gene_level.txt files """
+
+from array import array
+import hashlib
+from itertools import compress
+from . import iter_blocks, iter_lines
+
+# version of the parser output (bump when it changes, cached results of other versions are not reused)
+SCHEMA_VERSION = 1
+
+# all bytes except tab and line feed (deleted to check the row layout of a block)
+NOT_SEPARATORS = bytes(b for b in range(256) if b not in (9, 10))
+
+
+def add_rows(lines, names, values, genes=None):
+    '''adds the gene rows of lines to names and values (comment, header and empty lines skipped)'''
+    for line in lines:
+        if not line or line[0] == '#' or line.isspace():
+            # comment or empty line
+            continue
+        elif line.startswith('gene symbol'):
+            # header line
+            continue
+        elif genes is not None and line[:line.find('\t')] not in genes:
+            # not in the panel
+            continue
+        else:
+            # parse data
+            gene, coverage = line.rstrip().split('\t')
+            names.append(gene)
+            values.append(float(coverage))
+
+
+def parse_gene_level(fh, genes=None):
+    '''Parses the gene level coverage file
+    TSV file with header, one row per gene. The file is streamed from the
+    handle in chunks so memory is bounded by the chunk size, not the file size.
+
+    With a panel, rows of other genes are dropped before their coverage is
+    converted. Blocks in which every line has exactly one tab are split into
+    cells and filtered as a whole (header and comments are not panel genes),
+    other blocks are parsed line by line.
+
+    input:
+        fh: file handle
+        genes: set of gene names to keep (all genes if None)
+    output:
+        (genes, coverage): gene names and coverage values (array('f'))
+    '''
+    names, values = [], array('f')
+    if genes is None:
+        add_rows(iter_lines(fh), names, values)
+        return names, values
+    for block in iter_blocks(fh):
+        lines = block.count('\n') + 1
+        if block.encode('utf-8').translate(None, NOT_SEPARATORS) != b'\t\n' * (lines - 1) + b'\t':
+            add_rows(block.split('\n'), names, values, genes)
+            continue
+        cells = block.replace('\n', '\t').split('\t')
+        keep = list(map(genes.__contains__, cells[0::2]))
+        names.extend(compress(cells[0::2], keep))
+        values.extend(map(float, compress(cells[1::2], keep)))
+    return names, values
+
+
+def read_panel(fh):
+    '''Reads the genes of a panel
+    Gene list (first field of each line, other columns are ignored) or BED
+    file (gene symbol in the name column), '#' comments and track/browser
+    lines are skipped. A line is read as BED if its start and end are
+    integers; BED lines without name column have no gene.
+
+    input:
+        fh: file handle
+    output:
+        frozenset of gene names
+    '''
+    genes = set()
+    for line in iter_lines(fh):
+        if not line or line[0] == '#' or line.isspace() or line.startswith(('track', 'browser')):
+            continue
+        fields = line.split()
+        if len(fields) > 2 and fields[1].isdigit() and fields[2].isdigit():
+            if len(fields) > 3:
+                genes.add(fields[3])
+        else:
+            genes.add(fields[0])
+    return frozenset(genes)
+
+
+class PanelFilter(object):
+    '''
+    parse_gene_level restricted to the genes of a panel. Picklable for the
+    process pool, and cached under a name identifying the panel genes.
+    '''
+
+    def __init__(self, genes):
+        self.genes = frozenset(genes)
+        digest = hashlib.sha1('\n'.join(sorted(self.genes)).encode('utf-8')).hexdigest()[:16]
+        self.cache_name = '{}.parse_gene_level[panel {}]'.format(__name__, digest)
+
+    def __call__(self, fh):
+        return parse_gene_level(fh, self.genes)
@@ -0,0 +1,83 @@
+#!/usr/bin/env python
+""" Parser for som.py *.stats.csv files """
+
+import logging
+import os
+import re
+from . import iter_lines
+from .columns import convert_rows
+
+# Initialise the main MultiQC logger
+log = logging.getLogger('multiqc')
+
+# version of the parser output (bump when it changes, cached results of other versions are not reused)
+SCHEMA_VERSION = 1
+
+# input vcf filename after "-o" in the sompycmd column
+OUTPUT_RE = re.compile(r'.*-o\s*(\S+)')
+
+# column types of the stats.csv metrics (other columns are inferred)
+SCHEMA = {
+    'total.truth': int,
+    'total.query': int,
+    'tp': int,
+    'fp': int,
+    'fn': int,
+    'unk': int,
+    'ambi': int,
+    'recall': float,
+    'recall_lower': float,
+    'recall_upper': float,
+    'recall2': float,
+    'precision': float,
+    'precision_lower': float,
+    'precision_upper': float,
+    'na': float,
+    'ambiguous': float,
+    'fp.region.size': int,
+    'fp.rate': float,
+    'sompyversion': str,
+    'sompycmd': str,
+}
+
+
+def parse_stats_csv(fh):
+    '''Parses the Metrics output file
+    CSV file with header, one row per variant type
+
+    input:
+        fh: file handle
+    output:
+        {sample: {group: {metric: value}}}
+    '''
+    samples = dict()
+    header, groups, rows = [], [], []
+
+    def flush():
+        '''converts the collected rows and adds them to the sample data'''
+        for group, data in zip(groups, convert_rows(header[2:], rows, SCHEMA)):
+            # from the sompy stats.csv file select the sompycmd column
+            # which contains the input vcf filename after "-o"
+            vcf_name = OUTPUT_RE.search(data.get('sompycmd') or '')
+            if vcf_name:
+                sample_name = os.path.basename(vcf_name.group(1))
+                samples.setdefault(sample_name, dict())[group] = data
+            else:
+                log.debug("Could not find '-o filename' in sompy stats.csv file")
+        del groups[:], rows[:]
+
+    for line in iter_lines(fh):
+        if line.rstrip().endswith('sompyversion,sompycmd'):
+            # header
+            flush()
+            header = line.rstrip().split(',')
+        elif line.startswith('#') or len(line) == 0 or line.isspace():
+            # comment or empty line (reset)
+            continue
+        else:
+            # data line, variant type (group) in the second column
+            fields = line.rstrip().split(',')
+            groups.append(fields[1])
+            rows.append(fields[2:])
+    flush()
+    return samples
@@ -0,0 +1,113 @@
+#!/usr/bin/env python
+""" Parser for TSO500 MetricsOutput.tsv files """
+
+import re
+from . import iter_lines
+
+# version of the parser output (bump when it changes, cached results of other versions are not reused)
+SCHEMA_VERSION = 2
+
+# data block header, section name in square brackets
+SECTION_RE = re.compile(r'^\[(.*)\]\s*$')
+
+
+def is_dna(section):
+    '''DNA sections are converted while the file is parsed'''
+    return section.startswith('DNA')
+
+
+def scan(lines, converted):
+    '''Reads the sections of a Metrics output file in a single pass
+    Rows of the sections selected by converted(section) are converted to
+    sample values; the lines of all other sections are kept as text blocks.
+
+    input:
+        lines: iterable of lines
+        converted: function of the section name, True to convert the section
+    output:
+        (samples, metrics, blocks) as in parse_metrics_output
+    '''
+    samples, metrics, blocks = dict(), [], dict()
+    group, is_converted, sample_names = '', False, []
+    # lines of the current section that is not converted
+    block_lines = None
+    for line in lines:
+        if line.startswith('#'):
+            # comment
+            continue
+        elif len(line) == 0 or line.isspace():
+            # empty line (reset)
+            group, is_converted, sample_names, block_lines = '', False, [], None
+            continue
+        m = SECTION_RE.match(line)
+        if m:
+            # is a group header name (section name in square brackets => section in MultiQC report)
+            group = m.group(1)
+            is_converted = converted(group)
+            block_lines = None if is_converted else blocks.setdefault(group, [])
+        elif not is_converted:
+            # lines of other sections are kept unconverted, lines outside a section are ignored
+            if block_lines is not None:
+                block_lines.append(line)
+        elif line.startswith('Metric '):
+            # is the header line, extract sample names from row and add sample data dictionaries
+            sample_names = line.rstrip().split('\t')[3:]
+            for s in sample_names:
+                samples.setdefault(s, dict())
+        else:
+            # parse data (trailing empty cells are stripped with the line ending)
+            f = line.rstrip().split('\t')
+            metric = f[0]
+            lsl = float(f[1]) if f[1] != 'NA' else None
+            usl = float(f[2]) if f[2] != 'NA' else None
+            metrics.append((group, metric, lsl, usl))
+            data = f[3:]
+            for i, sample in enumerate(sample_names):
+                try:
+                    samples[sample][metric] = float(data[i])
+                except (IndexError, ValueError):
+                    samples[sample][metric] = None
+    return samples, metrics, dict((section, '\n'.join(lines)) for section, lines in blocks.items())
+
+
+def parse_metrics_output(fh):
+    '''Parses the Metrics output file
+    All sections are read in one pass. The DNA sections (shown in every
+    report) are converted to sample values; the other sections ([Header],
+    [Run QC Metrics], [Analysis Status], RNA sections, [Notes]) are kept
+    as text blocks, converted by parse_metric_block or parse_key_values only
+    when a report section uses them.
+
+    input:
+        fh: file handle
+    output:
+        {
+            'samples': {sample: {metric: value}},
+            'metrics': [(section, metric, lsl, usl), ...] in file order,
+            'blocks': {section: text} of the other sections
+        }
+    '''
+    samples, metrics, blocks = scan(iter_lines(fh), is_dna)
+    return {'samples': samples, 'metrics': metrics, 'blocks': blocks}
+
+
+def parse_metric_block(section, text):
+    '''Converts a section block with metric rows (Metric, LSL and USL
+    Guideline, one column per sample or a Value column), e.g. the RNA
+    sections or [Run QC Metrics]
+
+    output:
+        {'samples': {sample: {metric: value}}, 'metrics': [(section, metric, lsl, usl), ...]}
+    '''
+    samples, metrics, _ = scan(['[{}]'.format(section)] + text.split('\n'), lambda s: True)
+    return {'samples': samples, 'metrics': metrics}
+
+
+def parse_key_values(text):
+    '''Converts a section block of key/value rows ([Header]) to {key: value}'''
+    data = dict()
+    for line in text.split('\n'):
+        fields = line.rstrip().split('\t')
+        if fields[0]:
+            data[fields[0]] = fields[1] if len(fields) > 1 else ''
+    return data
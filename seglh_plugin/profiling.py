@@ -0,0 +1,123 @@
+#!/usr/bin/env python
+""" Per phase timing and memory instrumentation of the SEGLH modules
+
+Enabled with --seglh-profile. Modules wrap their phases (find_log_files,
+parse_file, ignore_samples, sample_stats_table, write_data_file) in
+phase(), the file search (module 'search') its discovery and classify
+phases; wall time, CPU time and tracemalloc peak are recorded per module
+and phase (phases may nest, an outer phase includes the peaks of its inner
+phases; tracemalloc.reset_peak needs Python 3.9). The results are written to seglh_profile.json in the MultiQC
+data directory and summarised in the log when the report is generated.
+CPU time is that of the MultiQC process, it excludes parser worker
+processes (--seglh-workers).
+"""
+
+from __future__ import print_function
+from collections import OrderedDict
+from contextlib import contextmanager
+import json
+import logging
+import os
+import time
+import tracemalloc
+
+from multiqc.utils import config
+
+# Initialise the main MultiQC logger
+log = logging.getLogger('multiqc')
+
+PROFILE_FILENAME = 'seglh_profile.json'
+
+
+class Profiler(object):
+    '''collects phase measurements and counts per module'''
+
+    def __init__(self):
+        self.modules = OrderedDict()
+        # highest traced memory of each open phase (outermost first), kept across the
+        # tracemalloc.reset_peak() of nested phases
+        self.peaks = []
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def module(self, name):
+        return self.modules.setdefault(name, {'phases': OrderedDict(), 'counts': dict()})
+
+    def record(self, module, phase, wall, cpu, peak):
+        '''adds a measurement (phases run repeatedly are summed, peak is the maximum)'''
+        phases = self.module(module)['phases']
+        p = phases.setdefault(phase, {'calls': 0, 'wall_s': 0.0, 'cpu_s': 0.0, 'peak_bytes': 0})
+        p['calls'] += 1
+        p['wall_s'] += wall
+        p['cpu_s'] += cpu
+        p['peak_bytes'] = max(p['peak_bytes'], peak)
+
+    def count(self, module, **counts):
+        self.module(module)['counts'].update(counts)
+
+    def summary(self):
+        '''one log line per module'''
+        lines = []
+        for name, m in self.modules.items():
+            phases = ', '.join('{} {:.2f}s/{:.1f}MB'.format(p, v['wall_s'], v['peak_bytes'] / 1e6)
+                               for p, v in m['phases'].items())
+            counts = ', '.join('{} {}'.format(k, v) for k, v in sorted(m['counts'].items()))
+            lines.append('{}: {} ({})'.format(name, phases, counts))
+        return lines
+
+    def write(self, path):
+        with open(path, 'w') as fh:
+            json.dump({
+                'plugin_version': getattr(config, 'seglh_plugin_version', None),
+                'workers': config.kwargs.get('seglh_workers'),
+                'modules': self.modules,
+            }, fh, indent=2)
+
+
+def get_profiler():
+    '''returns the Profiler set up in execution_start (None if not profiling)'''
+    return getattr(config, 'seglh_profiler', None)
+
+
+@contextmanager
+def phase(module, name):
+    '''measures a phase of a module if profiling is enabled'''
+    profiler = get_profiler()
+    if profiler is None:
+        yield
+        return
+    start_mem, outer_peak = tracemalloc.get_traced_memory()
+    if profiler.peaks:
+        # the peak of the enclosing phase so far, before it is reset
+        profiler.peaks[-1] = max(profiler.peaks[-1], outer_peak)
+    profiler.peaks.append(start_mem)
+    tracemalloc.reset_peak()
+    start_wall, start_cpu = time.perf_counter(), time.process_time()
+    try:
+        yield
+    finally:
+        wall, cpu = time.perf_counter() - start_wall, time.process_time() - start_cpu
+        highest = max(profiler.peaks.pop(), tracemalloc.get_traced_memory()[1])
+        if profiler.peaks:
+            profiler.peaks[-1] = max(profiler.peaks[-1], highest)
+        profiler.record(module, name, wall, cpu, highest - start_mem)
+
+
+def count(module, **counts):
+    '''records file/sample counts of a module if profiling is enabled'''
+    profiler = get_profiler()
+    if profiler is not None:
+        profiler.count(module, **counts)
+
+
+def write_profile():
+    '''writes the profile to the data directory and summarises it in the log'''
+    profiler = get_profiler()
+    if profiler is None:
+        return
+    for line in profiler.summary():
+        log.info("SEGLH profile - {}".format(line))
+    if config.data_dir is not None:
+        path = os.path.join(config.data_dir, PROFILE_FILENAME)
+        profiler.write(path)
+        log.debug("SEGLH profile written to {}".format(path))
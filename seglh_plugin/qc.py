@@ -0,0 +1,149 @@
+#!/usr/bin/env python
+""" QC evaluation of SEGLH metrics against specification limits
+
+Evaluates every sample against the lower and upper specification limits
+(LSL/USL) of every metric in one vectorised pass: values and limits are
+laid out as numpy arrays (samples x metrics, NaN for missing) and
+compared at once. A value passes if LSL <= value <= USL, where a missing
+limit is not checked; metrics without any limit are not evaluated.
+
+som.py recall values are classified into the bands of RECALL_BANDS; a
+recall in one of RECALL_FAIL_BANDS fails. This module does not depend on
+MultiQC.
+"""
+
+from __future__ import print_function
+
+import numpy as np
+
+PASS, FAIL, NA = 'PASS', 'FAIL', 'NA'
+# flag codes of QCResult.flags
+FLAG_NA, FLAG_FAIL, FLAG_PASS = -1, 0, 1
+FLAG_NAMES = {FLAG_NA: NA, FLAG_FAIL: FAIL, FLAG_PASS: PASS}
+
+# som.py recall bands, best first: (band, lower bound, bound included), a recall is in the first band it reaches
+RECALL_BANDS = (
+    ('verygreen', 0.99, True),
+    ('green', 0.98, False),
+    ('amber', 0.90, False),
+    ('red', 0.0, True),
+)
+# recall bands failing QC
+RECALL_FAIL_BANDS = ('red',)
+
+
+def as_float(value):
+    '''float of a metric value or limit, NaN if missing or not numeric'''
+    try:
+        return float(value) if value is not None else np.nan
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def recall_band(recall):
+    '''RECALL_BANDS band of a recall value (NA if missing)'''
+    value = as_float(recall)
+    if np.isnan(value):
+        return NA
+    for band, bound, inclusive in RECALL_BANDS:
+        if value > bound or (inclusive and value == bound):
+            return band
+    return RECALL_BANDS[-1][0]
+
+
+class QCResult(object):
+    '''
+    outcome of evaluate()
+        samples, metrics: row and column labels
+        values, lsl, usl: float arrays (NaN for missing)
+        flags: int8 array (samples x metrics) of FLAG_PASS, FLAG_FAIL or FLAG_NA
+    '''
+
+    def __init__(self, samples, metrics, values, lsl, usl, flags):
+        self.samples = samples
+        self.metrics = metrics
+        self.values = values
+        self.lsl = lsl
+        self.usl = usl
+        self.flags = flags
+
+    def __len__(self):
+        return len(self.samples)
+
+    def failed_count(self):
+        '''number of failing metrics per sample'''
+        return (self.flags == FLAG_FAIL).sum(axis=1)
+
+    def na_count(self):
+        '''number of evaluated metrics without a value per sample'''
+        return (self.flags == FLAG_NA).sum(axis=1)
+
+    def metric_failed_count(self):
+        '''number of failing samples per metric'''
+        return (self.flags == FLAG_FAIL).sum(axis=0)
+
+    def status(self):
+        '''PASS or FAIL per sample (NA if no metric had a value)'''
+        failed, evaluated = self.failed_count(), (self.flags != FLAG_NA).sum(axis=1)
+        return [FAIL if f else (PASS if e else NA) for f, e in zip(failed.tolist(), evaluated.tolist())]
+
+    def failed_metrics(self, i):
+        '''names of the failing metrics of the sample in row i'''
+        return [self.metrics[j] for j in np.flatnonzero(self.flags[i] == FLAG_FAIL)]
+
+    def flag_names(self):
+        '''{sample: {metric: PASS | FAIL | NA}}'''
+        names = np.array([FLAG_NAMES[FLAG_NA], FLAG_NAMES[FLAG_FAIL], FLAG_NAMES[FLAG_PASS]])[self.flags + 1]
+        return dict((s, dict(zip(self.metrics, row))) for s, row in zip(self.samples, names.tolist()))
+
+    def summary(self):
+        '''{sample: {'status', 'failed', 'na', 'failed_metrics'}}'''
+        failed, na = self.failed_count().tolist(), self.na_count().tolist()
+        return dict((s, {
+            'status': status,
+            'failed': failed[i],
+            'na': na[i],
+            'failed_metrics': self.failed_metrics(i),
+        }) for i, (s, status) in enumerate(zip(self.samples, self.status())))
+
+
+def checked_metrics(limits):
+    '''metrics with at least one limit, in the order of limits'''
+    return [m for m, (lsl, usl) in limits.items() if lsl is not None or usl is not None]
+
+
+def evaluate(samples, limits):
+    '''
+    evaluates all samples against the specification limits
+    input:
+        samples: {sample: {metric: value}}
+        limits: {metric: (lsl, usl)}, None for a missing limit
+    output:
+        QCResult
+    '''
+    metrics = checked_metrics(limits)
+    names = list(samples)
+    values = np.full((len(names), len(metrics)), np.nan)
+    for i, s in enumerate(names):
+        data = samples[s]
+        values[i] = [as_float(data.get(m)) for m in metrics]
+    return evaluate_values(names, metrics, values, limits)
+
+
+def evaluate_values(samples, metrics, values, limits):
+    '''
+    evaluates a samples x metrics float array (NaN for missing) against the specification limits
+    input:
+        samples, metrics: row and column labels of values
+        limits: {metric: (lsl, usl)}, None for a missing limit
+    output:
+        QCResult
+    '''
+    lsl = np.array([as_float(limits[m][0]) for m in metrics], dtype=float)
+    usl = np.array([as_float(limits[m][1]) for m in metrics], dtype=float)
+
+    # NaN limits compare False, so they are replaced by infinite bounds
+    with np.errstate(invalid='ignore'):
+        ok = (values >= np.where(np.isnan(lsl), -np.inf, lsl)) & (values <= np.where(np.isnan(usl), np.inf, usl))
+    flags = np.where(np.isnan(values), FLAG_NA, np.where(ok, FLAG_PASS, FLAG_FAIL)).astype(np.int8)
+    return QCResult(samples, metrics, values, lsl, usl, flags)
@@ -0,0 +1,214 @@
+#!/usr/bin/env python
+""" seglh-qc: QC gate of a pipeline step without the MultiQC report
+
+Reads TSO500 MetricsOutput.tsv and som.py *.stats.csv files (plain or
+compressed, given directly or found in the given directories) with the
+module parsers and checks every sample:
+
+    tso500: each metric against its LSL/USL guideline (seglh_plugin.qc)
+    sompy: the recall of each variant group against RECALL_BANDS (a
+           checked group without a recall value fails)
+
+and writes the verdict as JSON or TSV. The exit status is 0 if all samples
+passed, 1 if any sample failed and 2 if the inputs could not be read, held
+no samples or a sample could not be evaluated (status NA).
+MultiQC is not imported, so the gate starts in a fraction of a second.
+
+    seglh-qc [--format json|tsv] [--output FILE] PATH [PATH ...]
+"""
+
+from __future__ import print_function
+import argparse
+import fnmatch
+import json
+import os
+import sys
+
+from seglh_plugin.parsers import open_text, read_errors, strip_compression
+from seglh_plugin.parsers.sompy import parse_stats_csv
+from seglh_plugin.parsers.tso500 import parse_metrics_output
+from seglh_plugin.qc import FAIL, NA, PASS, RECALL_FAIL_BANDS, evaluate, recall_band
+from seglh_plugin.samples import SampleIndex
+
+# file name patterns of the gated inputs (without compression extension)
+INPUT_PATTERNS = (
+    ('tso500', 'MetricsOutput.tsv'),
+    ('sompy', '*.stats.csv'),
+)
+# som.py variant groups gated by default
+RECALL_GROUPS = ('SNVs', 'indels')
+# columns of the TSV verdict
+TSV_COLUMNS = ('sample', 'check', 'status', 'value', 'detail')
+# exit status of the gate
+EXIT_PASS, EXIT_FAIL, EXIT_ERROR = 0, 1, 2
+# errors of the parsers on malformed inputs (besides read_errors())
+PARSER_ERRORS = (ValueError, IndexError, KeyError, TypeError)
+
+
+def input_kind(path):
+    '''module of an input file by its name (None if not a gated input)'''
+    fn = strip_compression(os.path.basename(path))
+    for kind, pattern in INPUT_PATTERNS:
+        if fnmatch.fnmatch(fn, pattern):
+            return kind
+    return None
+
+
+def find_inputs(paths):
+    '''[(kind, path)] of the given files and of the inputs found in the given directories'''
+    inputs = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, files in os.walk(path):
+                dirs.sort()
+                inputs.extend((input_kind(fn), os.path.join(root, fn)) for fn in sorted(files) if input_kind(fn))
+        else:
+            inputs.append((input_kind(path), path))
+    return inputs
+
+
+def check_tso500(parsed):
+    '''{sample: check} of the parsed TSO500 files'''
+    samples, limits = dict(), dict()
+    for data in parsed:
+        for sample, values in data['samples'].items():
+            samples.setdefault(sample, dict()).update(values)
+        for group, metric, lsl, usl in data['metrics']:
+            limits[metric] = (lsl, usl)
+    checks = dict()
+    for sample, q in evaluate(samples, limits).summary().items():
+        checks[sample] = {
+            'status': q['status'],
+            'failed': q['failed_metrics'],
+            'na': q['na'],
+        }
+    return checks
+
+
+def check_sompy(parsed, groups=RECALL_GROUPS):
+    '''{sample: check} of the parsed som.py files'''
+    samples = dict()
+    for data in parsed:
+        for sample, values in data.items():
+            samples.setdefault(sample, dict()).update(values)
+    checks = dict()
+    for sample, values in samples.items():
+        recall = dict()
+        for group in groups:
+            value = values.get(group, dict()).get('recall')
+            recall[group] = {'recall': value, 'band': recall_band(value)}
+        # a checked group without a recall value fails (it was not benchmarked)
+        failed = [g for g in groups if recall[g]['band'] in RECALL_FAIL_BANDS or recall[g]['band'] == NA]
+        checks[sample] = {
+            'status': FAIL if failed else (PASS if groups else NA),
+            'failed': failed,
+            'recall': recall,
+        }
+    return checks
+
+
+def gate(inputs, groups=RECALL_GROUPS, id_pattern=None):
+    '''
+    checks the samples of the inputs
+    input:
+        inputs: [(kind, path)]
+    output:
+        {'status': PASS | FAIL | NA, 'samples': {sample id: {'status', 'names', kind: check}}}
+        status is NA if there are no samples or a sample was not evaluated (and none failed)
+    '''
+    parsed = dict((kind, []) for kind, _ in INPUT_PATTERNS)
+    for kind, path in inputs:
+        parser = parse_metrics_output if kind == 'tso500' else parse_stats_csv
+        with open_text(path) as fh:
+            parsed[kind].append(parser(fh))
+    checks = {
+        'tso500': check_tso500(parsed['tso500']),
+        'sompy': check_sompy(parsed['sompy'], groups),
+    }
+
+    # samples of both modules joined by sample id
+    index = SampleIndex(id_pattern)
+    samples = dict()
+    for kind, sample_checks in checks.items():
+        for name, check in sample_checks.items():
+            sample = samples.setdefault(index.sample_id(name), {'status': NA, 'names': dict()})
+            sample['names'][kind] = name
+            sample[kind] = check
+            if check['status'] == FAIL or sample['status'] == FAIL:
+                sample['status'] = FAIL
+            elif check['status'] == PASS:
+                sample['status'] = PASS
+    if any(s['status'] == FAIL for s in samples.values()):
+        status = FAIL
+    elif not samples or any(s['status'] == NA for s in samples.values()):
+        status = NA
+    else:
+        status = PASS
+    return {'status': status, 'samples': samples}
+
+
+def write_tsv(verdict, fh):
+    '''one row per sample and check: tso500 (detail: failing metrics), sompy_<group> (detail: recall band)'''
+    fh.write('\t'.join(TSV_COLUMNS) + '\n')
+    for sample, result in sorted(verdict['samples'].items()):
+        rows = []
+        if 'tso500' in result:
+            check = result['tso500']
+            rows.append(('tso500', check['status'], '', ','.join(check['failed'])))
+        if 'sompy' in result:
+            for group, recall in result['sompy']['recall'].items():
+                status = FAIL if recall['band'] in RECALL_FAIL_BANDS or recall['band'] == NA else PASS
+                value = '' if recall['recall'] is None else '{}'.format(recall['recall'])
+                rows.append(('sompy_{}'.format(group), status, value, recall['band']))
+        for row in rows:
+            fh.write('\t'.join((sample,) + row) + '\n')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='seglh-qc', description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('paths', nargs='+', help='MetricsOutput.tsv / *.stats.csv files or directories')
+    parser.add_argument('--format', choices=('json', 'tsv'), default='json', help='verdict format (default: json)')
+    parser.add_argument('--output', '-o', help='verdict file (default: standard output)')
+    parser.add_argument('--recall-groups', nargs='+', default=list(RECALL_GROUPS),
+                        help='som.py variant groups checked (default: {})'.format(' '.join(RECALL_GROUPS)))
+    parser.add_argument('--sample-id-pattern', help='regular expression reducing sample names to a shared id')
+    args = parser.parse_args(argv)
+
+    inputs = find_inputs(args.paths)
+    unknown = [path for kind, path in inputs if kind is None]
+    if unknown:
+        print('seglh-qc: not a MetricsOutput.tsv or *.stats.csv file: {}'.format(', '.join(unknown)), file=sys.stderr)
+        return EXIT_ERROR
+    if not inputs:
+        print('seglh-qc: no inputs found in {}'.format(', '.join(args.paths)), file=sys.stderr)
+        return EXIT_ERROR
+    try:
+        verdict = gate(inputs, args.recall_groups, args.sample_id_pattern)
+    except read_errors() + PARSER_ERRORS as e:
+        print('seglh-qc: could not read the inputs: {}'.format(e), file=sys.stderr)
+        return EXIT_ERROR
+    if not verdict['samples']:
+        print('seglh-qc: no samples found in {}'.format(', '.join(path for _, path in inputs)), file=sys.stderr)
+        return EXIT_ERROR
+
+    fh = open(args.output, 'w') if args.output else sys.stdout
+    try:
+        if args.format == 'json':
+            json.dump(verdict, fh, indent=2, sort_keys=True, default=float)
+            fh.write('\n')
+        else:
+            write_tsv(verdict, fh)
+    finally:
+        if fh is not sys.stdout:
+            fh.close()
+    if verdict['status'] == NA:
+        print('seglh-qc: samples without evaluated checks: {}'.format(', '.join(
+            sample for sample, result in sorted(verdict['samples'].items()) if result['status'] == NA)),
+            file=sys.stderr)
+        return EXIT_ERROR
+    return EXIT_FAIL if verdict['status'] == FAIL else EXIT_PASS
+
+
+if __name__ == '__main__':
+    sys.exit(main())
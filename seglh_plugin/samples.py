@@ -0,0 +1,120 @@
+#!/usr/bin/env python
+""" Sample identity shared by the SEGLH modules
+
+Each module derives its sample names in its own way: ExomeDepth from the
+sample column of the readCount file, som.py from the output prefix in
+sompycmd, TSO500 from the MetricsOutput header and chanjo from the file
+name. The sample index normalises these names to one sample id (memoised,
+each name is normalised once) and joins the key metrics the modules
+register per id, so the General Statistics table has one row per sample
+with the SEGLH columns of all modules. The rows are built while the modules
+register their metrics and added in one block by the after_modules hook.
+
+The sample id is the name without the file extensions in ID_SUFFIXES, or
+the first group (else the whole match) of config.seglh_sample_id_pattern,
+e.g. '^(NGS\\d+_\\d+_\\d+)' to join on the run, sample number and DNA number.
+SampleIndex does not depend on MultiQC (it is also used by seglh-qc).
+"""
+
+from __future__ import print_function
+from collections import OrderedDict
+import logging
+import os
+import re
+
+# Initialise the main MultiQC logger
+log = logging.getLogger('multiqc')
+
+# extensions removed from sample names (som.py output prefixes end in .vcf)
+ID_SUFFIXES = ('.gz', '.zst', '.vcf', '.bam', '.cram', '.gene_level', '.txt', '.stats', '.csv')
+
+
+class SampleIndex(object):
+    '''
+    {sample id: {module: sample name}} of all modules, and the General
+    Statistics row of each sample id
+    '''
+
+    def __init__(self, id_pattern=None):
+        self.pattern = re.compile(id_pattern) if id_pattern else None
+        self.ids = dict()
+        self.samples = OrderedDict()
+        self.rows = OrderedDict()
+        self.headers = OrderedDict()
+
+    def sample_id(self, name):
+        '''sample id of a module sample name (memoised)'''
+        try:
+            return self.ids[name]
+        except KeyError:
+            pass
+        sample = os.path.basename(str(name).strip())
+        stripped = True
+        while stripped:
+            stripped = False
+            for suffix in ID_SUFFIXES:
+                if sample.endswith(suffix) and len(sample) > len(suffix):
+                    sample, stripped = sample[:-len(suffix)], True
+        if self.pattern is not None:
+            m = self.pattern.search(sample)
+            if m:
+                sample = m.group(1) if m.groups() else m.group(0)
+        self.ids[name] = sample
+        return sample
+
+    def add(self, module, namespace, data, headers):
+        '''
+        joins the key metrics of a module to the rows of its samples
+        input:
+            module: module key (prefix of the columns)
+            namespace: module name shown with the columns
+            data: {sample name: {metric: value}}
+            headers: {metric: header} of the metrics to show
+        '''
+        columns = []
+        for metric, header in headers.items():
+            column = '{}_{}'.format(module, metric)
+            self.headers[column] = dict(header, namespace=namespace)
+            columns.append((metric, column))
+        for name, values in data.items():
+            sample = self.sample_id(name)
+            self.samples.setdefault(sample, OrderedDict())[module] = name
+            row = self.rows.setdefault(sample, dict())
+            for metric, column in columns:
+                if metric in values:
+                    row[column] = values[metric]
+
+
+def get_index():
+    '''returns the sample index of this run (created on first use)'''
+    from multiqc.utils import config
+    index = getattr(config, 'seglh_sample_index', None)
+    if index is None:
+        index = config.seglh_sample_index = SampleIndex(getattr(config, 'seglh_sample_id_pattern', None))
+    return index
+
+
+def add_general_stats(module, key, data, headers):
+    '''
+    registers the General Statistics columns of a module in the sample index
+    input:
+        module: MultiqcModule instance
+        key: module key (tso500, sompy, exomedepth, sambamba_chanjo)
+        data: {sample name: {metric: value}}
+        headers: OrderedDict {metric: header}
+    '''
+    get_index().add(key, module.name, data, headers)
+
+
+def add_general_stats_table():
+    '''adds the joined rows of the sample index to General Statistics, writes multiqc_seglh_samples'''
+    from multiqc.utils import config, report
+    index = getattr(config, 'seglh_sample_index', None)
+    if index is None or not index.rows:
+        return
+    report.general_stats_data.append(index.rows)
+    report.general_stats_headers.append(index.headers)
+
+    from seglh_plugin.writer import write_data_file
+    write_data_file(None, index.samples, 'multiqc_seglh_samples')
+    log.info("Joined the SEGLH metrics of {} samples".format(len(index.rows)))
@@ -0,0 +1,197 @@
+#!/usr/bin/env python
+""" File search hook of the SEGLH plugin
+
+MultiQC matches every file it finds against the search patterns with
+report.search_file. install() replaces it with a wrapper that
+    - assigns files listed in the manifest (config.seglh_manifest) to their
+      module without opening them
+    - assigns shard files (config.seglh_shards) to every module they hold
+      results for
+    - classifies files against all SEGLH search patterns at once: names are
+      matched first, then the head of the remaining candidates is read once
+      and tested against every content signature in one pass (MultiQC opens
+      a file for each pattern with contents). The result is kept per file.
+      Gzip and zstandard compressed files are matched by their name without
+      the compression extension and their decompressed contents (MultiQC
+      skips all compressed files)
+All other files go through the MultiQC search. MultiQC ignores compressed
+names such as *.txt.gz before any search pattern is tried, so the wrapped
+report.get_filelist lifts these ignore patterns while the files are
+searched; the files they match are only offered to the SEGLH modules.
+With --seglh-profile the walk (get_filelist) is recorded as the discovery
+phase of 'search' and the SEGLH classification within it as its classify
+phase.
+"""
+
+from __future__ import print_function
+import fnmatch
+import logging
+import mimetypes
+import os
+import re
+
+from multiqc.utils import config, report
+from seglh_plugin.manifest import MODULES
+from seglh_plugin.parsers import compression, open_text, read_errors, strip_compression
+from seglh_plugin.profiling import count, phase
+
+# Initialise the main MultiQC logger
+log = logging.getLogger('multiqc')
+
+# {path: frozenset of matching (search pattern key, pattern index)}, filled during discovery
+_classified = dict()
+# number of files classified and of files opened to classify them
+_stats = {'files_classified': 0, 'files_read': 0}
+# config.fn_ignore_files patterns of compressed files, lifted while the files are searched
+_lifted = []
+
+
+def manifest_entry(f):
+    '''(module, sample) of a file found by MultiQC if it is listed in the manifest'''
+    manifest = getattr(config, 'seglh_manifest', None)
+    if not manifest:
+        return None
+    return manifest.get(os.path.abspath(os.path.join(f['root'], f['fn'])))
+
+
+def shard_modules(f):
+    '''search pattern keys with results in a shard file given with --seglh-merge'''
+    shards = getattr(config, 'seglh_shards', None)
+    if not shards:
+        return None
+    shard = shards.get(os.path.abspath(os.path.join(f['root'], f['fn'])))
+    return None if shard is None else [key for key, entries in shard.items() if entries]
+
+
+def seglh_patterns(key):
+    '''search patterns of a SEGLH module key (a list, as MultiQC allows several)'''
+    patterns = config.sp.get(key) or []
+    return patterns if isinstance(patterns, list) else [patterns]
+
+
+def name_match(pattern, fn):
+    '''True/False if a pattern is decided by the file name, None if its contents must be read'''
+    has_fn = pattern.get('fn') is not None or pattern.get('fn_re') is not None
+    fn_matched = ((pattern.get('fn') is not None and fnmatch.fnmatch(fn, pattern['fn'])) or
+                  (pattern.get('fn_re') is not None and re.match(pattern['fn_re'], fn) is not None))
+    if pattern.get('contents') is None and pattern.get('contents_re') is None:
+        return fn_matched
+    if has_fn and not fn_matched:
+        return False
+    return None
+
+
+def line_match(pattern, line):
+    if pattern.get('contents') is not None:
+        return pattern['contents'] in line
+    return re.search(pattern['contents_re'], line) is not None
+
+
+def classify(f):
+    '''
+    matches a file against all SEGLH search patterns, reading its head at most once
+    output:
+        frozenset of the matching (search pattern key, pattern index)
+    '''
+    path = os.path.join(f['root'], f['fn'])
+    try:
+        return _classified[path]
+    except KeyError:
+        pass
+    with phase('search', 'classify'):
+        result = _classified[path] = match_patterns(f, path)
+    _stats['files_classified'] += 1
+    count('search', **_stats)
+    return result
+
+
+def match_patterns(f, path):
+    '''frozenset of the (search pattern key, pattern index) matching a file'''
+    kind = compression(f['fn'])
+    fn = strip_compression(f['fn']) if kind else f['fn']
+    # as MultiQC: binary and image files are not searched (compressed files are decompressed here)
+    skip = False
+    if kind is None and config.ignore_images and not re.match(r'.+_mqc\.(png|jpg|jpeg)', f['fn']):
+        ftype, encoding = mimetypes.guess_type(path)
+        skip = encoding is not None or (ftype is not None and ftype.startswith('image'))
+
+    matched, pending = set(), []
+    for key in MODULES:
+        for i, pattern in enumerate(seglh_patterns(key)):
+            if skip or not isinstance(pattern, dict):
+                continue
+            if pattern.get('max_filesize') is not None and f.get('filesize', 0) > pattern['max_filesize']:
+                continue
+            decided = name_match(pattern, fn)
+            if decided:
+                matched.add((key, i))
+            elif decided is None:
+                pending.append(((key, i), pattern, pattern.get('num_lines') or None))
+
+    if pending:
+        # one pass over the head of the file for all content signatures
+        last = None if any(n is None for _, _, n in pending) else max(n for _, _, n in pending)
+        try:
+            with open_text(path) as fh:
+                for n, line in enumerate(fh, 1):
+                    pending = [p for p in pending if p[2] is None or n <= p[2]]
+                    for p in [p for p in pending if line_match(p[1], line)]:
+                        matched.add(p[0])
+                        pending.remove(p)
+                    if not pending or (last is not None and n >= last):
+                        break
+        except read_errors() as e:
+            log.debug("Couldn't read file when looking for output: {}, {}".format(path, e))
+        _stats['files_read'] += 1
+    return frozenset(matched)
+
+
+def lifted_ignore(fn):
+    '''True if a file is ignored by MultiQC by a compressed file pattern (e.g. *.txt.gz)'''
+    return any(fnmatch.fnmatch(fn, n) for n in _lifted)
+
+
+def make_search_file(search_file):
+    '''wraps the MultiQC search_file function'''
+    def seglh_search_file(pattern, f, module_key):
+        if module_key not in MODULES and lifted_ignore(f['fn']):
+            return False
+        entry = manifest_entry(f)
+        if entry is not None:
+            return entry[0] == module_key
+        modules = shard_modules(f)
+        if modules is not None:
+            return module_key in modules
+        if module_key in MODULES:
+            for i, p in enumerate(seglh_patterns(module_key)):
+                if p is pattern:
+                    return (module_key, i) in classify(f)
+        return search_file(pattern, f, module_key)
+    seglh_search_file.wrapped = search_file
+    return seglh_search_file
+
+
+def make_get_filelist(get_filelist):
+    '''wraps the MultiQC get_filelist function, lifting the compressed file ignore patterns'''
+    def seglh_get_filelist(run_module_names):
+        ignored = config.fn_ignore_files
+        _lifted[:] = [n for n in ignored if compression(n)]
+        config.fn_ignore_files = [n for n in ignored if not compression(n)]
+        try:
+            with phase('search', 'discovery'):
+                return get_filelist(run_module_names)
+        finally:
+            config.fn_ignore_files = ignored
+            del _lifted[:]
+    seglh_get_filelist.wrapped = get_filelist
+    return seglh_get_filelist
+
+
+def install():
+    '''replaces report.search_file and report.get_filelist by the SEGLH wrappers (once)'''
+    _classified.clear()
+    _stats.update(files_classified=0, files_read=0)
+    if not hasattr(report.search_file, 'wrapped'):
+        report.search_file = make_search_file(report.search_file)
+    if not hasattr(report.get_filelist, 'wrapped'):
+        report.get_filelist = make_get_filelist(report.get_filelist)
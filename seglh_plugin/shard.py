@@ -0,0 +1,117 @@
+#!/usr/bin/env python
+""" Sharded parsing with mergeable intermediate files
+
+Large projects can be parsed on several nodes:
+    --seglh-shard I/N       parse only shard I (1..N) of the SEGLH input files
+                            (every N-th file in path order, so all nodes can
+                            be given the same analysis paths)
+    --seglh-shard-out FILE  write the parsed results of the SEGLH modules to
+                            FILE (gzip compressed, versioned JSON)
+    --seglh-merge FILE ...  build the report from shard files; their results
+                            are handed to the modules without reading inputs
+
+Shard files hold, per search pattern key, the file name, directory, sample
+name and parser result of every file. A merge run can write a shard file
+again, so shards can be merged hierarchically.
+"""
+
+from __future__ import print_function
+import array
+import base64
+import gzip
+import json
+import logging
+import os
+import sys
+
+from multiqc.utils import config
+
+# Initialise the main MultiQC logger
+log = logging.getLogger('multiqc')
+
+SHARD_FORMAT = 'seglh-shard'
+SHARD_VERSION = 1
+
+
+def parse_shard(spec):
+    '''(index, count) of an I/N shard specification, index 0 based'''
+    try:
+        index, n = [int(x) for x in spec.split('/')]
+    except ValueError:
+        raise ValueError("shard must be given as I/N, not '{}'".format(spec))
+    if not 1 <= index <= n:
+        raise ValueError("shard {} is not between 1 and {}".format(index, n))
+    return index - 1, n
+
+
+def select_shard(files, paths):
+    '''keeps the files of this node's shard (--seglh-shard), in discovery order'''
+    spec = config.kwargs.get('seglh_shard')
+    if not spec:
+        return files, paths
+    index, n = parse_shard(spec)
+    selected = set(sorted(paths)[index::n])
+    kept = [(f, path) for f, path in zip(files, paths) if path in selected]
+    return [f for f, _ in kept], [path for _, path in kept]
+
+
+def encode(obj):
+    '''JSON encoding of the parser results that are not plain JSON (typed arrays)'''
+    if isinstance(obj, array.array):
+        return {'__array__': obj.typecode, 'data': base64.b64encode(obj.tobytes()).decode('ascii')}
+    raise TypeError("{} is not JSON serializable".format(type(obj).__name__))
+
+
+def decode(obj):
+    '''object hook restoring the typed arrays of a shard file'''
+    if '__array__' not in obj:
+        return obj
+    values = array.array(obj['__array__'])
+    values.frombytes(base64.b64decode(obj['data']))
+    return values
+
+
+def record(sp_key, f, result):
+    '''keeps a parsed result for the shard file (if writing one)'''
+    if not config.kwargs.get('seglh_shard_out'):
+        return
+    records = getattr(config, 'seglh_shard_records', None)
+    if records is None:
+        records = config.seglh_shard_records = dict()
+    records.setdefault(sp_key, []).append({
+        'fn': f['fn'], 'root': f['root'], 's_name': f['s_name'], 'result': result})
+
+
+def write_shard(path):
+    '''writes the recorded results to a shard file'''
+    records = getattr(config, 'seglh_shard_records', None) or dict()
+    shard = {
+        'format': SHARD_FORMAT,
+        'version': SHARD_VERSION,
+        'plugin_version': getattr(config, 'seglh_plugin_version', None),
+        'byteorder': sys.byteorder,
+        'shard': config.kwargs.get('seglh_shard'),
+        'modules': records,
+    }
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    with gzip.open(path, 'wt', encoding='utf-8', compresslevel=6) as fh:
+        json.dump(shard, fh, default=encode, separators=(',', ':'))
+    log.info("Wrote SEGLH shard {} ({} files)".format(path, sum(len(r) for r in records.values())))
+
+
+def load_shard(path):
+    '''
+    reads a shard file
+    output:
+        {search pattern key: [{'fn', 'root', 's_name', 'result'}]}
+    '''
+    with gzip.open(path, 'rt', encoding='utf-8') as fh:
+        shard = json.load(fh, object_hook=decode)
+    if not isinstance(shard, dict) or shard.get('format') != SHARD_FORMAT or shard.get('version') != SHARD_VERSION:
+        raise ValueError("not a version {} SEGLH shard file".format(SHARD_VERSION))
+    if shard['byteorder'] != sys.byteorder:
+        raise ValueError("written on a {} endian machine".format(shard['byteorder']))
+    if shard['plugin_version'] != getattr(config, 'seglh_plugin_version', None):
+        log.warning("SEGLH shard {} was written by plugin version {}".format(path, shard['plugin_version']))
+    return shard['modules']
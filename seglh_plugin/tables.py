@@ -0,0 +1,320 @@
+#!/usr/bin/env python
+""" Sample tables of the SEGLH modules, sized for large runs
+
+MultiQC renders every cell of a table into the report HTML (with its colour
+scale and a copy of the raw value), so the report size, the generation time
+and the memory of the browser grow with samples x columns. The SEGLH
+modules build their tables with plot(), which hands tables up to
+config.seglh_table_max_cells cells to MultiQC unchanged. Larger tables are
+rendered as:
+
+    a summary table of each column across the samples (n, min, median,
+    mean, max), its size does not depend on the number of samples
+
+    a compact table of all samples: the values (rounded to the column
+    format) as gzipped, base64 encoded JSON, drawn page by page in the
+    browser (config.seglh_table_page_size rows per page, with a sample
+    filter and sortable columns)
+
+With config.seglh_table_embed set to False only the summary is embedded
+(the values of all samples are in the module data files). Compact tables
+have no colour scales, hidden columns or MultiQC toolbox support.
+"""
+
+from __future__ import print_function
+import base64
+import gzip
+import json
+import logging
+import math
+import re
+
+import numpy as np
+
+# Initialise the main MultiQC logger
+log = logging.getLogger('multiqc')
+
+# tables with more cells are rendered as summary + compact table
+DEFAULT_MAX_CELLS = 20000
+# rows per page of a compact table
+DEFAULT_PAGE_SIZE = 100
+# statistics of the summary table (title, description, function of the values of a column)
+SUMMARY_STATS = (
+    ('n', 'Number of samples with a value', lambda v: float(len(v))),
+    ('min', 'Lowest value', np.min),
+    ('median', 'Median value', np.median),
+    ('mean', 'Mean value', np.mean),
+    ('max', 'Highest value', np.max),
+)
+# format strings of the table headers ({:,.2f}, {:.0f}, {:,.3e})
+FORMAT_PATTERN = re.compile(r'^\{:(,?)\.(\d+)([fe])\}$')
+
+COMPACT_TEMPLATE = '''
+<div class="mqc_table_container seglh-compact-table" id="{id}">
+  <p class="text-muted"><strong>{title}</strong>: {samples:,} samples x {columns:,} columns
+    ({cells:,} values), shown {page} samples per page.</p>
+  <div class="form-inline" style="margin-bottom: 6px;">
+    <input type="text" class="form-control input-sm seglh-filter" placeholder="Filter samples">
+    <button type="button" class="btn btn-default btn-sm seglh-prev">&laquo; Previous</button>
+    <span class="seglh-page"></span>
+    <button type="button" class="btn btn-default btn-sm seglh-next">Next &raquo;</button>
+  </div>
+  <div class="table-responsive">
+    <table class="table table-condensed mqc_table"><thead></thead><tbody></tbody></table>
+  </div>
+  <script type="text/plain" class="seglh-compact-data">{payload}</script>
+</div>
+<script type="text/javascript">
+(function () {{
+  var root = document.getElementById('{id}'), size = {page}, info = root.querySelector('.seglh-page');
+  if (typeof DecompressionStream === 'undefined') {{
+    info.textContent = 'This browser can not decompress the table (see the module data files).';
+    return;
+  }}
+  function esc(s) {{
+    return String(s).replace(/&/g, '&amp;').replace(/</g, '&lt;').replace(/>/g, '&gt;').replace(/"/g, '&quot;');
+  }}
+  function fmt(c, v) {{
+    if (v === null) return '';
+    if (typeof v !== 'number') return esc(v);
+    var s = c.decimals === null ? String(v) : (c.exp ? v.toExponential(c.decimals) : v.toFixed(c.decimals));
+    if (c.thousands && !c.exp) {{
+      var p = s.split('.');
+      p[0] = p[0].replace(/\\B(?=(\\d{{3}})+(?!\\d))/g, ',');
+      s = p.join('.');
+    }}
+    return esc(s + c.suffix);
+  }}
+  var b = atob(root.querySelector('.seglh-compact-data').textContent.trim()), bytes = new Uint8Array(b.length);
+  for (var i = 0; i < b.length; i++) bytes[i] = b.charCodeAt(i);
+  var stream = new Blob([bytes]).stream().pipeThrough(new DecompressionStream('gzip'));
+  new Response(stream).json().then(function (t) {{
+    var rows = t.rows, shown = rows, query = '', page = 0, sorted = -1, asc = true;
+    var thead = root.querySelector('thead'), tbody = root.querySelector('tbody');
+    var head = '<tr><th data-col="0" style="cursor: pointer;">' + esc(t.col1_header) + '</th>';
+    t.columns.forEach(function (c, j) {{
+      head += '<th data-col="' + (j + 1) + '" title="' + esc(c.description) + '" style="cursor: pointer;">' +
+        esc(c.title) + '</th>';
+    }});
+    thead.innerHTML = head + '</tr>';
+    function render() {{
+      var pages = Math.max(1, Math.ceil(shown.length / size)), html = '';
+      page = Math.max(0, Math.min(page, pages - 1));
+      shown.slice(page * size, (page + 1) * size).forEach(function (r) {{
+        html += '<tr><th>' + esc(r[0]) + '</th>';
+        for (var j = 1; j < r.length; j++) {{
+          html += (typeof r[j] === 'number' ? '<td class="text-right">' : '<td>') + fmt(t.columns[j - 1], r[j]) + '</td>';
+        }}
+        html += '</tr>';
+      }});
+      tbody.innerHTML = html;
+      info.textContent = ' Page ' + (page + 1) + ' of ' + pages + ' (' + shown.length + ' samples) ';
+    }}
+    function filter() {{
+      shown = query ? rows.filter(function (r) {{ return String(r[0]).toLowerCase().indexOf(query) >= 0; }}) : rows;
+    }}
+    root.querySelector('.seglh-filter').addEventListener('input', function () {{
+      query = this.value.toLowerCase();
+      page = 0;
+      filter();
+      render();
+    }});
+    root.querySelector('.seglh-prev').addEventListener('click', function () {{ page--; render(); }});
+    root.querySelector('.seglh-next').addEventListener('click', function () {{ page++; render(); }});
+    thead.addEventListener('click', function (e) {{
+      var col = e.target.getAttribute('data-col');
+      if (col === null) return;
+      col = +col;
+      asc = sorted === col ? !asc : true;
+      sorted = col;
+      rows.sort(function (a, b) {{
+        if (a[col] === b[col]) return 0;
+        if (a[col] === null) return 1;
+        if (b[col] === null) return -1;
+        return (a[col] < b[col] ? -1 : 1) * (asc ? 1 : -1);
+      }});
+      filter();
+      render();
+    }});
+    render();
+  }});
+}})();
+</script>
+'''
+
+
+def max_cells():
+    '''cell count above which tables are rendered compact (0 or None: never)'''
+    from multiqc.utils import config
+    return getattr(config, 'seglh_table_max_cells', DEFAULT_MAX_CELLS)
+
+
+def column_format(header):
+    '''(decimals, thousands separator, exponent) of a header format (decimals None: value as is)'''
+    m = FORMAT_PATTERN.match(header.get('format') or '')
+    if m is None:
+        return None, False, False
+    return int(m.group(2)), bool(m.group(1)), m.group(3) == 'e'
+
+
+def number(value):
+    '''float of a numeric cell (None for text, None and non-finite values)'''
+    if isinstance(value, bool) or not isinstance(value, (int, float, np.number)):
+        return None
+    value = float(value)
+    return value if math.isfinite(value) else None
+
+
+def table_values(data, columns, table=None):
+    '''
+    (samples, samples x columns float array, samples x columns cells) of the visible columns
+    input:
+        data: {sample: {column: value}}
+        columns: column keys
+        table: columnar source of data with a to_table() method (numeric values)
+    output:
+        cells are the values for the payload (text kept, missing values None), None with a table
+    '''
+    if table is not None:
+        samples, names, values, _ = table.to_table()
+        index = dict((name, i) for i, name in enumerate(names))
+        cols = np.array([index.get(c, -1) for c in columns], dtype=np.intp)
+        matrix = np.full((len(samples), len(cols)), np.nan)
+        known = cols >= 0
+        matrix[:, known] = np.asarray(values, dtype=np.float64)[:, cols[known]]
+        # as number(): non-finite values are missing (JSON has no Infinity)
+        matrix[~np.isfinite(matrix)] = np.nan
+        return list(samples), matrix, None
+    samples = list(data)
+    cells = []
+    for sample in samples:
+        values = data[sample]
+        row = []
+        for c in columns:
+            value = values.get(c)
+            if isinstance(value, float) and not math.isfinite(value):
+                value = None
+            row.append(value)
+        cells.append(row)
+    matrix = np.array([[number(v) for v in row] for row in cells], dtype=np.float64).reshape(len(samples), len(columns))
+    return samples, matrix, cells
+
+
+def payload_rows(samples, matrix, cells, formats):
+    '''[[sample, value, ...]] of the compact table, numbers rounded to their column format'''
+    rounded = matrix.copy()
+    for j, (decimals, _, exp) in enumerate(formats):
+        if decimals is not None and not exp:
+            rounded[:, j] = np.round(rounded[:, j], decimals)
+    values = rounded.astype(object)
+    values[~np.isfinite(rounded)] = None
+    values = values.tolist()
+    if cells is not None:
+        # text cells are kept as they are
+        for row, cell_row in zip(values, cells):
+            for j, cell in enumerate(cell_row):
+                if cell is not None and number(cell) is None:
+                    row[j] = '{}'.format(cell)
+    return [[sample] + row for sample, row in zip(samples, values)]
+
+
+def compact_table(pconfig, headers, columns, samples, rows, page_size):
+    '''HTML of a compact table'''
+    from multiqc.utils import report
+    payload = {
+        'col1_header': pconfig.get('col1_header', 'Sample Name'),
+        'columns': [],
+        'rows': rows,
+    }
+    for c in columns:
+        decimals, thousands, exp = column_format(headers[c])
+        payload['columns'].append({
+            'title': headers[c].get('title', c),
+            'description': headers[c].get('description', c),
+            'suffix': headers[c].get('suffix', ''),
+            'decimals': decimals,
+            'thousands': thousands,
+            'exp': exp,
+        })
+    encoded = gzip.compress(json.dumps(payload, separators=(',', ':')).encode('utf-8'), 6)
+    return COMPACT_TEMPLATE.format(
+        id=report.save_htmlid('{}-compact'.format(pconfig.get('id', 'seglh-table'))),
+        title=pconfig.get('table_title', pconfig.get('id', '')),
+        samples=len(samples),
+        columns=len(columns),
+        cells=len(samples) * len(columns),
+        page=page_size,
+        payload=base64.b64encode(encoded).decode('ascii'),
+    )
+
+
+def summary_table(pconfig, headers, columns, matrix, compact):
+    '''table of the statistics of each column across the samples (compact if compact is set)'''
+    from multiqc.plots import table
+    titles = [headers[c].get('title', c) for c in columns]
+    stats = np.full((len(columns), len(SUMMARY_STATS)), np.nan)
+    for j in range(len(columns)):
+        values = matrix[:, j][~np.isnan(matrix[:, j])]
+        if len(values):
+            stats[j] = [fn(values) for _, _, fn in SUMMARY_STATS]
+    stat_headers = dict()
+    for stat, description, _ in SUMMARY_STATS:
+        stat_headers[stat] = {
+            'title': 'Samples' if stat == 'n' else stat.capitalize(),
+            'description': description,
+            'format': '{:,.0f}' if stat == 'n' else '{:,.3f}',
+            'scale': False,
+        }
+    summary_config = dict(pconfig, **{
+        'id': '{}-summary'.format(pconfig.get('id', 'seglh-table')),
+        'table_title': '{} (summary)'.format(pconfig.get('table_title', pconfig.get('id', ''))),
+        'col1_header': 'Column',
+        'no_beeswarm': True,
+    })
+    if compact:
+        formats = [column_format(stat_headers[stat]) for stat in stat_headers]
+        return compact_table(summary_config, stat_headers, list(stat_headers), titles,
+                             payload_rows(titles, stats, None, formats), page_size())
+    data = dict()
+    for title, row in zip(titles, stats.tolist()):
+        data[title] = dict((stat, None if math.isnan(v) else v) for stat, v in zip(stat_headers, row))
+    return table.plot(data, stat_headers, summary_config)
+
+
+def page_size():
+    '''rows per page of the compact tables'''
+    from multiqc.utils import config
+    return getattr(config, 'seglh_table_page_size', DEFAULT_PAGE_SIZE) or DEFAULT_PAGE_SIZE
+
+
+def plot(data, headers, pconfig, table=None):
+    '''
+    MultiQC table of the samples, or summary and compact table above config.seglh_table_max_cells cells
+    input:
+        data: {sample: {column: value}}, None to plot table
+        headers: OrderedDict {column: header}
+        pconfig: MultiQC table config
+        table: columnar source of data with to_table() and to_dict() methods (numeric values only)
+    output:
+        HTML of the section plot
+    '''
+    from multiqc.plots import table as mqc_table
+    from multiqc.utils import config
+    limit = max_cells()
+    if not limit or len(data if data is not None else table) * len(headers) <= limit:
+        if data is None:
+            data = table.to_dict()
+        # only the columns of the table are handed to MultiQC (it processes every value of a sample)
+        selected = dict((sample, dict((c, values[c]) for c in headers if c in values))
+                        for sample, values in data.items())
+        return mqc_table.plot(selected, headers, pconfig)
+
+    columns = [c for c, h in headers.items() if not h.get('hidden')]
+    samples, matrix, cells = table_values(data, columns, table)
+    html = summary_table(pconfig, headers, columns, matrix, len(columns) * len(SUMMARY_STATS) > limit)
+    if getattr(config, 'seglh_table_embed', True):
+        formats = [column_format(headers[c]) for c in columns]
+        html += compact_table(pconfig, headers, columns, samples,
+                              payload_rows(samples, matrix, cells, formats), page_size())
+    log.debug("Compact table {}: {} samples x {} columns".format(pconfig.get('id'), len(samples), len(columns)))
+    return html
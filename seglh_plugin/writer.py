@@ -0,0 +1,272 @@
+#!/usr/bin/env python
+""" Background writer for the data files of the SEGLH modules
+
+Modules hand their data files to write_data_file(), which registers the
+data with MultiQC (report.saved_raw_data, for multiqc_data.json) and queues
+the file on a single background thread, so sections and tables are built
+while the file is serialised and written. The queue is bounded: a module
+waits when MAX_PENDING files are queued. Data is copied before it is queued
+(table.plot reorders the sample dictionaries it is given). The writer is
+flushed before the report is generated (flush_data_files, called from the
+before_report_generation hook) and failed writes are logged as errors.
+
+With --seglh-data-format the SEGLH data files are written in another format
+than config.data_format, including npz: a compact binary numpy archive of
+the samples x columns table (see write_npz).
+
+Data files given only as a columnar table (data None) are written from the
+table, and the {sample: {column: value}} copy for multiqc_data.json is only
+built when the writer is flushed (if config.data_dump_file is set).
+"""
+
+from __future__ import print_function
+from collections.abc import Mapping
+import io
+import logging
+import os
+import queue
+import threading
+
+from multiqc.utils import config, report, util_functions
+
+# Initialise the main MultiQC logger
+log = logging.getLogger('multiqc')
+
+# data formats of --seglh-data-format (npz in addition to the MultiQC formats)
+DATA_FORMATS = ('tsv', 'json', 'yaml', 'npz')
+# files queued before a module waits for the writer
+MAX_PENDING = 4
+# kinds of the cells of an npz table
+KIND_ABSENT, KIND_FLOAT, KIND_NONE, KIND_TEXT, KIND_INT = 0, 1, 2, 3, 4
+
+_writer = None
+# [(fn, table)] of the data files registered with MultiQC when the writer is flushed
+_deferred = []
+
+
+class DataWriter(object):
+    '''single background thread writing queued jobs, with a bounded queue'''
+
+    def __init__(self, max_pending=MAX_PENDING):
+        self.queue = queue.Queue(max_pending)
+        self.errors = []
+        self.thread = threading.Thread(target=self.run, name='seglh-data-writer', daemon=True)
+        self.thread.start()
+
+    def submit(self, fn, job):
+        '''queues job (a function without arguments) writing fn, waits if the queue is full'''
+        self.queue.put((fn, job))
+
+    def run(self):
+        while True:
+            fn, job = self.queue.get()
+            try:
+                job()
+            except Exception as e:
+                self.errors.append((fn, e))
+            finally:
+                self.queue.task_done()
+
+    def flush(self):
+        '''waits for all queued files, returns [(fn, exception)] of the failed ones'''
+        self.queue.join()
+        errors, self.errors = self.errors, []
+        return errors
+
+
+def get_writer():
+    '''returns the shared DataWriter (started on first use)'''
+    global _writer
+    if _writer is None:
+        _writer = DataWriter()
+    return _writer
+
+
+def data_format():
+    '''format of the SEGLH data files (--seglh-data-format, else config.data_format)'''
+    return config.kwargs.get('seglh_data_format') or config.data_format
+
+
+def snapshot(data):
+    '''copy of {sample: {column: value}} that stays unchanged while sections are built'''
+    copy = data.copy()
+    for k, v in copy.items():
+        if isinstance(v, dict):
+            copy[k] = v.copy()
+    return copy
+
+
+def to_plain(data):
+    '''{sample: {column: value}} of a compact store (e.g. the tso500 MetricStore) as new dictionaries'''
+    return data.to_dict() if hasattr(data, 'to_dict') else plain(data)
+
+
+def plain(data):
+    '''{sample: {column: value}} as plain dictionaries (YAML can't represent other mappings)'''
+    return dict((k, dict(v) if isinstance(v, Mapping) else v) for k, v in data.items())
+
+
+def write_data_file(module, data, fn, sort_cols=False, table=None):
+    '''
+    writes a data file of a module in the background (as BaseMultiqcModule.write_data_file)
+    input:
+        module: MultiqcModule instance
+        data: {sample: {column: value}}, None to write the file from table
+        fn: file name without extension
+        table: columnar source of data with to_table() and to_dict() methods
+    '''
+    # Append custom module anchor if set, unique file name (as MultiQC)
+    mod_cust_config = getattr(module, 'mod_cust_config', {})
+    if 'anchor' in mod_cust_config:
+        fn = '{}_{}'.format(fn, mod_cust_config['anchor'])
+    base_fn, i = fn, 1
+    while fn in report.saved_raw_data:
+        fn = '{}_{}'.format(base_fn, i)
+        i += 1
+    if data is None:
+        # the name is reserved, the data is registered by flush_data_files
+        report.saved_raw_data[fn] = None
+        _deferred.append((fn, table))
+        registered = None
+    else:
+        # compact stores are registered as plain dictionaries (a fresh copy)
+        registered = data if isinstance(data, dict) else to_plain(data)
+        report.saved_raw_data[fn] = registered
+    if config.data_dir is None:
+        return
+
+    fmt = data_format()
+    if fmt == 'npz':
+        source = table.to_table() if table is not None else snapshot(registered)
+        path = os.path.join(config.data_dir, '{}.npz'.format(fn))
+        get_writer().submit(fn, lambda: write_npz(path, source))
+    elif data is None and fmt == 'tsv':
+        source = table.to_table()
+        path = os.path.join(config.data_dir, '{}.{}'.format(fn, config.data_format_extensions[fmt]))
+        get_writer().submit(fn, lambda: write_tsv(path, source, sort_cols))
+    elif data is None:
+        get_writer().submit(fn, lambda: util_functions.write_data_file(table.to_dict(), fn, sort_cols, fmt))
+    elif registered is not data:
+        get_writer().submit(fn, lambda: util_functions.write_data_file(registered, fn, sort_cols, fmt))
+    else:
+        copy = plain(data) if fmt == 'yaml' else snapshot(data)
+        get_writer().submit(fn, lambda: util_functions.write_data_file(copy, fn, sort_cols, fmt))
+
+
+def flush_data_files():
+    '''waits for the queued data files and logs the ones that could not be written,
+    registers the data files given as tables with MultiQC'''
+    while _deferred:
+        fn, table = _deferred.pop(0)
+        if getattr(config, 'data_dump_file', True):
+            report.saved_raw_data[fn] = table.to_dict()
+        else:
+            report.saved_raw_data.pop(fn, None)
+    if _writer is None:
+        return
+    for fn, e in _writer.flush():
+        log.error("Could not write SEGLH data file {}: {}".format(fn, e))
+
+
+def table_from_dict(data):
+    '''(samples, columns, values, kinds, text) of {sample: {column: value}}, text as {(row, col): value}'''
+    import numpy as np
+    samples = [str(s) for s in data]
+    columns = list(dict.fromkeys(str(k) for row in data.values() for k in row))
+    index = dict((c, j) for j, c in enumerate(columns))
+    values = np.full((len(samples), len(columns)), np.nan)
+    kinds = np.zeros((len(samples), len(columns)), dtype=np.uint8)
+    text = dict()
+    for i, row in enumerate(data.values()):
+        for k, v in row.items():
+            j = index[str(k)]
+            if v is None:
+                kinds[i, j] = KIND_NONE
+            elif isinstance(v, float):
+                values[i, j], kinds[i, j] = v, KIND_FLOAT
+            elif isinstance(v, int) and not isinstance(v, bool) and abs(v) < 2 ** 53:
+                values[i, j], kinds[i, j] = v, KIND_INT
+            else:
+                kinds[i, j] = KIND_TEXT
+                text[(i, j)] = str(v)
+    return samples, columns, values, kinds, text
+
+
+def write_npz(path, source):
+    '''
+    writes a table to a numpy archive (no pickled objects):
+        samples, columns: str arrays
+        values: samples x columns float array
+        kinds: samples x columns uint8 array (KIND_ABSENT, KIND_FLOAT, KIND_NONE, KIND_TEXT, KIND_INT)
+        text_pos, text: flat positions and values of the text cells
+    input:
+        source: {sample: {column: value}} or (samples, columns, values, kinds) from to_table(),
+            kinds None if NaN values are absent and all others floats
+    '''
+    import numpy as np
+    if isinstance(source, Mapping):
+        samples, columns, values, kinds, text = table_from_dict(source)
+    else:
+        samples, columns, values, kinds = source
+        text = dict()
+        if kinds is None:
+            kinds = np.where(np.isnan(values), KIND_ABSENT, KIND_FLOAT).astype(np.uint8)
+    positions = sorted(text)
+    with open(path, 'wb') as fh:
+        np.savez(
+            fh,
+            samples=np.array(samples, dtype=str),
+            columns=np.array(columns, dtype=str),
+            values=values,
+            kinds=kinds,
+            text_pos=np.array([i * len(columns) + j for i, j in positions], dtype=np.int64),
+            text=np.array([text[p] for p in positions], dtype=str),
+        )
+
+
+def write_tsv(path, source, sort_cols=False):
+    '''
+    writes a table as MultiQC writes a tsv data file (samples sorted, missing cells empty)
+    input:
+        source: (samples, columns, values, kinds) from to_table(), kinds None if NaN values
+            are absent and all others floats; columns without values are left out
+    '''
+    import numpy as np
+    samples, columns, values, kinds = source
+    present = ~np.isnan(values) if kinds is None else kinds != KIND_ABSENT
+    keep = np.flatnonzero(present.any(axis=0))
+    if sort_cols:
+        keep = np.array(sorted(keep.tolist(), key=lambda j: str(columns[j])), dtype=np.intp)
+    lines = ['\t'.join(['Sample'] + [str(columns[j]) for j in keep])]
+    for i in sorted(range(len(samples)), key=lambda i: str(samples[i])):
+        cells = values[i, keep].tolist()
+        flags = present[i, keep].tolist()
+        if kinds is not None:
+            kind = kinds[i, keep].tolist()
+            cells = [int(v) if k == KIND_INT else None if k == KIND_NONE else v for v, k in zip(cells, kind)]
+        lines.append('\t'.join([str(samples[i])] + [str(v) if f else '' for v, f in zip(cells, flags)]))
+    with io.open(path, 'w', encoding='utf-8') as fh:
+        fh.write('\n'.join(lines) + '\n')
+
+
+def read_npz(path):
+    '''reads an npz data file to {sample: {column: value}} (absent cells left out)'''
+    import numpy as np
+    with np.load(path, allow_pickle=False) as npz:
+        samples, columns = npz['samples'].tolist(), npz['columns'].tolist()
+        values, kinds = npz['values'].tolist(), npz['kinds']
+        text = dict(zip(npz['text_pos'].tolist(), npz['text'].tolist()))
+    data = dict()
+    for i, sample in enumerate(samples):
+        row = data[sample] = dict()
+        for j in np.flatnonzero(kinds[i]).tolist():
+            kind = kinds[i, j]
+            if kind == KIND_FLOAT:
+                row[columns[j]] = values[i][j]
+            elif kind == KIND_INT:
+                row[columns[j]] = int(values[i][j])
+            elif kind == KIND_NONE:
+                row[columns[j]] = None
+            else:
+                row[columns[j]] = text[i * len(columns) + j]
+    return data
@@ -23,10 +23,17 @@ setup(
     license = 'MIT',
     packages = find_packages(),
     include_package_data = True,
+    python_requires = '>=3.9',
     install_requires = [
-        'multiqc'
+        'multiqc',
     ],
+    extras_require = {
+        'zstd': ['zstandard'],
+    },
     entry_points = {
+        'console_scripts': [
+            'seglh-qc = seglh_plugin.qc_gate:main',
+        ],
         'multiqc.modules.v1': [
             'tso500 = seglh_plugin.modules.tso500:MultiqcModule',
             'sompy = seglh_plugin.modules.sompy:MultiqcModule',
@@ -34,10 +41,26 @@ setup(
             'sambamba_chanjo = seglh_plugin.modules.sambamba_chanjo:MultiqcModule',
         ],
         'multiqc.cli_options.v1': [
-            'disable_plugin = seglh_plugin.cli:disable_plugin'
+            'disable_plugin = seglh_plugin.cli:disable_plugin',
+            'seglh_workers = seglh_plugin.cli:seglh_workers',
+            'seglh_cache = seglh_plugin.cli:seglh_cache',
+            'seglh_cache_dir = seglh_plugin.cli:seglh_cache_dir',
+            'seglh_no_cache = seglh_plugin.cli:seglh_no_cache',
+            'seglh_profile = seglh_plugin.cli:seglh_profile',
+            'seglh_manifest = seglh_plugin.cli:seglh_manifest',
+            'seglh_incremental = seglh_plugin.cli:seglh_incremental',
+            'seglh_conflict = seglh_plugin.cli:seglh_conflict',
+            'seglh_history = seglh_plugin.cli:seglh_history',
+            'seglh_run_id = seglh_plugin.cli:seglh_run_id',
+            'seglh_data_format = seglh_plugin.cli:seglh_data_format',
+            'seglh_shard = seglh_plugin.cli:seglh_shard',
+            'seglh_shard_out = seglh_plugin.cli:seglh_shard_out',
+            'seglh_merge = seglh_plugin.cli:seglh_merge',
         ],
         'multiqc.hooks.v1': [
-            'execution_start = seglh_plugin.custom_code:seglh_plugin_execution_start'
+            'execution_start = seglh_plugin.custom_code:seglh_plugin_execution_start',
+            'after_modules = seglh_plugin.custom_code:seglh_plugin_after_modules',
+            'before_report_generation = seglh_plugin.custom_code:seglh_plugin_before_report_generation',
         ]
     },
     classifiers = [
@@ -0,0 +1,14 @@
+#!/usr/bin/env python
+""" Shared fixtures of the SEGLH plugin tests """
+
+import pytest
+
+from multiqc.utils import config
+
+
+@pytest.fixture(autouse=True)
+def kwargs(monkeypatch):
+    '''empty MultiQC command line options (set by multiqc.run in a report run)'''
+    options = dict()
+    monkeypatch.setattr(config, 'kwargs', options, raising=False)
+    return options
@@ -0,0 +1,66 @@
+#!/usr/bin/env python
+""" Tests of the parse cache """
+
+import os
+
+from seglh_plugin import cache
+from seglh_plugin.cache import ParseCache
+from seglh_plugin.parsers import exomedepth
+from seglh_plugin.parsers.exomedepth import parse_read_count
+
+
+def make_cache(tmp_path, **kwargs):
+    return ParseCache(str(tmp_path / 'cache' / 'parse_cache.sqlite'), version='1.0.0', **kwargs)
+
+
+def make_file(tmp_path, name='a.csv', text='x'):
+    path = tmp_path / name
+    path.write_text(text)
+    return str(path)
+
+
+def test_round_trip(tmp_path):
+    store, path = make_cache(tmp_path), make_file(tmp_path)
+    assert store.get_many(parse_read_count, [path]) == dict()
+    store.put_many(parse_read_count, {path: {'S1': {'phi': 0.1}}})
+    assert store.get_many(parse_read_count, [path]) == {path: {'S1': {'phi': 0.1}}}
+
+
+def test_changed_file_is_a_miss(tmp_path):
+    store, path = make_cache(tmp_path), make_file(tmp_path)
+    store.put_many(parse_read_count, {path: 1})
+    with open(path, 'a') as fh:
+        fh.write('more')
+    assert store.get_many(parse_read_count, [path]) == dict()
+
+
+def test_schema_version_is_part_of_the_key(tmp_path, monkeypatch):
+    store, path = make_cache(tmp_path), make_file(tmp_path)
+    store.put_many(parse_read_count, {path: 1})
+    monkeypatch.setattr(exomedepth, 'SCHEMA_VERSION', exomedepth.SCHEMA_VERSION + 1)
+    assert store.get_many(parse_read_count, [path]) == dict()
+
+
+def test_corrupt_rows_are_dropped(tmp_path):
+    store, path = make_cache(tmp_path), make_file(tmp_path)
+    store.put_many(parse_read_count, {path: 1})
+    store.db.execute('UPDATE parsed SET data=?', (b'not zlib',))
+    store.db.commit()
+    assert store.get_many(parse_read_count, [path]) == dict()
+    assert store.db.execute('SELECT COUNT(*) FROM parsed').fetchone()[0] == 0
+
+
+def test_eviction(tmp_path):
+    store = make_cache(tmp_path, max_size=1)
+    paths = [make_file(tmp_path, '{}.csv'.format(i)) for i in range(3)]
+    store.put_many(parse_read_count, dict((p, list(range(100))) for p in paths))
+    assert store.total_size() <= 1
+
+
+def test_cache_off_by_default(kwargs, tmp_path):
+    assert not cache.cache_enabled()
+    kwargs['seglh_cache_dir'] = str(tmp_path)
+    assert cache.cache_enabled()
+    kwargs['seglh_no_cache'] = True
+    assert not cache.cache_enabled()
+    assert not os.path.exists(os.path.join(str(tmp_path), cache.CACHE_FILENAME))
@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+""" Tests of the historical metrics store """
+
+import statistics
+
+import pytest
+
+from multiqc.utils import config
+from seglh_plugin import history
+from seglh_plugin.history import HistoryStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    return HistoryStore(str(tmp_path / 'history' / 'metrics.sqlite'))
+
+
+def record_runs(store, n):
+    for i in range(n):
+        run = 'run{}'.format(i)
+        store.record('exomedepth', run, '2026-01-{:02d}'.format(i + 1),
+                     {'S1': {'phi': float(i)}, 'S2': {'phi': float(i) + 1}})
+
+
+def test_record_numbers_only(store):
+    n = store.record('exomedepth', 'run1', '2026-01-01', {
+        'S1': {'phi': 0.5, 'refsamples': 9, 'flag': True, 'na': float('nan'), 'name': 'x', 'none': None}})
+    assert n == 2
+    # a later report of the same run replaces its values
+    assert store.record('exomedepth', 'run1', '2026-01-02', {'S1': {'phi': 0.7}}) == 1
+    assert store.values('exomedepth', 'phi', ['run1']) == [0.7]
+    assert store.values('exomedepth', 'refsamples', ['run1']) == []
+
+
+def test_runs_window(store):
+    record_runs(store, 5)
+    runs = store.runs('exomedepth', 'phi', exclude='run4', limit=3)
+    # the last runs before the excluded one, oldest first
+    assert [(r, d, mean, n) for r, d, mean, n in runs] == [
+        ('run1', '2026-01-02', 1.5, 2), ('run2', '2026-01-03', 2.5, 2), ('run3', '2026-01-04', 3.5, 2)]
+    assert store.runs('sompy', 'phi') == []
+
+
+def test_control_limits(store):
+    record_runs(store, 3)
+    values = [0.0, 1.0, 1.0, 2.0]
+    mean, sd = statistics.fmean(values), statistics.stdev(values)
+    assert store.control_limits('exomedepth', 'phi', ['run0', 'run1']) == pytest.approx(
+        (mean, mean - 3 * sd, mean + 3 * sd))
+    assert store.control_limits('exomedepth', 'phi', ['missing']) is None
+    assert store.values('exomedepth', 'phi', []) == []
+
+
+def test_history_sections(kwargs, tmp_path, monkeypatch):
+    kwargs.update(seglh_history=str(tmp_path / 'metrics.sqlite'), seglh_run_id='run3')
+    monkeypatch.setattr(history, '_history', None)
+    monkeypatch.setattr(config, 'seglh_run_date', '2026-01-04', raising=False)
+    monkeypatch.setattr(config, 'seglh_history_metrics', {'exomedepth': ['phi', 'missing']}, raising=False)
+    monkeypatch.setattr(history, 'trend_plot', lambda name, metrics, trends, limits: (metrics, trends, limits))
+    monkeypatch.setattr(history, 'control_table', lambda name, metrics, samples, limits: sorted(samples))
+    record_runs(history.get_history(), 3)
+
+    class Module(object):
+        def __init__(self):
+            self.sections = []
+
+        def add_section(self, **section):
+            self.sections.append(section)
+
+    module = Module()
+    samples = {'S1': {'phi': 4.0}, 'S2': {'phi': 6.0}, 'OLD': {'phi': 100.0}}
+    history.add_history_sections(module, 'exomedepth', samples, run_samples=['S1', 'S2'])
+    trends, table = module.sections
+    metrics, means, limits = trends['plot']
+    assert metrics == ['phi']
+    assert means['phi'] == [('run0', 0.5), ('run1', 1.5), ('run2', 2.5), ('run3', 5.0)]
+    assert limits['phi'][0] == pytest.approx(1.5)
+    # only the samples of this run are shown and recorded
+    assert table['plot'] == ['S1', 'S2']
+    assert history.get_history().values('exomedepth', 'phi', ['run3']) == [4.0, 6.0]
@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+""" Tests of the incremental mode """
+
+import io
+import json
+
+import pytest
+
+from multiqc.utils import config
+from seglh_plugin import incremental
+
+
+@pytest.fixture(autouse=True)
+def conflicts(monkeypatch):
+    monkeypatch.setattr(config, 'seglh_conflicts', [], raising=False)
+
+
+PREVIOUS = {'S1': {'phi': 1.0}, 'S2': {'phi': 2.0}}
+CURRENT = {'S2': {'phi': 20.0}, 'S3': {'phi': 30.0}}
+
+
+def test_merge_new(kwargs):
+    merged = incremental.merge_samples('exomedepth', PREVIOUS, CURRENT)
+    assert merged == {'S1': {'phi': 1.0}, 'S2': {'phi': 20.0}, 'S3': {'phi': 30.0}}
+    assert list(merged) == ['S1', 'S2', 'S3']
+    assert incremental.run_samples(PREVIOUS, CURRENT) == ['S2', 'S3']
+
+
+def test_merge_old(kwargs):
+    kwargs['seglh_conflict'] = 'old'
+    merged = incremental.merge_samples('exomedepth', PREVIOUS, CURRENT)
+    assert merged['S2'] == {'phi': 2.0}
+    assert incremental.run_samples(PREVIOUS, CURRENT) == ['S3']
+
+
+def test_merge_error_is_recorded(kwargs):
+    kwargs['seglh_conflict'] = 'error'
+    merged = incremental.merge_samples('exomedepth', PREVIOUS, CURRENT)
+    assert merged['S2'] == {'phi': 20.0}
+    assert config.seglh_conflicts == [('exomedepth', ['S2'])]
+
+
+def test_read_tsv():
+    text = 'Sample\trefsamples\tphi\tstatus\nS1\t9\t0.5\tPASS\nS2\tNA\t\tNone\n'
+    assert incremental.read_tsv(io.StringIO(text)) == {
+        'S1': {'refsamples': 9, 'phi': 0.5, 'status': 'PASS'},
+        'S2': {},
+    }
+
+
+def test_previous_data(kwargs, tmp_path):
+    assert incremental.previous_data('multiqc_sompy') is None
+    kwargs['seglh_incremental'] = str(tmp_path)
+    assert incremental.previous_data('multiqc_sompy') is None
+    (tmp_path / 'multiqc_sompy.json').write_text(json.dumps(PREVIOUS))
+    assert incremental.previous_data('multiqc_sompy') == PREVIOUS
+
+
+def test_carry_forward(kwargs, tmp_path, monkeypatch):
+    previous, new = tmp_path / 'previous', tmp_path / 'new'
+    previous.mkdir()
+    new.mkdir()
+    for name in ('multiqc_sompy.txt', 'multiqc_exomedepth.txt'):
+        (previous / name).write_text('Sample\n')
+    # exomedepth ran in this run
+    (new / 'multiqc_exomedepth.txt').write_text('Sample\nS3\n')
+    kwargs['seglh_incremental'] = str(previous)
+    monkeypatch.setattr(config, 'data_dir', str(new), raising=False)
+    incremental.carry_forward()
+    assert (new / 'multiqc_sompy.txt').read_text() == 'Sample\n'
+    assert (new / 'multiqc_exomedepth.txt').read_text() == 'Sample\nS3\n'
@@ -0,0 +1,52 @@
+#!/usr/bin/env python
+""" Tests of the input file manifest """
+
+import json
+import os
+
+import pytest
+
+from seglh_plugin.manifest import load_manifest
+
+
+@pytest.fixture
+def inputs(tmp_path):
+    (tmp_path / 'run').mkdir()
+    for name in ('S1.stats.csv', 'S1.gene_level.txt'):
+        (tmp_path / 'run' / name).write_text('x')
+    return tmp_path
+
+
+def test_tsv_manifest(inputs):
+    manifest = inputs / 'manifest.tsv'
+    manifest.write_text(
+        '# files of run 1\n'
+        'module\tpath\tsample\n'
+        'sompy\trun/S1.stats.csv\tS1\n'
+        'sambamba_chanjo\trun/S1.gene_level.txt\n'
+        'sompy\trun/missing.stats.csv\tS2\n'
+    )
+    assert load_manifest(str(manifest)) == {
+        os.path.join(str(inputs), 'run', 'S1.stats.csv'): ('sompy', 'S1'),
+        os.path.join(str(inputs), 'run', 'S1.gene_level.txt'): ('sambamba_chanjo', None),
+    }
+
+
+def test_json_manifest(inputs):
+    manifest = inputs / 'manifest.json'
+    manifest.write_text(json.dumps([{'module': 'sompy', 'path': 'run/S1.stats.csv'}]))
+    assert load_manifest(str(manifest)) == {os.path.join(str(inputs), 'run', 'S1.stats.csv'): ('sompy', None)}
+
+
+@pytest.mark.parametrize('text', [
+    'fastqc\trun/S1.stats.csv\n',
+    'sompy\n',
+    '[{"module": "sompy"}]',
+    '[1]',
+    '[{"module": "sompy",',
+])
+def test_invalid_manifest(inputs, text):
+    manifest = inputs / 'manifest.txt'
+    manifest.write_text(text)
+    with pytest.raises(ValueError):
+        load_manifest(str(manifest))
@@ -0,0 +1,68 @@
+#!/usr/bin/env python
+""" Tests of the sambamba_chanjo coverage matrix """
+
+from array import array
+
+import numpy as np
+
+from seglh_plugin.modules.sambamba_chanjo.matrix import CoverageMatrix
+from seglh_plugin.modules.sambamba_chanjo.sambamba_chanjo import ordinal
+
+
+def make_matrix(columns, n_genes=1, n_samples=1):
+    '''CoverageMatrix of {sample: {gene: coverage}}, starting small so it grows'''
+    matrix = CoverageMatrix(n_genes, n_samples)
+    for sample, coverage in columns.items():
+        rows = array('q', [matrix.gene_row(gene) for gene in coverage])
+        matrix.add_column(sample, rows, array('f', coverage.values()))
+    return matrix
+
+
+COLUMNS = {
+    'S1': {'BRCA1': 99.5, 'BRCA2': 80.0, 'TP53': 100.0},
+    'S2': {'BRCA1': 90.25, 'TP53': 40.0, 'PTEN': 10.0},
+}
+
+
+def test_columns():
+    matrix = make_matrix(COLUMNS)
+    assert matrix.shape == (4, 2)
+    assert matrix.to_dict() == COLUMNS
+    samples, genes, values, _ = matrix.to_table()
+    assert (samples, genes) == (['S1', 'S2'], ['BRCA1', 'BRCA2', 'TP53', 'PTEN'])
+    assert np.isnan(values[0, 3]) and values[1, 0] == 90.25
+    # a sample added again replaces its column
+    matrix.add_column('S1', array('q', [matrix.gene_row('PTEN')]), array('f', [50.0]))
+    assert matrix.to_dict()['S1'] == {'PTEN': 50.0}
+    matrix.subset(['S2'])
+    assert matrix.to_dict() == {'S2': COLUMNS['S2']}
+
+
+def test_sample_percentiles():
+    matrix = make_matrix(COLUMNS)
+    matrix.add_column('EMPTY', array('q'), array('f'))
+    quantiles = matrix.sample_percentiles([0, 50, 100])
+    assert quantiles.shape == (3, 3)
+    assert quantiles[:, 0].tolist() == [80.0, 99.5, 100.0]
+    assert quantiles[:, 1].tolist() == [10.0, 40.0, 90.25]
+    # samples without genes have no percentiles
+    assert np.isnan(quantiles[:, 2]).all()
+    assert matrix.genes_below(95).tolist() == [1, 3, 0]
+
+
+def test_worst_genes():
+    matrix = make_matrix(dict(COLUMNS, S3={'BRCA1': 100.0, 'TP53': 70.0}))
+    matrix.gene_row('NO_VALUES')
+    assert matrix.worst_genes(3, 95) == [
+        ('PTEN', 10.0, 10.0, 1),
+        ('TP53', 70.0, 40.0, 2),
+        ('BRCA2', 80.0, 80.0, 1),
+    ]
+    # genes without values are never listed
+    assert [gene for gene, _, _, _ in matrix.worst_genes(10, 95)] == ['PTEN', 'TP53', 'BRCA2', 'BRCA1']
+    assert CoverageMatrix().worst_genes(5, 95) == []
+
+
+def test_ordinal():
+    assert [ordinal(n) for n in (1, 2, 3, 4, 11, 12, 13, 21, 22, 97.5, 50.0)] == [
+        '1st', '2nd', '3rd', '4th', '11th', '12th', '13th', '21st', '22nd', '97.5th', '50th']
@@ -0,0 +1,89 @@
+#!/usr/bin/env python
+""" Tests of the tso500 metric store and header catalog """
+
+import math
+
+import numpy as np
+
+from seglh_plugin.modules.tso500.metrics import HeaderCatalog, MetricCatalog, MetricStore
+from seglh_plugin.writer import KIND_ABSENT, KIND_FLOAT, KIND_NONE
+
+SAMPLES = {
+    'S1': {'MEDIAN_INSERT_SIZE (Count)': 120.0, 'CONTAMINATION_SCORE (NA)': 10.0},
+    'S2': {'MEDIAN_INSERT_SIZE (Count)': None},
+}
+
+
+def test_store_behaves_like_dicts():
+    store = MetricStore(samples=SAMPLES)
+    assert store.to_dict() == SAMPLES
+    assert dict(store['S2']) == SAMPLES['S2'] and len(store['S2']) == 1
+    assert 'CONTAMINATION_SCORE (NA)' not in store['S2'] and 'OTHER' not in store['S1']
+    # samples added before a metric was seen grow to the catalog
+    store['S2']['PCT_EXON_50X (%)'] = 99.5
+    assert store['S2']['PCT_EXON_50X (%)'] == 99.5 and 'PCT_EXON_50X (%)' not in store['S1']
+    del store['S1']['CONTAMINATION_SCORE (NA)']
+    assert list(store['S1']) == ['MEDIAN_INSERT_SIZE (Count)']
+    # text (e.g. from an edited data file) is kept as a missing value
+    store.update('S3', {'MEDIAN_INSERT_SIZE (Count)': 'n/a'})
+    assert dict(store['S3']) == {'MEDIAN_INSERT_SIZE (Count)': None}
+    assert list(store) == ['S1', 'S2', 'S3'] and 'S4' not in store
+
+
+def test_copy_and_subset():
+    store = MetricStore(samples=SAMPLES)
+    copy = store.copy()
+    store['S1']['MEDIAN_INSERT_SIZE (Count)'] = 1.0
+    assert copy.catalog is store.catalog
+    assert copy['S1']['MEDIAN_INSERT_SIZE (Count)'] == 120.0
+    copy.subset(['S2'])
+    assert copy.to_dict() == {'S2': SAMPLES['S2']}
+    assert len(store) == 2
+
+
+def test_matrix_and_table():
+    catalog = MetricCatalog()
+    catalog.define('DNA Library QC Metrics', 'MEDIAN_INSERT_SIZE (Count)', 70.0, None)
+    store = MetricStore(catalog, SAMPLES)
+    assert catalog.limits == {'MEDIAN_INSERT_SIZE (Count)': (70.0, None)}
+    matrix = store.matrix(['CONTAMINATION_SCORE (NA)', 'UNKNOWN'])
+    assert matrix[0, 0] == 10.0 and np.isnan(matrix[1]).all() and np.isnan(matrix[:, 1]).all()
+    samples, metrics, values, kinds = store.to_table()
+    assert samples == ['S1', 'S2']
+    assert metrics == ['MEDIAN_INSERT_SIZE (Count)', 'CONTAMINATION_SCORE (NA)']
+    assert values[0].tolist() == [120.0, 10.0] and math.isnan(values[1, 0])
+    assert kinds.tolist() == [[KIND_FLOAT, KIND_FLOAT], [KIND_NONE, KIND_ABSENT]]
+
+
+def test_header_catalog(tmp_path):
+    path = str(tmp_path / 'cache' / 'tso500_headers.json')
+    catalog = HeaderCatalog(path, 'v1')
+    assert catalog.get('PCT_EXON_50X (%)', (90.0, None)) == (False, None)
+    catalog.put('PCT_EXON_50X (%)', (90.0, None), {'title': 'PCT_EXON_50X', 'suffix': '%'})
+    # metrics not shown are kept too
+    catalog.put('OTHER (NA)', (None, None), None)
+    catalog.save()
+    assert not catalog.changed
+
+    loaded = HeaderCatalog(path, 'v1')
+    assert loaded.get('PCT_EXON_50X (%)', (90.0, None)) == (True, {'title': 'PCT_EXON_50X', 'suffix': '%'})
+    assert loaded.get('OTHER (NA)', (None, None)) == (True, None)
+    # headers depend on the limits
+    assert loaded.get('PCT_EXON_50X (%)', (95.0, None)) == (False, None)
+    # catalogs of other versions are discarded
+    assert HeaderCatalog(path, 'v2').headers == dict()
+
+
+def test_header_catalog_unreadable(tmp_path):
+    path = tmp_path / 'tso500_headers.json'
+    path.write_text('{not json')
+    catalog = HeaderCatalog(str(path), 'v1')
+    assert catalog.headers == dict()
+    # nothing added, nothing written
+    catalog.save()
+    assert path.read_text() == '{not json'
+    # a catalog that can not be written is left in memory
+    blocked = HeaderCatalog(str(path / 'tso500_headers.json'), 'v1')
+    blocked.put('OTHER (NA)', (None, None), None)
+    blocked.save()
+    assert blocked.changed and list(tmp_path.iterdir()) == [path]
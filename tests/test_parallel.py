@@ -0,0 +1,67 @@
+#!/usr/bin/env python
+""" Tests of the parallel parsing driver """
+
+import gzip
+
+import pytest
+
+from multiqc.utils import config
+from seglh_plugin import parallel
+from seglh_plugin.parsers.exomedepth import parse_read_count
+
+READ_COUNT = 'sample\trefsamples\tcorrelations\n{}_01_001_AB_F_VCP1_Pan4000.bam\t9\t0.9{}\n'
+
+
+class Module(object):
+    '''stands in for a MultiqcModule, finds the given files'''
+
+    def __init__(self, files):
+        self.files = files
+
+    def find_log_files(self, sp_key, filecontents=True):
+        for f in self.files:
+            yield dict(f)
+
+
+@pytest.fixture(autouse=True)
+def driver_config(monkeypatch):
+    monkeypatch.setattr(config, 'seglh_manifest', None, raising=False)
+    monkeypatch.setattr(config, 'seglh_shards', None, raising=False)
+
+
+def read_count_files(tmp_path, n):
+    files = []
+    for i in range(n):
+        fn = 'NGS{}_readCount.csv.gz'.format(i)
+        with gzip.open(str(tmp_path / fn), 'wt') as fh:
+            fh.write(READ_COUNT.format('NGS{}'.format(i), i))
+        files.append({'fn': fn, 'root': str(tmp_path), 's_name': 'NGS{}'.format(i)})
+    return files
+
+
+def parse(files):
+    return [(f['fn'], result) for f, result in
+            parallel.parse_log_files(Module(files), 'exomedepth', parse_read_count)]
+
+
+def test_serial_and_pool_results_match(kwargs, tmp_path, monkeypatch):
+    monkeypatch.setattr(parallel, 'BATCH_SIZE', 2)
+    files = read_count_files(tmp_path, 5)
+    serial = parse(files)
+    assert [fn for fn, _ in serial] == [f['fn'] for f in files]
+    assert serial[3][1] == {'NGS3_01_001_AB_F_VCP1_Pan4000': {'refsamples': 9, 'correlations': 0.93}}
+    kwargs['seglh_workers'] = 2
+    assert parse(files) == serial
+
+
+def test_duplicate_and_unreadable_files(tmp_path):
+    files = read_count_files(tmp_path, 2)
+    (tmp_path / 'broken_readCount.csv.gz').write_bytes(b'not gzip')
+    found = [files[0], files[1], dict(files[0]), {'fn': 'broken_readCount.csv.gz', 'root': str(tmp_path), 's_name': 'x'}]
+    assert [fn for fn, _ in parse(found)] == [files[0]['fn'], files[1]['fn']]
+
+
+def test_get_workers(kwargs):
+    assert parallel.get_workers() == 1
+    kwargs['seglh_workers'] = 0
+    assert parallel.get_workers() >= 1
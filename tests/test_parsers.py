@@ -0,0 +1,131 @@
+#!/usr/bin/env python
+""" Tests of the input file parsers """
+
+import gzip
+import io
+
+import pytest
+
+from seglh_plugin.parsers import iter_lines, open_text, strip_compression
+from seglh_plugin.parsers.exomedepth import parse_read_count
+from seglh_plugin.parsers.sambamba_chanjo import PanelFilter, parse_gene_level, read_panel
+from seglh_plugin.parsers.sompy import parse_stats_csv
+from seglh_plugin.parsers.tso500 import parse_key_values, parse_metric_block, parse_metrics_output
+
+READ_COUNT = (
+    'sample\tmin.refs\trefsamples\tcorrelations\texpected.BF\tphi\tRatioSd\tmean.p\tmedian.depth'
+    '\tbatch.maxcor\tbatch.mediancor\tcoeff.var\n'
+    'NGS1_01_001_AB_F_VCP1_Pan4000_markdup.bam\t3\t9\t0.9665\t7.98\t8.827e-04\t0.1\t50.1\t298\t0.99\t0.97\t0.3\n'
+    'NGS1_02_002_AB_M_VCP1_Pan4000_markdup.bam\t3\t8\t0.9086\t13.61\t1.079e-04\t0.1\t50.1\t141\t0.99\t0.97\tNA\n'
+    'not_a_sample.bam\t3\t8\t0.9\t1\t1\t1\t1\t1\t1\t1\t1\n'
+)
+
+SOMPY_STATS = (
+    ',type,total.truth,total.query,tp,fp,fn,unk,ambi,recall,recall_lower,recall_upper,recall2,precision,'
+    'precision_lower,precision_upper,na,ambiguous,fp.region.size,fp.rate,sompyversion,sompycmd\n'
+    '0,indels,10,10,9,1,1,0,0,0.9,0.5,0.99,0.9,0.9,0.5,0.99,0.0,0.0,1000,1.0,v0.3,som.py a b -o out/S1.vcf\n'
+    '1,SNVs,100,100,99,1,1,0,0,0.99,0.9,1.0,0.99,0.99,0.9,1.0,0.0,0.0,1000,1.0,v0.3,som.py a b -o out/S1.vcf\n'
+)
+
+METRICS_OUTPUT = (
+    '[Header]\n'
+    'Output Date\t2021-01-01\n'
+    'Run Folder\trun1\n'
+    '\n'
+    '[Run QC Metrics]\n'
+    'Metric (UOM)\tLSL Guideline\tUSL Guideline\tValue\n'
+    'PCT_PF_READS (%)\t80.0\tNA\t90.5\n'
+    '\n'
+    '[DNA Library QC Metrics]\n'
+    'Metric (UOM)\tLSL Guideline\tUSL Guideline\tS1\tS2\n'
+    'MEDIAN_INSERT_SIZE (Count)\t70\tNA\t120\tNA\n'
+    'CONTAMINATION_SCORE (NA)\tNA\t3106\t10\n'
+    '\n'
+    '[RNA Library QC Metrics]\n'
+    'Metric (UOM)\tLSL Guideline\tUSL Guideline\tR1\n'
+    'MEDIAN_CV_GENE_500X (NA)\tNA\t0.93\t0.5\n'
+)
+
+
+def test_iter_lines_small_chunks():
+    text = 'a\tb\nccc\n\nd'
+    assert list(iter_lines(io.StringIO(text), chunk_size=3)) == ['a\tb', 'ccc', '', 'd']
+
+
+def test_open_text_gzip(tmp_path):
+    path = tmp_path / 'x.gene_level.txt.gz'
+    with gzip.open(str(path), 'wt') as fh:
+        fh.write('gene symbol\tcoverage\nBRCA1\t99.5\n')
+    assert strip_compression(path.name) == 'x.gene_level.txt'
+    with open_text(str(path)) as fh:
+        assert parse_gene_level(fh) == (['BRCA1'], pytest.approx([99.5]))
+
+
+def test_open_text_zstd(tmp_path):
+    zstandard = pytest.importorskip('zstandard')
+    path = tmp_path / 'x.stats.csv.zst'
+    path.write_bytes(zstandard.ZstdCompressor().compress(SOMPY_STATS.encode('utf-8')))
+    with open_text(str(path)) as fh:
+        assert set(parse_stats_csv(fh)) == {'S1.vcf'}
+
+
+def test_parse_read_count():
+    data = parse_read_count(io.StringIO(READ_COUNT))
+    assert list(data) == ['NGS1_01_001_AB_F_VCP1_Pan4000', 'NGS1_02_002_AB_M_VCP1_Pan4000']
+    first = data['NGS1_01_001_AB_F_VCP1_Pan4000']
+    assert first['refsamples'] == 9 and isinstance(first['refsamples'], int)
+    assert first['correlations'] == 0.9665
+    assert data['NGS1_02_002_AB_M_VCP1_Pan4000']['coeff.var'] is None
+
+
+@pytest.mark.parametrize('header', ['', 'sample\n'])
+def test_parse_read_count_without_header(header):
+    # columns are not guessed by position, the samples are kept without metrics
+    data = parse_read_count(io.StringIO(header + READ_COUNT.split('\n', 1)[1]))
+    assert data == {'NGS1_01_001_AB_F_VCP1_Pan4000': {}, 'NGS1_02_002_AB_M_VCP1_Pan4000': {}}
+
+
+def test_parse_stats_csv():
+    data = parse_stats_csv(io.StringIO(SOMPY_STATS))
+    assert list(data['S1.vcf']) == ['indels', 'SNVs']
+    snvs = data['S1.vcf']['SNVs']
+    assert snvs['tp'] == 99 and snvs['recall'] == 0.99
+    assert snvs['sompycmd'] == 'som.py a b -o out/S1.vcf'
+
+
+def test_parse_gene_level_panel():
+    text = '# comment\ngene symbol\tcoverage\nBRCA1\t99.5\nBRCA2\t80\nTP53\t100\n'
+    genes, values = parse_gene_level(io.StringIO(text))
+    assert genes == ['BRCA1', 'BRCA2', 'TP53']
+    assert list(values) == pytest.approx([99.5, 80.0, 100.0])
+    panel = PanelFilter(read_panel(io.StringIO('track name=x\nchr17\t1\t2\tBRCA1\nTP53\n')))
+    genes, values = panel(io.StringIO(text))
+    assert genes == ['BRCA1', 'TP53']
+    assert list(values) == pytest.approx([99.5, 100.0])
+
+
+def test_read_panel_bed():
+    text = 'browser position chr17\ntrack name=x\nchr17\t100\t200\tBRCA1\t0\t+\nchr13\t10\t20\tBRCA2\nchr1\t5\t6\n'
+    assert read_panel(io.StringIO(text)) == frozenset(['BRCA1', 'BRCA2'])
+
+
+def test_read_panel_gene_list():
+    # gene lists with extra columns (e.g. transcript, comment) are not BED files
+    text = '# genes\nBRCA1\tNM_007294.4\tbreast\tovarian\nTP53 NM_000546.6 li fraumeni\nPTEN\n'
+    assert read_panel(io.StringIO(text)) == frozenset(['BRCA1', 'TP53', 'PTEN'])
+
+
+def test_parse_metrics_output():
+    parsed = parse_metrics_output(io.StringIO(METRICS_OUTPUT))
+    assert parsed['samples'] == {
+        'S1': {'MEDIAN_INSERT_SIZE (Count)': 120.0, 'CONTAMINATION_SCORE (NA)': 10.0},
+        'S2': {'MEDIAN_INSERT_SIZE (Count)': None, 'CONTAMINATION_SCORE (NA)': None},
+    }
+    assert parsed['metrics'] == [
+        ('DNA Library QC Metrics', 'MEDIAN_INSERT_SIZE (Count)', 70.0, None),
+        ('DNA Library QC Metrics', 'CONTAMINATION_SCORE (NA)', None, 3106.0),
+    ]
+    assert set(parsed['blocks']) == {'Header', 'Run QC Metrics', 'RNA Library QC Metrics'}
+    assert parse_key_values(parsed['blocks']['Header'])['Run Folder'] == 'run1'
+    rna = parse_metric_block('RNA Library QC Metrics', parsed['blocks']['RNA Library QC Metrics'])
+    assert rna['samples'] == {'R1': {'MEDIAN_CV_GENE_500X (NA)': 0.5}}
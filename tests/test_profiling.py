@@ -0,0 +1,53 @@
+#!/usr/bin/env python
+""" Tests of the phase profiler """
+
+import tracemalloc
+
+import pytest
+
+from multiqc.utils import config
+from seglh_plugin import profiling
+
+
+@pytest.fixture
+def profiler(monkeypatch):
+    p = profiling.Profiler()
+    monkeypatch.setattr(config, 'seglh_profiler', p, raising=False)
+    yield p
+    tracemalloc.stop()
+
+
+def test_nested_phase_peaks(profiler):
+    with profiling.phase('m', 'outer'):
+        kept = bytearray(1 << 20)
+        with profiling.phase('m', 'inner'):
+            released = bytearray(8 << 20)
+            del released
+        with profiling.phase('m', 'inner'):
+            pass
+    phases = profiler.modules['m']['phases']
+    assert phases['inner']['calls'] == 2
+    assert phases['inner']['peak_bytes'] >= 8 << 20
+    # the outer phase includes the peak of the inner one and its own allocations
+    assert phases['outer']['peak_bytes'] >= (8 << 20) + (1 << 20)
+    assert profiler.peaks == []
+    del kept
+
+
+def test_disabled(monkeypatch):
+    monkeypatch.setattr(config, 'seglh_profiler', None, raising=False)
+    with profiling.phase('m', 'outer'):
+        pass
+    profiling.count('m', files=1)
+
+
+def test_search_discovery_phase(profiler, monkeypatch):
+    from seglh_plugin import search
+    monkeypatch.setattr(config, 'fn_ignore_files', ['*.txt.gz'], raising=False)
+    seen = []
+    get_filelist = search.make_get_filelist(lambda names: seen.append(list(config.fn_ignore_files)))
+    get_filelist([])
+    # compressed ignore patterns are lifted while MultiQC searches the files
+    assert seen == [[]]
+    assert config.fn_ignore_files == ['*.txt.gz']
+    assert profiler.modules['search']['phases']['discovery']['calls'] == 1
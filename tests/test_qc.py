@@ -0,0 +1,46 @@
+#!/usr/bin/env python
+""" Tests of the QC evaluation """
+
+import numpy as np
+import pytest
+
+from seglh_plugin.qc import FAIL, NA, PASS, evaluate, evaluate_values, recall_band
+
+
+@pytest.mark.parametrize('recall, band', [
+    (1.0, 'verygreen'),
+    (0.99, 'verygreen'),
+    (0.985, 'green'),
+    (0.98, 'amber'),
+    (0.95, 'amber'),
+    (0.90, 'red'),
+    (0.0, 'red'),
+    ('0.995', 'verygreen'),
+    (None, NA),
+    ('NA', NA),
+])
+def test_recall_band(recall, band):
+    assert recall_band(recall) == band
+
+
+def test_evaluate():
+    samples = {
+        'S1': {'insert': 120.0, 'contamination': 10.0, 'other': 1.0},
+        'S2': {'insert': 50.0, 'contamination': None},
+        'S3': {},
+    }
+    limits = {'insert': (70.0, None), 'contamination': (None, 3106.0), 'other': (None, None)}
+    result = evaluate(samples, limits)
+    assert result.metrics == ['insert', 'contamination']
+    assert result.status() == [PASS, FAIL, NA]
+    assert result.failed_count().tolist() == [0, 1, 0]
+    assert result.na_count().tolist() == [0, 1, 2]
+    assert result.failed_metrics(1) == ['insert']
+    assert result.flag_names()['S2'] == {'insert': FAIL, 'contamination': NA}
+    assert result.summary()['S2']['status'] == FAIL
+
+
+def test_evaluate_values_bounds_included():
+    values = np.array([[70.0], [69.9], [np.nan]])
+    result = evaluate_values(['S1', 'S2', 'S3'], ['insert'], values, {'insert': (70, 80)})
+    assert result.status() == [PASS, FAIL, NA]
@@ -0,0 +1,82 @@
+#!/usr/bin/env python
+""" Tests of the seglh-qc gate """
+
+import gzip
+import json
+
+from seglh_plugin import qc_gate
+
+METRICS_OUTPUT = (
+    '[DNA Library QC Metrics]\n'
+    'Metric (UOM)\tLSL Guideline\tUSL Guideline\t{samples}\n'
+    'MEDIAN_INSERT_SIZE (Count)\t70\tNA\t{values}\n'
+)
+
+SOMPY_STATS = (
+    ',type,total.truth,tp,recall,sompyversion,sompycmd\n'
+    '0,indels,10,10,{indels},v0.3,som.py a b -o out/{sample}.vcf\n'
+    '1,SNVs,100,99,0.99,v0.3,som.py a b -o out/{sample}.vcf\n'
+)
+
+
+def write(path, text):
+    if path.name.endswith('.gz'):
+        with gzip.open(str(path), 'wt') as fh:
+            fh.write(text)
+    else:
+        path.write_text(text)
+    return str(path)
+
+
+def test_pass_json(tmp_path, capsys):
+    write(tmp_path / 'MetricsOutput.tsv', METRICS_OUTPUT.format(samples='NGS1_01', values='120'))
+    (tmp_path / 'sompy').mkdir()
+    write(tmp_path / 'sompy' / 'NGS1_01.stats.csv.gz', SOMPY_STATS.format(sample='NGS1_01', indels=1.0))
+    assert qc_gate.main([str(tmp_path)]) == qc_gate.EXIT_PASS
+    verdict = json.loads(capsys.readouterr().out)
+    assert verdict['status'] == 'PASS'
+    sample = verdict['samples']['NGS1_01']
+    assert sample['names'] == {'tso500': 'NGS1_01', 'sompy': 'NGS1_01.vcf'}
+    assert sample['sompy']['recall']['indels'] == {'recall': 1.0, 'band': 'verygreen'}
+
+
+def test_fail_tsv(tmp_path):
+    tso500 = write(tmp_path / 'MetricsOutput.tsv', METRICS_OUTPUT.format(samples='S1\tS2', values='120\t50'))
+    sompy = write(tmp_path / 'S1.stats.csv', SOMPY_STATS.format(sample='S1', indels=0.9))
+    output = str(tmp_path / 'verdict.tsv')
+    assert qc_gate.main(['--format', 'tsv', '--output', output, tso500, sompy]) == qc_gate.EXIT_FAIL
+    assert open(output).read() == (
+        'sample\tcheck\tstatus\tvalue\tdetail\n'
+        'S1\ttso500\tPASS\t\t\n'
+        'S1\tsompy_SNVs\tPASS\t0.99\tverygreen\n'
+        'S1\tsompy_indels\tFAIL\t0.9\tred\n'
+        'S2\ttso500\tFAIL\t\tMEDIAN_INSERT_SIZE (Count)\n'
+    )
+
+
+def test_recall_groups(tmp_path):
+    sompy = write(tmp_path / 'S1.stats.csv', SOMPY_STATS.format(sample='S1', indels=0.9))
+    assert qc_gate.main(['--recall-groups', 'SNVs', '-o', str(tmp_path / 'v.json'), sompy]) == qc_gate.EXIT_PASS
+
+
+def test_errors(tmp_path, capsys):
+    # not a gated input, no inputs, no samples, unreadable input
+    other = write(tmp_path / 'other.csv', 'x\n')
+    assert qc_gate.main([other]) == qc_gate.EXIT_ERROR
+    (tmp_path / 'empty').mkdir()
+    assert qc_gate.main([str(tmp_path / 'empty')]) == qc_gate.EXIT_ERROR
+    empty = write(tmp_path / 'empty' / 'MetricsOutput.tsv', '[Header]\nRun Folder\trun1\n')
+    assert qc_gate.main([empty]) == qc_gate.EXIT_ERROR
+    broken = tmp_path / 'broken' / 'MetricsOutput.tsv.gz'
+    broken.parent.mkdir()
+    broken.write_bytes(b'not gzip')
+    assert qc_gate.main([str(broken)]) == qc_gate.EXIT_ERROR
+    assert 'could not read the inputs' in capsys.readouterr().err
+
+
+def test_sample_not_evaluated(tmp_path, capsys):
+    tso500 = write(tmp_path / 'MetricsOutput.tsv', METRICS_OUTPUT.format(samples='S1\tS2', values='120\tNA'))
+    assert qc_gate.main([tso500]) == qc_gate.EXIT_ERROR
+    out, err = capsys.readouterr()
+    assert json.loads(out)['samples']['S2']['status'] == 'NA'
+    assert 'samples without evaluated checks: S2' in err
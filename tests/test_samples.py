@@ -0,0 +1,57 @@
+#!/usr/bin/env python
+""" Tests of the cross-module sample index """
+
+from collections import OrderedDict
+
+from multiqc.utils import config, report
+from seglh_plugin import samples, writer
+from seglh_plugin.samples import SampleIndex
+
+
+def test_sample_id():
+    index = SampleIndex()
+    assert index.sample_id('out/NGS1_01_001.vcf') == 'NGS1_01_001'
+    assert index.sample_id('NGS1_01_001.gene_level.txt.gz') == 'NGS1_01_001'
+    assert index.sample_id(' NGS1_01_001.bam ') == 'NGS1_01_001'
+    # a name that is only an extension is kept
+    assert index.sample_id('.vcf') == '.vcf'
+    pattern = SampleIndex(r'^(NGS\d+_\d+_\d+)')
+    assert pattern.sample_id('NGS1_01_001_AB_F_VCP1_Pan4000') == 'NGS1_01_001'
+    assert pattern.sample_id('control') == 'control'
+
+
+def test_join_modules():
+    index = SampleIndex(r'^(NGS\d+_\d+_\d+)')
+    index.add('exomedepth', 'ExomeDepth metrics',
+              {'NGS1_01_001_AB_F_VCP1_Pan4000': {'refsamples': 9, 'phi': 0.1},
+               'NGS1_02_002_AB_M_VCP1_Pan4000': {'phi': 0.2}},
+              OrderedDict([('refsamples', {'title': 'Refs'})]))
+    index.add('sompy', 'som.py', {'NGS1_01_001.vcf': {'recall': 0.99}},
+              OrderedDict([('recall', {'title': 'Recall'})]))
+    assert index.rows == {
+        'NGS1_01_001': {'exomedepth_refsamples': 9, 'sompy_recall': 0.99},
+        'NGS1_02_002': {},
+    }
+    assert index.samples['NGS1_01_001'] == {'exomedepth': 'NGS1_01_001_AB_F_VCP1_Pan4000', 'sompy': 'NGS1_01_001.vcf'}
+    assert list(index.headers) == ['exomedepth_refsamples', 'sompy_recall']
+    assert index.headers['sompy_recall'] == {'title': 'Recall', 'namespace': 'som.py'}
+
+
+def test_general_stats_table(monkeypatch):
+    written = []
+    monkeypatch.setattr(writer, 'write_data_file', lambda module, data, fn: written.append((data, fn)))
+    monkeypatch.setattr(report, 'general_stats_data', [], raising=False)
+    monkeypatch.setattr(report, 'general_stats_headers', [], raising=False)
+    monkeypatch.setattr(config, 'seglh_sample_index', None, raising=False)
+    monkeypatch.setattr(config, 'seglh_sample_id_pattern', None, raising=False)
+    # nothing registered, nothing added
+    samples.add_general_stats_table()
+    assert report.general_stats_data == [] and written == []
+
+    class Module(object):
+        name = 'ExomeDepth metrics'
+    samples.add_general_stats(Module(), 'exomedepth', {'S1.bam': {'phi': 0.1}}, OrderedDict([('phi', {})]))
+    samples.add_general_stats_table()
+    assert report.general_stats_data == [{'S1': {'exomedepth_phi': 0.1}}]
+    assert list(report.general_stats_headers[0]) == ['exomedepth_phi']
+    assert written == [({'S1': {'exomedepth': 'S1.bam'}}, 'multiqc_seglh_samples')]
@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+""" Tests of the combined SEGLH file classification """
+
+import gzip
+
+import pytest
+
+from multiqc.utils import config
+from seglh_plugin import search
+
+PATTERNS = {
+    'tso500': {'fn': 'MetricsOutput.tsv'},
+    'sompy': {'fn': '*.stats.csv', 'contents': ',sompyversion,sompycmd', 'num_lines': 1},
+    'exomedepth': [
+        {'fn': '*_readCount.csv', 'contents': 'refsamples', 'num_lines': 1},
+        {'fn': '*.ed.txt', 'contents_re': r'^#ExomeDepth v\d'},
+    ],
+    'sambamba_chanjo': {'fn': '*.gene_level.txt'},
+}
+
+
+@pytest.fixture(autouse=True)
+def patterns(monkeypatch):
+    monkeypatch.setattr(config, 'sp', dict(PATTERNS), raising=False)
+    monkeypatch.setattr(config, 'seglh_manifest', None, raising=False)
+    monkeypatch.setattr(config, 'seglh_shards', None, raising=False)
+    search._classified.clear()
+    search._stats.update(files_classified=0, files_read=0)
+
+
+def make_file(tmp_path, fn, text=''):
+    path = tmp_path / fn
+    if fn.endswith('.gz'):
+        with gzip.open(str(path), 'wt') as fh:
+            fh.write(text)
+    else:
+        path.write_text(text)
+    return {'fn': fn, 'root': str(tmp_path), 'filesize': path.stat().st_size}
+
+
+def test_names_and_contents(tmp_path):
+    cases = [
+        ('MetricsOutput.tsv', '', {('tso500', 0)}),
+        ('S1.gene_level.txt.gz', 'gene\tcov\n', {('sambamba_chanjo', 0)}),
+        ('S1.stats.csv', 'x,sompyversion,sompycmd\n', {('sompy', 0)}),
+        # the signature must be in the first line
+        ('S2.stats.csv', 'x\n,sompyversion,sompycmd\n', set()),
+        ('NGS1_readCount.csv.gz', 'sample\trefsamples\n', {('exomedepth', 0)}),
+        ('NGS2_readCount.csv', 'sample\tphi\n', set()),
+        ('S1.ed.txt', 'header\n#ExomeDepth v1\n', {('exomedepth', 1)}),
+        ('other.csv', 'refsamples\n', set()),
+    ]
+    for fn, text, matched in cases:
+        assert search.classify(make_file(tmp_path, fn, text)) == matched, fn
+    # only files whose name matches a pattern with contents are opened
+    assert search._stats == {'files_classified': 8, 'files_read': 5}
+
+
+def test_file_is_read_once(tmp_path):
+    f = make_file(tmp_path, 'NGS1_readCount.csv', 'sample\trefsamples\n')
+    search_file = search.make_search_file(lambda pattern, f, module_key: False)
+    assert search_file(PATTERNS['exomedepth'][0], f, 'exomedepth')
+    assert not search_file(PATTERNS['exomedepth'][1], f, 'exomedepth')
+    assert not search_file(PATTERNS['sompy'], f, 'sompy')
+    assert search._stats['files_read'] == 1
+
+
+def test_max_filesize_and_images(tmp_path):
+    config.sp['sambamba_chanjo'] = {'fn': '*.gene_level.txt', 'max_filesize': 4}
+    assert search.classify(make_file(tmp_path, 'S1.gene_level.txt', 'gene\tcov\n')) == frozenset()
+    config.sp['tso500'] = {'fn': '*.png'}
+    assert search.classify(make_file(tmp_path, 'MetricsOutput.png')) == frozenset()
+
+
+def test_other_modules_skip_lifted_ignores(tmp_path, monkeypatch):
+    monkeypatch.setattr(search, '_lifted', ['*.txt.gz'])
+    f = make_file(tmp_path, 'S1.gene_level.txt.gz', 'gene\tcov\n')
+    search_file = search.make_search_file(lambda pattern, f, module_key: True)
+    assert not search_file({'fn': '*'}, f, 'fastqc')
+    assert search_file(PATTERNS['sambamba_chanjo'], f, 'sambamba_chanjo')
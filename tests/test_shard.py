@@ -0,0 +1,55 @@
+#!/usr/bin/env python
+""" Tests of the shard files """
+
+from array import array
+
+import pytest
+
+from multiqc.utils import config
+from seglh_plugin import shard
+
+
+@pytest.fixture(autouse=True)
+def shard_config(monkeypatch):
+    monkeypatch.setattr(config, 'seglh_shard_records', None, raising=False)
+    monkeypatch.setattr(config, 'seglh_plugin_version', '1.0.0', raising=False)
+
+
+def test_round_trip(kwargs, tmp_path):
+    path = str(tmp_path / 'shards' / 'shard1.json.gz')
+    kwargs.update(seglh_shard_out=path, seglh_shard='1/2')
+    chanjo = (['BRCA1', 'TP53'], array('f', [99.5, 100.0]))
+    shard.record('sambamba_chanjo', {'fn': 'S1.gene_level.txt', 'root': 'run', 's_name': 'S1'}, chanjo)
+    shard.record('sompy', {'fn': 'S1.stats.csv', 'root': 'run', 's_name': 'S1'}, {'S1': {'SNVs': {'tp': 1}}})
+    shard.write_shard(path)
+
+    modules = shard.load_shard(path)
+    assert modules['sompy'] == [{'fn': 'S1.stats.csv', 'root': 'run', 's_name': 'S1',
+                                 'result': {'S1': {'SNVs': {'tp': 1}}}}]
+    genes, values = modules['sambamba_chanjo'][0]['result']
+    assert genes == chanjo[0]
+    assert values == chanjo[1] and values.typecode == 'f'
+
+
+def test_not_a_shard(tmp_path):
+    import gzip
+    path = str(tmp_path / 'other.json.gz')
+    with gzip.open(path, 'wt') as fh:
+        fh.write('{"format": "other"}')
+    with pytest.raises(ValueError):
+        shard.load_shard(path)
+
+
+def test_select_shard(kwargs):
+    paths = ['/d/{}'.format(c) for c in 'dbca']
+    files = [{'fn': p} for p in paths]
+    kwargs['seglh_shard'] = '1/2'
+    assert shard.select_shard(files, paths)[1] == ['/d/c', '/d/a']
+    kwargs['seglh_shard'] = '2/2'
+    assert shard.select_shard(files, paths)[1] == ['/d/d', '/d/b']
+
+
+@pytest.mark.parametrize('spec', ['0/2', '3/2', '1', 'a/b'])
+def test_invalid_shard(spec):
+    with pytest.raises(ValueError):
+        shard.parse_shard(spec)
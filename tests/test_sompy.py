@@ -0,0 +1,40 @@
+#!/usr/bin/env python
+""" Tests of the som.py recall formatting """
+
+import copy
+import re
+
+import pytest
+
+from multiqc.plots import table
+from multiqc.utils import report
+from seglh_plugin.modules.sompy.sompy import MultiqcModule
+from seglh_plugin.qc import recall_band
+
+COLOURS = dict(colour for band in MultiqcModule.recall_header['cond_formatting_colours'] for colour in band.items())
+RECALLS = [0.0, 0.5, 0.9, 0.95, 0.98, 0.985, 0.99, 0.995, 1.0]
+
+
+def badges(html):
+    '''{sample: badge colour} of a rendered MultiQC table'''
+    found = dict()
+    for row in html.split('<tr>'):
+        m = re.search(r'data-original-sn="([^"]+)"', row)
+        badge = re.search(r'class="badge" style="background-color:(#\w+)"', row)
+        if m:
+            found[m.group(1)] = badge.group(1) if badge else None
+    return found
+
+
+@pytest.fixture(autouse=True)
+def report_state():
+    report.init()
+
+
+def test_recall_badges_match_the_qc_bands():
+    data = dict(('S{}'.format(i), {'recall': r}) for i, r in enumerate(RECALLS))
+    html = table.plot(data, {'recall': copy.deepcopy(MultiqcModule.recall_header)},
+                      {'id': 'sompy-test', 'namespace': 'sompy'})
+    expected = dict(('S{}'.format(i), COLOURS[recall_band(r)]) for i, r in enumerate(RECALLS))
+    assert badges(html) == expected
+    assert expected['S1'] == '#D2222D' and expected['S7'] == '#007000'
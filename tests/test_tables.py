@@ -0,0 +1,27 @@
+#!/usr/bin/env python
+""" Tests of the compact tables """
+
+import json
+
+import numpy as np
+
+from seglh_plugin import tables
+
+
+class Table(object):
+    def to_table(self):
+        return ['S1', 'S2'], ['a', 'b'], np.array([[1.234, np.inf], [np.nan, -np.inf]]), None
+
+
+def test_table_values_from_dict():
+    data = {'S1': {'a': 1.234, 'b': float('inf')}, 'S2': {'b': 'text'}}
+    samples, matrix, cells = tables.table_values(data, ['a', 'b'])
+    rows = tables.payload_rows(samples, matrix, cells, [(1, True, False)] * 2)
+    assert rows == [['S1', 1.2, None], ['S2', None, 'text']]
+
+
+def test_table_values_non_finite():
+    samples, matrix, cells = tables.table_values(None, ['a', 'b', 'c'], Table())
+    rows = tables.payload_rows(samples, matrix, cells, [(2, True, False)] * 3)
+    assert rows == [['S1', 1.23, None, None], ['S2', None, None, None]]
+    json.dumps(rows, allow_nan=False)
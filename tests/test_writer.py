@@ -0,0 +1,32 @@
+#!/usr/bin/env python
+""" Tests of the data file writer """
+
+import numpy as np
+
+from seglh_plugin.writer import read_npz, write_npz, write_tsv
+
+
+def test_npz_round_trip(tmp_path):
+    path = str(tmp_path / 'data.npz')
+    data = {
+        'S1': {'phi': 0.5, 'refsamples': 9, 'status': 'PASS', 'na': None, 'big': 2 ** 60},
+        'S2': {'phi': 1.5},
+    }
+    write_npz(path, data)
+    # integers beyond float precision are kept as text
+    assert read_npz(path) == dict(data, S1=dict(data['S1'], big=str(2 ** 60)))
+    assert isinstance(read_npz(path)['S1']['refsamples'], int)
+
+
+def test_npz_from_table(tmp_path):
+    path = str(tmp_path / 'data.npz')
+    values = np.array([[99.5, np.nan], [80.0, 100.0]])
+    write_npz(path, (['S1', 'S2'], ['BRCA1', 'TP53'], values, None))
+    assert read_npz(path) == {'S1': {'BRCA1': 99.5}, 'S2': {'BRCA1': 80.0, 'TP53': 100.0}}
+
+
+def test_tsv_from_table(tmp_path):
+    path = str(tmp_path / 'data.txt')
+    values = np.array([[99.5, np.nan, np.nan], [80.0, np.nan, 100.0]])
+    write_tsv(path, (['S2', 'S1'], ['BRCA1', 'EMPTY', 'TP53'], values, None))
+    assert open(path).read() == 'Sample\tBRCA1\tTP53\nS1\t80.0\t100.0\nS2\t99.5\t\n'